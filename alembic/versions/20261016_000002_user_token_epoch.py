@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "20261016_000002"
+down_revision = "20260212_000001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("users", sa.Column("token_epoch", sa.Integer(), nullable=False, server_default=sa.text("0")))
+
+
+def downgrade():
+    op.drop_column("users", "token_epoch")
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261016_000003"
+down_revision = "20261016_000002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("ALTER TABLE audit_events RENAME TO audit_events_unpartitioned")
+    op.execute(
+        "ALTER TABLE audit_events_unpartitioned RENAME CONSTRAINT audit_events_pkey TO audit_events_unpartitioned_pkey"
+    )
+    op.execute(
+        """
+        CREATE TABLE audit_events (
+            id uuid NOT NULL,
+            user_id uuid REFERENCES users (id) ON DELETE SET NULL,
+            org_id uuid REFERENCES organizations (id) ON DELETE SET NULL,
+            action varchar(255) NOT NULL,
+            ip_address varchar(64),
+            user_agent varchar(512),
+            metadata jsonb NOT NULL DEFAULT '{}'::jsonb,
+            created_at timestamptz NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute("CREATE INDEX ix_audit_events_created_at ON audit_events USING brin (created_at)")
+    # Monthly partitions from the oldest existing row through three months ahead; the
+    # application keeps creating future partitions from there (AuditPartitionManager).
+    op.execute(
+        """
+        DO $$
+        DECLARE
+            period_start timestamptz := date_trunc(
+                'month', coalesce((SELECT min(created_at) FROM audit_events_unpartitioned), now()) AT TIME ZONE 'UTC'
+            ) AT TIME ZONE 'UTC';
+            last_start timestamptz := date_trunc('month', now() AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'
+                + interval '3 months';
+        BEGIN
+            WHILE period_start <= last_start LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF audit_events FOR VALUES FROM (%L) TO (%L)',
+                    'audit_events_p' || to_char(period_start AT TIME ZONE 'UTC', 'YYYYMM'),
+                    period_start,
+                    period_start + interval '1 month'
+                );
+                period_start := period_start + interval '1 month';
+            END LOOP;
+        END $$;
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO audit_events (id, user_id, org_id, action, ip_address, user_agent, metadata, created_at)
+        SELECT id, user_id, org_id, action, ip_address, user_agent, metadata, created_at
+        FROM audit_events_unpartitioned
+        """
+    )
+    op.execute("DROP TABLE audit_events_unpartitioned")
+
+
+def downgrade():
+    op.execute("ALTER TABLE audit_events RENAME TO audit_events_partitioned")
+    op.execute(
+        """
+        CREATE TABLE audit_events (
+            id uuid PRIMARY KEY,
+            user_id uuid REFERENCES users (id) ON DELETE SET NULL,
+            org_id uuid REFERENCES organizations (id) ON DELETE SET NULL,
+            action varchar(255) NOT NULL,
+            ip_address varchar(64),
+            user_agent varchar(512),
+            metadata jsonb NOT NULL DEFAULT '{}'::jsonb,
+            created_at timestamptz NOT NULL DEFAULT now()
+        )
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO audit_events (id, user_id, org_id, action, ip_address, user_agent, metadata, created_at)
+        SELECT id, user_id, org_id, action, ip_address, user_agent, metadata, created_at
+        FROM audit_events_partitioned
+        """
+    )
+    op.execute("DROP TABLE audit_events_partitioned")
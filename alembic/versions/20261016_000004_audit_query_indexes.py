@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261016_000004"
+down_revision = "20261016_000003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Created on the partitioned parent, so each partition (including future ones) gets its own copy.
+    op.create_index("ix_audit_events_org_created", "audit_events", ["org_id", "created_at", "id"])
+    op.create_index("ix_audit_events_user_created", "audit_events", ["user_id", "created_at", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_audit_events_user_created", table_name="audit_events")
+    op.drop_index("ix_audit_events_org_created", table_name="audit_events")
@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "20261016_000005"
+down_revision = "20261016_000004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "audit_rollups",
+        sa.Column("org_id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column("action", sa.String(255), primary_key=True),
+        sa.Column("bucket", sa.DateTime(timezone=True), primary_key=True),
+        sa.Column("count", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        """
+        INSERT INTO audit_rollups (org_id, action, bucket, count)
+        SELECT coalesce(org_id, '00000000-0000-0000-0000-000000000000'::uuid), action,
+               date_trunc('hour', created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC', count(*)
+        FROM audit_events
+        GROUP BY 1, 2, 3
+        """
+    )
+
+
+def downgrade():
+    op.drop_table("audit_rollups")
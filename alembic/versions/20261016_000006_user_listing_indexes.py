@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261016_000006"
+down_revision = "20261016_000005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_users_created_at_id", "users", ["created_at", "id"])
+    op.create_index(
+        "ix_users_normalized_email_prefix",
+        "users",
+        ["normalized_email"],
+        postgresql_ops={"normalized_email": "varchar_pattern_ops"},
+    )
+
+
+def downgrade():
+    op.drop_index("ix_users_normalized_email_prefix", table_name="users")
+    op.drop_index("ix_users_created_at_id", table_name="users")
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+revision = "20261016_000007"
+down_revision = "20261016_000006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "user_import_jobs",
+        sa.Column("id", postgresql.UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "org_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("organizations.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("created_by", postgresql.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="SET NULL")),
+        sa.Column("format", sa.String(16), nullable=False),
+        sa.Column("status", sa.String(16), nullable=False),
+        sa.Column("processed_rows", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("skipped_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("failed_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("error", sa.String(255)),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("completed_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_user_import_jobs_org_id", "user_import_jobs", ["org_id"])
+    op.create_table(
+        "user_import_results",
+        sa.Column(
+            "job_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("user_import_jobs.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("row_number", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(320)),
+        sa.Column("status", sa.String(16), nullable=False),
+        sa.Column("code", sa.String(64)),
+        sa.Column("user_id", postgresql.UUID(as_uuid=True)),
+    )
+
+
+def downgrade():
+    op.drop_table("user_import_results")
+    op.drop_index("ix_user_import_jobs_org_id", table_name="user_import_jobs")
+    op.drop_table("user_import_jobs")
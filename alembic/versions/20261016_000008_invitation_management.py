@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "20261016_000008"
+down_revision = "20261016_000007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("invitations", sa.Column("revoked_at", sa.DateTime(timezone=True), nullable=True))
+    op.create_index("ix_invitations_org_created", "invitations", ["org_id", "created_at", "id"])
+    op.create_index("ix_invitations_org_email", "invitations", ["org_id", sa.text("lower(email)")])
+
+
+def downgrade():
+    op.drop_index("ix_invitations_org_email", table_name="invitations")
+    op.drop_index("ix_invitations_org_created", table_name="invitations")
+    op.drop_column("invitations", "revoked_at")
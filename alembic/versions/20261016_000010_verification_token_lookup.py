@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from alembic import op
+
+revision = "20261016_000010"
+down_revision = "20261016_000009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        "ix_verification_tokens_user_type_created", "verification_tokens", ["user_id", "token_type", "created_at"]
+    )
+
+
+def downgrade():
+    op.drop_index("ix_verification_tokens_user_type_created", table_name="verification_tokens")
@@ -1,13 +1,10 @@
 from __future__ import annotations
 
 from functools import lru_cache
-from fastapi import Request
 
 from app.core.config import get_settings
 from app.core.hooks import HookManager, default_password_policy, default_email_domain_policy
 from app.core.plugins import PluginRegistry, load_plugins
-from app.db.redis import get_redis
-from app.services.rate_limit_service import RateLimiter
 from app.utils.profile_schema import ProfileSchemaRegistry, default_profile_registry
 
 
@@ -35,12 +32,3 @@ def get_registry() -> PluginRegistry:
 @lru_cache
 def get_profile_registry() -> ProfileSchemaRegistry:
     return default_profile_registry()
-
-
-def rate_limit_dependency(limit: int, period_seconds: int, key_prefix: str):
-    async def _dep(request: Request):
-        limiter = RateLimiter(get_redis(request))
-        ip = request.client.host if request.client else "unknown"
-        await limiter.hit(f"{key_prefix}:{ip}", limit, period_seconds)
-
-    return _dep
@@ -1,25 +1,142 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
-from sqlalchemy import select
+import csv
+import io
+import json
+from dataclasses import replace
+from datetime import datetime, timedelta
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_session
-from app.models import User
-from app.schemas.admin import AdminUserRead, AdminDisableRequest
+from app.api.deps import get_hooks
+from app.core.config import get_settings
+from app.db.session import AsyncSessionLocal, get_session
+from app.models import Role, User
+from app.schemas.admin import (
+    AdminDisableRequest,
+    AdminUserPage,
+    UserImportJobRead,
+    UserImportReport,
+    UserImportResultPage,
+)
+from app.schemas.audit import AuditEventPage, AuditStatsBucket, AuditStatsResponse
 from app.schemas.common import MessageResponse
-from app.security.dependencies import require_scopes
+from app.security.dependencies import get_current_principal, require_scopes
+from app.security.permissions import require_org_scope
+from app.security.principal import get_principal_cache
+from app.security.revocation import get_token_revocation
+from app.services.admin_user_service import EXPORT_COLUMNS, AdminUserService, UserFilters
+from app.services.audit_service import AuditService
+from app.services.user_import_service import UserImportService
+from app.utils.pagination import decode_int_cursor, encode_cursor
+from app.utils.time import utcnow
+from app.utils.validation import parse_uuid
 
 router = APIRouter()
 
 
-@router.get("/admin/users", response_model=list[AdminUserRead])
+_EXPORT_CHUNK_ROWS = 500
+
+
+def user_filters(
+    org_id: str | None = None,
+    is_verified: bool | None = None,
+    is_active: bool | None = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    email_prefix: str | None = Query(None, min_length=1, max_length=320),
+) -> UserFilters:
+    return UserFilters(
+        org_id=parse_uuid(org_id, "invalid_org_id") if org_id else None,
+        is_verified=is_verified,
+        is_active=is_active,
+        created_after=created_after,
+        created_before=created_before,
+        email_prefix=email_prefix,
+    )
+
+
+@router.get("/admin/users", response_model=AdminUserPage)
 async def list_users(
+    filters: UserFilters = Depends(user_filters),
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=200),
     session: AsyncSession = Depends(get_session),
+    settings=Depends(get_settings),
+    principal=Depends(get_current_principal),
     _=Depends(require_scopes(["admin:users:read"])),
 ):
-    result = await session.execute(select(User))
-    return list(result.scalars().all())
+    require_org_scope(principal, "admin:users:read", filters.org_id)
+    filters = replace(filters, org_id=principal.org_id)
+    users, next_cursor = await AdminUserService(session, settings).list_users(filters, cursor, limit)
+    return AdminUserPage(items=users, next_cursor=next_cursor)
+
+
+@router.get("/admin/users/export")
+async def export_users(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    filters: UserFilters = Depends(user_filters),
+    settings=Depends(get_settings),
+    principal=Depends(get_current_principal),
+    _=Depends(require_scopes(["admin:users:read"])),
+):
+    require_org_scope(principal, "admin:users:read", filters.org_id)
+    filters = replace(filters, org_id=principal.org_id)
+    # Request-scoped sessions are closed before a streaming body is sent, so the export owns its session.
+    async def rows():
+        async with AsyncSessionLocal() as session:
+            async for row in AdminUserService(session, settings).stream_users(filters):
+                yield row
+
+    if format == "csv":
+        return StreamingResponse(
+            _csv_chunks(rows()),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="users.csv"'},
+        )
+    return StreamingResponse(_ndjson_chunks(rows()), media_type="application/x-ndjson")
+
+
+async def _ndjson_chunks(rows):
+    chunk = []
+    async for row in rows:
+        chunk.append(json.dumps(row, default=_json_default, separators=(",", ":")))
+        if len(chunk) >= _EXPORT_CHUNK_ROWS:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+async def _csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    pending = 0
+    async for row in rows:
+        writer.writerow([_csv_cell(row[name]) for name in EXPORT_COLUMNS])
+        pending += 1
+        if pending >= _EXPORT_CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+    yield buffer.getvalue()
+
+
+def _csv_cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return _json_default(value)
+
+
+def _json_default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
 
 
 @router.patch("/admin/users/{user_id}/disable", response_model=MessageResponse)
@@ -32,5 +149,122 @@ async def disable_user(
     user = await session.get(User, user_id)
     if user:
         user.is_active = not data.disable
+        get_principal_cache().invalidate_user_after_commit(session, str(user.id))
+        if data.disable:
+            get_token_revocation().bump_epoch_after_commit(session, user)
         await session.commit()
-    return MessageResponse(message="User updated")
+    return MessageResponse(message="User updated")
+
+
+@router.get("/admin/audit", response_model=AuditEventPage)
+async def list_audit_events(
+    org_id: str | None = None,
+    user_id: str | None = None,
+    action: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=200),
+    session: AsyncSession = Depends(get_session),
+    settings=Depends(get_settings),
+    principal=Depends(get_current_principal),
+    _=Depends(require_scopes(["admin:audit:read"])),
+):
+    require_org_scope(principal, "admin:audit:read", parse_uuid(org_id, "invalid_org_id") if org_id else None)
+    events, next_cursor = await AuditService(session, settings).list_events(
+        org_id=principal.org_id,
+        user_id=parse_uuid(user_id, "invalid_user_id") if user_id else None,
+        action=action,
+        since=since,
+        until=until,
+        cursor=cursor,
+        limit=limit,
+    )
+    return AuditEventPage(items=events, next_cursor=next_cursor)
+
+
+@router.get("/admin/audit/stats", response_model=AuditStatsResponse)
+async def audit_stats(
+    action: list[str] | None = Query(None),
+    since: datetime | None = None,
+    until: datetime | None = None,
+    granularity: Literal["hour", "day"] = "hour",
+    session: AsyncSession = Depends(get_session),
+    settings=Depends(get_settings),
+    principal=Depends(get_current_principal),
+    _=Depends(require_scopes(["admin:audit:read"])),
+):
+    require_org_scope(principal, "admin:audit:read")
+    until = until or utcnow()
+    since = since or until - timedelta(days=1)
+    rows = await AuditService(session, settings).rollup_stats(
+        principal.org_id, since, until, actions=action, granularity=granularity
+    )
+    totals: dict[str, int] = {}
+    for _, name, count in rows:
+        totals[name] = totals.get(name, 0) + count
+    return AuditStatsResponse(
+        granularity=granularity,
+        since=since,
+        until=until,
+        items=[AuditStatsBucket(bucket=bucket, action=name, count=count) for bucket, name, count in rows],
+        totals=totals,
+    )
+
+
+@router.post("/admin/imports", response_model=UserImportReport)
+async def import_users(
+    request: Request,
+    format: Literal["csv", "ndjson"] = "csv",
+    job_id: str | None = None,
+    default_role: Role = Role.MEMBER,
+    verified: bool = False,
+    session: AsyncSession = Depends(get_session),
+    settings=Depends(get_settings),
+    hooks=Depends(get_hooks),
+    principal=Depends(get_current_principal),
+    _=Depends(require_scopes(["admin:users:write"])),
+):
+    require_org_scope(principal, "admin:users:write")
+    service = UserImportService(session, settings, hooks, AuditService(session, settings))
+    job = await service.start_job(principal.org_id, principal.user_id, format, job_id)
+    # The body is parsed as it arrives; each committed batch advances processed_rows.
+    job = await service.run(job, request.stream(), default_role=default_role, verified=verified)
+    failures = await service.list_results(job, failures_only=True)
+    return UserImportReport(job=job, failures=failures)
+
+
+@router.get("/admin/imports/{job_id}", response_model=UserImportJobRead)
+async def get_import_job(
+    job_id: str,
+    session: AsyncSession = Depends(get_session),
+    settings=Depends(get_settings),
+    hooks=Depends(get_hooks),
+    principal=Depends(get_current_principal),
+    _=Depends(require_scopes(["admin:users:read"])),
+):
+    require_org_scope(principal, "admin:users:read")
+    return await UserImportService(session, settings, hooks, AuditService(session, settings)).get_job(
+        principal.org_id, job_id
+    )
+
+
+@router.get("/admin/imports/{job_id}/results", response_model=UserImportResultPage)
+async def list_import_results(
+    job_id: str,
+    failures_only: bool = False,
+    cursor: str | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+    session: AsyncSession = Depends(get_session),
+    settings=Depends(get_settings),
+    hooks=Depends(get_hooks),
+    principal=Depends(get_current_principal),
+    _=Depends(require_scopes(["admin:users:read"])),
+):
+    require_org_scope(principal, "admin:users:read")
+    service = UserImportService(session, settings, hooks, AuditService(session, settings))
+    job = await service.get_job(principal.org_id, job_id)
+    after_row = decode_int_cursor(cursor) if cursor else 0
+    results = await service.list_results(job, after_row, limit, failures_only)
+    next_cursor = encode_cursor(results[-1].row_number) if len(results) == limit else None
+    return UserImportResultPage(items=results, next_cursor=next_cursor)
@@ -4,8 +4,9 @@ from fastapi import APIRouter, Depends, Request
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_hooks, rate_limit_dependency
+from app.api.deps import get_hooks
 from app.core.config import get_settings
+from app.db.redis import get_redis
 from app.db.session import get_session
 from app.schemas.auth import (
     RegisterRequest,
@@ -14,6 +15,7 @@ from app.schemas.auth import (
     LogoutRequest,
     PasswordResetRequest,
     PasswordResetConfirm,
+    ResendVerificationRequest,
     ChangePasswordRequest,
     ChangeEmailRequest,
     ChangeEmailConfirm,
@@ -21,7 +23,7 @@ from app.schemas.auth import (
 )
 from app.schemas.common import MessageResponse
 from app.schemas.token import TokenPair
-from app.security.dependencies import get_current_user
+from app.security.dependencies import get_current_user_with_credential, get_optional_token_payload
 from app.security.csrf import validate_csrf_token
 from app.services.auth_service import AuthService
 from app.services.token_service import TokenService
@@ -38,7 +40,6 @@ async def register(
     session: AsyncSession = Depends(get_session),
     settings=Depends(get_settings),
     hooks=Depends(get_hooks),
-    _=Depends(rate_limit_dependency(limit=5, period_seconds=3600, key_prefix="register")),
 ):
     service = AuthService(
         session=session,
@@ -60,6 +61,7 @@ async def register(
 @router.post("/verify-email", response_model=MessageResponse)
 async def verify_email(
     data: VerifyEmailRequest,
+    request: Request,
     session: AsyncSession = Depends(get_session),
     settings=Depends(get_settings),
     hooks=Depends(get_hooks),
@@ -71,11 +73,33 @@ async def verify_email(
         token_service=TokenService(session, settings),
         email_service=EmailService(settings),
         audit_service=AuditService(session, settings),
+        redis=get_redis(request),
     )
     await service.verify_email(data.token)
     return MessageResponse(message="Email verified")
 
 
+@router.post("/verify-email/request", response_model=MessageResponse)
+async def verify_email_request(
+    data: ResendVerificationRequest,
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    settings=Depends(get_settings),
+    hooks=Depends(get_hooks),
+):
+    service = AuthService(
+        session=session,
+        settings=settings,
+        hooks=hooks,
+        token_service=TokenService(session, settings),
+        email_service=EmailService(settings),
+        audit_service=AuditService(session, settings),
+        redis=get_redis(request),
+    )
+    await service.request_email_verification(data.email)
+    return MessageResponse(message="If the account needs verification, a link was sent")
+
+
 @router.post("/login", response_model=TokenPair)
 async def login(
     data: LoginRequest,
@@ -83,7 +107,6 @@ async def login(
     session: AsyncSession = Depends(get_session),
     settings=Depends(get_settings),
     hooks=Depends(get_hooks),
-    _=Depends(rate_limit_dependency(limit=10, period_seconds=60, key_prefix="login")),
 ):
     service = AuthService(
         session=session,
@@ -92,6 +115,7 @@ async def login(
         token_service=TokenService(session, settings),
         email_service=EmailService(settings),
         audit_service=AuditService(session, settings),
+        redis=get_redis(request),
     )
     access, refresh, expires_in = await service.login(
         email=data.email,
@@ -147,6 +171,7 @@ async def logout(
     session: AsyncSession = Depends(get_session),
     settings=Depends(get_settings),
     hooks=Depends(get_hooks),
+    access_token=Depends(get_optional_token_payload),
 ):
     refresh_token = data.refresh_token or request.cookies.get(settings.COOKIE_NAME_REFRESH)
     if not refresh_token:
@@ -159,17 +184,17 @@ async def logout(
         email_service=EmailService(settings),
         audit_service=AuditService(session, settings),
     )
-    await service.logout(refresh_token)
+    await service.logout(refresh_token, access_token)
     return MessageResponse(message="Logged out")
 
 
 @router.post("/password-reset/request", response_model=MessageResponse)
 async def password_reset_request(
     data: PasswordResetRequest,
+    request: Request,
     session: AsyncSession = Depends(get_session),
     settings=Depends(get_settings),
     hooks=Depends(get_hooks),
-    _=Depends(rate_limit_dependency(limit=5, period_seconds=3600, key_prefix="pwreset")),
 ):
     service = AuthService(
         session=session,
@@ -178,6 +203,7 @@ async def password_reset_request(
         token_service=TokenService(session, settings),
         email_service=EmailService(settings),
         audit_service=AuditService(session, settings),
+        redis=get_redis(request),
     )
     await service.request_password_reset(data.email)
     return MessageResponse(message="If the email exists, a reset link was sent")
@@ -186,6 +212,7 @@ async def password_reset_request(
 @router.post("/password-reset/confirm", response_model=MessageResponse)
 async def password_reset_confirm(
     data: PasswordResetConfirm,
+    request: Request,
     session: AsyncSession = Depends(get_session),
     settings=Depends(get_settings),
     hooks=Depends(get_hooks),
@@ -197,6 +224,7 @@ async def password_reset_confirm(
         token_service=TokenService(session, settings),
         email_service=EmailService(settings),
         audit_service=AuditService(session, settings),
+        redis=get_redis(request),
     )
     await service.confirm_password_reset(data.token, data.new_password)
     return MessageResponse(message="Password updated")
@@ -205,7 +233,7 @@ async def password_reset_confirm(
 @router.post("/change-password", response_model=MessageResponse)
 async def change_password(
     data: ChangePasswordRequest,
-    current_user=Depends(get_current_user),
+    current_user=Depends(get_current_user_with_credential),
     session: AsyncSession = Depends(get_session),
     settings=Depends(get_settings),
     hooks=Depends(get_hooks),
@@ -225,7 +253,7 @@ async def change_password(
 @router.post("/change-email/request", response_model=MessageResponse)
 async def change_email_request(
     data: ChangeEmailRequest,
-    current_user=Depends(get_current_user),
+    current_user=Depends(get_current_user_with_credential),
     session: AsyncSession = Depends(get_session),
     settings=Depends(get_settings),
     hooks=Depends(get_hooks),
@@ -258,4 +286,4 @@ async def change_email_confirm(
         audit_service=AuditService(session, settings),
     )
     await service.confirm_email_change(data.token)
-    return MessageResponse(message="Email updated")
+    return MessageResponse(message="Email updated")
@@ -1,16 +1,31 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import get_settings
 from app.db.session import get_session
-from app.schemas.org import OrganizationCreate, OrganizationRead, InviteRequest, InviteResponse, InvitationAcceptRequest
+from app.schemas.org import (
+    BatchInviteRequest,
+    BatchInviteResponse,
+    InvitationAcceptRequest,
+    InvitationPage,
+    InvitationRead,
+    InviteRequest,
+    InviteResponse,
+    OrganizationCreate,
+    OrganizationRead,
+    SkippedInvite,
+)
 from app.schemas.common import MessageResponse
-from app.security.dependencies import get_current_user, get_current_membership, require_scopes
-from app.services.org_service import OrgService
+from app.security.dependencies import get_current_user, get_current_principal, require_scopes
+from app.security.permissions import require_org_scope
+from app.services.org_service import OrgService, invitation_status
 from app.services.email_service import EmailService
 from app.models.enums import Role
+from app.utils.time import utcnow
 
 router = APIRouter()
 
@@ -18,26 +33,26 @@ router = APIRouter()
 @router.post("/orgs", response_model=OrganizationRead)
 async def create_org(
     data: OrganizationCreate,
-    current_user=Depends(get_current_user),
+    principal=Depends(get_current_principal),
     session: AsyncSession = Depends(get_session),
     settings=Depends(get_settings),
     _=Depends(require_scopes(["orgs:write"])),
 ):
     service = OrgService(session, settings, EmailService(settings))
-    org = await service.create_org(str(current_user.id), data.name, data.slug)
+    org = await service.create_org(principal.user_id, data.name, data.slug)
     await session.commit()
     return org
 
 
 @router.get("/orgs", response_model=list[OrganizationRead])
 async def list_orgs(
-    current_user=Depends(get_current_user),
+    principal=Depends(get_current_principal),
     session: AsyncSession = Depends(get_session),
     settings=Depends(get_settings),
     _=Depends(require_scopes(["orgs:read"])),
 ):
     service = OrgService(session, settings, EmailService(settings))
-    orgs = await service.list_orgs(str(current_user.id))
+    orgs = await service.list_orgs(principal.user_id)
     return orgs
 
 
@@ -45,20 +60,104 @@ async def list_orgs(
 async def invite_to_org(
     org_id: str,
     data: InviteRequest,
-    current_user=Depends(get_current_user),
-    membership=Depends(get_current_membership),
+    principal=Depends(get_current_principal),
     session: AsyncSession = Depends(get_session),
     settings=Depends(get_settings),
     _=Depends(require_scopes(["invitations:write"])),
 ):
-    if str(membership.org_id) != org_id or membership.role != Role.ADMIN:
+    if principal.org_id != org_id or principal.role != Role.ADMIN:
         return InviteResponse(message="Admin role required")
     service = OrgService(session, settings, EmailService(settings))
-    await service.invite(org_id, str(current_user.id), data.email, Role(data.role))
+    await service.invite(org_id, principal.user_id, data.email, Role(data.role))
     await session.commit()
     return InviteResponse(message="Invitation sent")
 
 
+@router.post("/orgs/{org_id}/invitations:batch", response_model=BatchInviteResponse)
+async def invite_batch(
+    org_id: str,
+    data: BatchInviteRequest,
+    principal=Depends(get_current_principal),
+    session: AsyncSession = Depends(get_session),
+    settings=Depends(get_settings),
+    _=Depends(require_scopes(["invitations:write"])),
+):
+    require_org_scope(principal, "invitations:write", org_id)
+    service = OrgService(session, settings, EmailService(settings))
+    result = await service.invite_batch(
+        org_id, principal.user_id, [(item.email, item.role) for item in data.invitations]
+    )
+    await session.commit()
+    return BatchInviteResponse(
+        invited=len(result.invited),
+        skipped=[SkippedInvite(email=email, reason=reason) for email, reason in result.skipped],
+    )
+
+
+@router.get("/orgs/{org_id}/invitations", response_model=InvitationPage)
+async def list_invitations(
+    org_id: str,
+    status: Literal["pending", "accepted", "revoked", "expired"] | None = None,
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=200),
+    principal=Depends(get_current_principal),
+    session: AsyncSession = Depends(get_session),
+    settings=Depends(get_settings),
+    _=Depends(require_scopes(["invitations:write"])),
+):
+    require_org_scope(principal, "invitations:write", org_id)
+    service = OrgService(session, settings, EmailService(settings))
+    invitations, next_cursor = await service.list_invitations(org_id, status, cursor, limit)
+    now = utcnow()
+    return InvitationPage(
+        items=[
+            InvitationRead(
+                id=invitation.id,
+                email=invitation.email,
+                role=invitation.role,
+                status=invitation_status(invitation, now),
+                inviter_user_id=invitation.inviter_user_id,
+                expires_at=invitation.expires_at,
+                accepted_at=invitation.accepted_at,
+                revoked_at=invitation.revoked_at,
+                created_at=invitation.created_at,
+            )
+            for invitation in invitations
+        ],
+        next_cursor=next_cursor,
+    )
+
+
+@router.post("/orgs/{org_id}/invitations/{invitation_id}/revoke", response_model=MessageResponse)
+async def revoke_invitation(
+    org_id: str,
+    invitation_id: str,
+    principal=Depends(get_current_principal),
+    session: AsyncSession = Depends(get_session),
+    settings=Depends(get_settings),
+    _=Depends(require_scopes(["invitations:write"])),
+):
+    require_org_scope(principal, "invitations:write", org_id)
+    await OrgService(session, settings, EmailService(settings)).revoke_invitation(org_id, invitation_id)
+    await session.commit()
+    return MessageResponse(message="Invitation revoked")
+
+
+@router.post("/orgs/{org_id}/invitations/{invitation_id}/resend", response_model=MessageResponse)
+async def resend_invitation(
+    org_id: str,
+    invitation_id: str,
+    principal=Depends(get_current_principal),
+    session: AsyncSession = Depends(get_session),
+    settings=Depends(get_settings),
+    _=Depends(require_scopes(["invitations:write"])),
+):
+    require_org_scope(principal, "invitations:write", org_id)
+    await OrgService(session, settings, EmailService(settings)).resend_invitation(org_id, invitation_id)
+    await session.commit()
+    return MessageResponse(message="Invitation resent")
+
+
 @router.post("/invitations/accept", response_model=MessageResponse)
 async def accept_invitation(
     data: InvitationAcceptRequest,
@@ -69,4 +168,4 @@ async def accept_invitation(
     service = OrgService(session, settings, EmailService(settings))
     await service.accept_invitation(data.token, str(current_user.id), current_user.email)
     await session.commit()
-    return MessageResponse(message="Invitation accepted")
+    return MessageResponse(message="Invitation accepted")
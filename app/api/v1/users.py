@@ -1,14 +1,18 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api.deps import get_profile_registry
 from app.core.config import get_settings
 from app.db.session import get_session
+from app.schemas.audit import AuditEventPage
 from app.schemas.user import UserRead, UserUpdate
 from app.schemas.common import MessageResponse
 from app.security.dependencies import get_current_user
+from app.services.audit_service import AuditService
 from app.services.user_service import UserService
 
 router = APIRouter()
@@ -43,4 +47,26 @@ async def delete_me(
     service = UserService(session, settings, registry)
     await service.deactivate_user(current_user)
     await session.commit()
-    return MessageResponse(message="Account deactivated")
+    return MessageResponse(message="Account deactivated")
+
+
+@router.get("/me/activity", response_model=AuditEventPage)
+async def my_activity(
+    action: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    cursor: str | None = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user=Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+    settings=Depends(get_settings),
+):
+    events, next_cursor = await AuditService(session, settings).list_events(
+        user_id=str(current_user.id),
+        action=action,
+        since=since,
+        until=until,
+        cursor=cursor,
+        limit=limit,
+    )
+    return AuditEventPage(items=events, next_cursor=next_cursor)
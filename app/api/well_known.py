@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, Request, Response
+
+from app.core.config import get_settings
+from app.security.keys import get_key_ring
+
+router = APIRouter()
+
+
+@router.get("/.well-known/jwks.json", include_in_schema=False)
+async def jwks(request: Request, settings=Depends(get_settings)) -> Response:
+    body, etag = get_key_ring(settings).jwks_document()
+    headers = {
+        "Cache-Control": f"public, max-age={settings.JWT_JWKS_MAX_AGE_SECONDS}",
+        "ETag": etag,
+    }
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 from functools import lru_cache
-from pydantic import Field, field_validator
+from typing import Any
+from pydantic import Field, field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -14,12 +15,25 @@ class Settings(BaseSettings):
     PUBLIC_BASE_URL: str = "http://localhost:8000"
 
     SECRET_KEY: str = Field(..., min_length=32)
+    TOKEN_HASH_KEY_ID: str = "k1"
+    TOKEN_HASH_KEYS: dict[str, str] = {}
     JWT_ALGORITHM: str = "HS256"
+    JWT_SIGNING_KEYS: list[dict[str, str]] = []
+    JWT_JWKS_MAX_AGE_SECONDS: int = 300
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    REFRESH_GRACE_SECONDS: int = 10
+    REFRESH_SESSION_BACKEND: str = "sql"
+    REFRESH_SESSION_MAX_PER_USER: int = 20
+    REFRESH_SESSION_FLUSH_INTERVAL_SECONDS: float = 1.0
+    REFRESH_SESSION_FLUSH_BATCH: int = 500
+    REFRESH_SESSION_HISTORY_MAX_PER_USER: int = 1000
     EMAIL_VERIFY_EXPIRE_HOURS: int = 24
     PASSWORD_RESET_EXPIRE_HOURS: int = 2
     EMAIL_CHANGE_EXPIRE_HOURS: int = 2
+    VERIFICATION_TOKEN_COALESCE_SECONDS: int = 300
+    INVITATION_EXPIRE_DAYS: int = 7
+    INVITATION_BATCH_MAX_SIZE: int = 5000
 
     EMAIL_VERIFY_PATH: str = "/verify-email"
     PASSWORD_RESET_PATH: str = "/reset-password"
@@ -29,6 +43,16 @@ class Settings(BaseSettings):
     REDIS_URL: str | None = None
     REDIS_REQUIRED: bool = True
 
+    PRINCIPAL_CACHE_ENABLED: bool = True
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_LOCAL_TTL_SECONDS: int = 5
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+
+    TOKEN_REVOCATION_ENABLED: bool = True
+    TOKEN_REVOCATION_BLOOM_CAPACITY: int = 100000
+    TOKEN_REVOCATION_BLOOM_ERROR_RATE: float = 0.001
+    TOKEN_REVOCATION_REBUILD_SECONDS: int = 300
+
     ALLOWED_ORIGINS: list[str] = []
 
     USE_COOKIE_AUTH: bool = False
@@ -44,6 +68,17 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: str
     SMTP_USE_TLS: bool = True
     EMAIL_FROM: str
+    SMTP_POOL_SIZE: int = 4
+    SMTP_POOL_MAX_MESSAGES_PER_CONNECTION: int = 100
+    SMTP_POOL_IDLE_CHECK_SECONDS: float = 30.0
+    EMAIL_OUTBOX_BATCH_SIZE: int = 50
+    EMAIL_OUTBOX_CONCURRENCY: int = 4
+    EMAIL_OUTBOX_POLL_INTERVAL_SECONDS: float = 5.0
+    EMAIL_OUTBOX_LEASE_SECONDS: int = 300
+    EMAIL_OUTBOX_MAX_ATTEMPTS: int = 8
+    EMAIL_OUTBOX_BACKOFF_BASE_SECONDS: float = 30.0
+    EMAIL_OUTBOX_BACKOFF_MAX_SECONDS: float = 3600.0
+    EMAIL_OUTBOX_RETENTION_DAYS: int = 7
 
     GOOGLE_CLIENT_ID: str | None = None
     GOOGLE_CLIENT_SECRET: str | None = None
@@ -55,12 +90,49 @@ class Settings(BaseSettings):
     OAUTH_STATE_TTL_SECONDS: int = 600
 
     RATE_LIMIT_LOGIN_PER_MINUTE: int = 10
+    RATE_LIMIT_LOGIN_PER_EMAIL_PER_MINUTE: int = 10
     RATE_LIMIT_REGISTER_PER_HOUR: int = 5
     RATE_LIMIT_RESET_PER_HOUR: int = 5
     RATE_LIMIT_GLOBAL_PER_MINUTE: int = 120
+    RATE_LIMIT_GLOBAL_AUTHENTICATED_PER_MINUTE: int = 1200
+    RATE_LIMIT_USER_PER_MINUTE: int = 300
+    RATE_LIMIT_ORG_PER_MINUTE: int = 3000
+    RATE_LIMIT_IPV4_PREFIX: int = 32
+    RATE_LIMIT_IPV6_PREFIX: int = 64
+    RATE_LIMIT_API_KEY_HEADER: str = "X-API-Key"
+    RATE_LIMIT_POLICIES: list[dict[str, Any]] = []
+    RATE_LIMIT_ORG_TIERS: dict[str, str] = {}
+    RATE_LIMIT_MODE: str = "exact"
+    RATE_LIMIT_SYNC_INTERVAL_MS: int = 250
+    RATE_LIMIT_SYNC_HITS: int = 1000
+    RATE_LIMIT_LOCAL_FRACTION: float = 0.5
+
+    SHARED_STATE_ENABLED: bool = True
+    SHARED_STATE_DIR: str | None = None
+    SHARED_STATE_NAMESPACE: str = "uam"
+    SHARED_STATE_RATE_LIMIT_SLOTS: int = 65536
+    SHARED_STATE_OAUTH_SLOTS: int = 4096
 
     LOCKOUT_THRESHOLD: int = 5
     LOCKOUT_DURATION_MINUTES: int = 15
+    LOCKOUT_WINDOW_MINUTES: int = 15
+    LAST_LOGIN_UPDATE_INTERVAL_SECONDS: int = 300
+
+    PASSWORD_HASH_PROFILE: str = "standard"
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST_KIB: int = 65536
+    ARGON2_PARALLELISM: int = 4
+    ARGON2_CALIBRATE: bool = False
+    ARGON2_CALIBRATION_TARGET_MS: int = 250
+    ARGON2_CALIBRATION_MAX_TIME_COST: int = 10
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MEMORY_BUDGET_MB: int = 512
+    PASSWORD_HASH_MAX_QUEUE: int = 100
+    PASSWORD_HASH_MAX_WAIT_MS: int = 3000
+    USER_IMPORT_BATCH_SIZE: int = 500
+    USER_IMPORT_STALE_SECONDS: int = 300
+    USER_IMPORT_MAX_RECORD_LENGTH: int = 65536
+    USER_IMPORT_VERIFIED_DOMAINS: dict[str, list[str]] = {}
 
     PASSWORD_MIN_LENGTH: int = 12
     PASSWORD_MAX_LENGTH: int = 128
@@ -72,6 +144,14 @@ class Settings(BaseSettings):
     ALLOWED_EMAIL_DOMAINS: list[str] = []
 
     AUDIT_LOG_ENABLED: bool = True
+    AUDIT_QUEUE_MAX_SIZE: int = 10000
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL_MS: int = 500
+    AUDIT_SAMPLE_RATES: dict[str, float] = {}
+    AUDIT_PARTITION_INTERVAL: str = "month"
+    AUDIT_PARTITION_PREMAKE: int = 3
+    AUDIT_RETENTION_DAYS: int = 0
+    AUDIT_PARTITION_MAINTENANCE_INTERVAL_SECONDS: int = 3600
     METRICS_ENABLED: bool = True
     LOG_LEVEL: str = "INFO"
 
@@ -98,7 +178,14 @@ class Settings(BaseSettings):
             return [item.strip() for item in value.split(",") if item.strip()]
         return value
 
+    @model_validator(mode="after")
+    def _check_production(self):
+        # The low profile exists for tests; in production it would make stolen hashes cheap to crack.
+        if self.ENV.lower() in ("prod", "production") and self.PASSWORD_HASH_PROFILE == "low":
+            raise ValueError("PASSWORD_HASH_PROFILE=low is not allowed in production")
+        return self
+
 
 @lru_cache
 def get_settings() -> Settings:
-    return Settings()
+    return Settings()
@@ -5,10 +5,13 @@ from fastapi import Request
 
 
 class AppError(Exception):
-    def __init__(self, detail: str, status_code: int = 400, code: str = "error"):
+    def __init__(
+        self, detail: str, status_code: int = 400, code: str = "error", headers: dict[str, str] | None = None
+    ):
         self.detail = detail
         self.status_code = status_code
         self.code = code
+        self.headers = headers
         super().__init__(detail)
 
 
@@ -38,12 +41,20 @@ class ValidationError(AppError):
 
 
 class RateLimitError(AppError):
-    def __init__(self, detail: str = "Rate limit exceeded", code: str = "rate_limited"):
-        super().__init__(detail, status_code=429, code=code)
+    def __init__(
+        self, detail: str = "Rate limit exceeded", code: str = "rate_limited", headers: dict[str, str] | None = None
+    ):
+        super().__init__(detail, status_code=429, code=code, headers=headers)
+
+
+class ServiceUnavailableError(AppError):
+    def __init__(self, detail: str = "Service temporarily unavailable", code: str = "service_unavailable"):
+        super().__init__(detail, status_code=503, code=code)
 
 
 def app_error_handler(request: Request, exc: AppError) -> JSONResponse:
     return JSONResponse(
         status_code=exc.status_code,
         content={"error": {"code": exc.code, "message": exc.detail}},
-    )
+        headers=exc.headers,
+    )
@@ -1,15 +1,28 @@
 from __future__ import annotations
 
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.v1.api import api_router
 from app.api.web import router as web_router
+from app.api.well_known import router as well_known_router
 from app.core.config import get_settings
 from app.core.exceptions import app_error_handler, AppError
 from app.core.logging import setup_logging
 from app.db.redis import init_redis, close_redis
+from app.security.hashing import init_password_hashing
+from app.security.hashing_executor import get_password_hasher
+from app.security.principal import get_principal_cache
+from app.services.audit_partitions import get_audit_partition_manager
+from app.services.audit_writer import get_audit_writer
+from app.services.email_outbox import get_email_outbox_worker
+from app.services.rate_limit_service import get_rate_limiter
+from app.services.smtp_pool import get_smtp_pool
+from app.security.refresh_flight import get_refresh_single_flight
+from app.security.revocation import get_token_revocation
+from app.security.refresh_sessions import get_refresh_session_history_writer, get_refresh_session_store
 from app.middleware.request_id import RequestIdMiddleware
 from app.middleware.logging import LoggingMiddleware
 from app.middleware.tenant import TenantContextMiddleware
@@ -23,7 +36,31 @@ setup_logging(settings)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_redis(settings, app)
+    get_rate_limiter().attach(app.state.redis)
+    await asyncio.to_thread(init_password_hashing, settings)
+    await get_principal_cache().start(app.state.redis)
+    await get_audit_partition_manager().start()
+    await get_audit_writer().start()
+    await get_email_outbox_worker().start()
+    await get_refresh_single_flight().start(app.state.redis)
+    await get_token_revocation().start(app.state.redis)
+    if settings.REFRESH_SESSION_BACKEND == "redis":
+        if app.state.redis is None:
+            raise AppError("REFRESH_SESSION_BACKEND=redis requires Redis", status_code=500, code="redis_required")
+        await get_refresh_session_store().start(app.state.redis)
+        await get_refresh_session_history_writer().start(app.state.redis)
     yield
+    await get_refresh_session_history_writer().stop()
+    await get_refresh_session_store().stop()
+    await get_token_revocation().stop()
+    await get_refresh_single_flight().stop()
+    await get_principal_cache().stop()
+    await get_email_outbox_worker().stop()
+    await get_smtp_pool().close()
+    await get_audit_writer().stop()
+    await get_audit_partition_manager().stop()
+    get_password_hasher().shutdown()
+    await get_rate_limiter().stop()
     await close_redis(app)
 
 
@@ -55,4 +92,5 @@ app.add_middleware(
 )
 
 app.include_router(web_router)
+app.include_router(well_known_router)
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
@@ -4,15 +4,21 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 from starlette.responses import Response
 
-from app.core.config import get_settings
-from app.db.redis import get_redis
-from app.services.rate_limit_service import RateLimiter
+from app.core.exceptions import RateLimitError, app_error_handler
+from app.services.rate_limit_policy import get_rate_limit_policy_engine
+from app.services.rate_limit_service import get_rate_limiter
 
 
 class GlobalRateLimitMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next) -> Response:
-        settings = get_settings()
-        limiter = RateLimiter(get_redis(request))
-        ip = request.client.host if request.client else "unknown"
-        await limiter.hit(f"global:{ip}", settings.RATE_LIMIT_GLOBAL_PER_MINUTE, 60)
-        return await call_next(request)
+        limits = get_rate_limit_policy_engine().limits_for(request)
+        if not limits:
+            return await call_next(request)
+        # Every policy that applies to this request is checked in one limiter call and admits or rejects it together.
+        result = await get_rate_limiter().check(*limits)
+        if not result.allowed:
+            # Exception handlers sit inside the middleware stack, so the 429 is rendered here.
+            return app_error_handler(request, RateLimitError(headers=result.headers()))
+        response = await call_next(request)
+        response.headers.update(result.headers())
+        return response
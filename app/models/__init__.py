@@ -8,6 +8,9 @@ from .organization import Organization
 from .membership import Membership
 from .invitation import Invitation
 from .audit_event import AuditEvent
+from .audit_rollup import AuditRollup, NO_ORG_ID
+from .user_import import UserImportJob, UserImportResult
+from .email_outbox import EmailOutboxMessage
 
 __all__ = [
     "Role",
@@ -22,4 +25,9 @@ __all__ = [
     "Membership",
     "Invitation",
     "AuditEvent",
-]
+    "AuditRollup",
+    "NO_ORG_ID",
+    "UserImportJob",
+    "UserImportResult",
+    "EmailOutboxMessage",
+]
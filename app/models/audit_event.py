@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import uuid
-from sqlalchemy import String, DateTime, ForeignKey, func
+from sqlalchemy import String, DateTime, ForeignKey, func, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base
@@ -18,6 +18,15 @@ class AuditEvent(Base):
     ip_address: Mapped[str | None] = mapped_column(String(64), nullable=True)
     user_agent: Mapped[str | None] = mapped_column(String(512), nullable=True)
     event_metadata: Mapped[dict] = mapped_column("metadata", JSONB_TYPE, default=dict, nullable=False)
-    created_at: Mapped = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at: Mapped = mapped_column(
+        DateTime(timezone=True), primary_key=True, server_default=func.now(), nullable=False
+    )
 
-    user = relationship("User", back_populates="audit_events")
+    user = relationship("User", back_populates="audit_events")
+
+    # On PostgreSQL the table is range-partitioned on created_at (see AuditPartitionManager).
+    __table_args__ = (
+        Index("ix_audit_events_created_at", "created_at", postgresql_using="brin"),
+        Index("ix_audit_events_org_created", "org_id", "created_at", "id"),
+        Index("ix_audit_events_user_created", "user_id", "created_at", "id"),
+    )
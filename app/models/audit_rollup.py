@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+import uuid
+from datetime import datetime
+from sqlalchemy import BigInteger, String, DateTime
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from app.db.types import UUID_TYPE
+
+# Events without an organization roll up under the nil UUID (primary key columns cannot be NULL).
+NO_ORG_ID = uuid.UUID(int=0)
+
+
+class AuditRollup(Base):
+    __tablename__ = "audit_rollups"
+
+    org_id: Mapped[uuid.UUID] = mapped_column(UUID_TYPE, primary_key=True)
+    action: Mapped[str] = mapped_column(String(255), primary_key=True)
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    count: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
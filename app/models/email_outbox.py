@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import uuid
+from sqlalchemy import String, DateTime, Integer, func, Index, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from app.db.types import UUID_TYPE, JSONB_TYPE
+
+
+class EmailOutboxMessage(Base):
+    __tablename__ = "email_outbox"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID_TYPE, primary_key=True, default=uuid.uuid4)
+    # Name of the EmailService sender; payload holds its arguments until the message is delivered.
+    kind: Mapped[str] = mapped_column(String(64), nullable=False)
+    recipient: Mapped[str] = mapped_column(String(320), nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB_TYPE, default=dict, nullable=False)
+    status: Mapped[str] = mapped_column(String(16), default="pending", nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    next_attempt_at: Mapped = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    locked_until: Mapped = mapped_column(DateTime(timezone=True), nullable=True)
+    last_error: Mapped[str | None] = mapped_column(String(512), nullable=True)
+    created_at: Mapped = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    sent_at: Mapped = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_email_outbox_due",
+            "next_attempt_at",
+            postgresql_where=text("status IN ('pending', 'sending')"),
+            sqlite_where=text("status IN ('pending', 'sending')"),
+        ),
+        Index("ix_email_outbox_created_at", "created_at"),
+    )
@@ -23,8 +23,16 @@ class Invitation(Base):
     token_hash: Mapped[str] = mapped_column(String(255), nullable=False)
     expires_at: Mapped = mapped_column(DateTime(timezone=True), nullable=False)
     accepted_at: Mapped = mapped_column(DateTime(timezone=True), nullable=True)
+    revoked_at: Mapped = mapped_column(DateTime(timezone=True), nullable=True)
     created_at: Mapped = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     organization = relationship("Organization", back_populates="invitations")
 
-    __table_args__ = (Index("ix_invitations_org_id", "org_id"),)
+    __table_args__ = (
+        Index("ix_invitations_org_id", "org_id"),
+        Index("ix_invitations_org_created", "org_id", "created_at", "id"),
+    )
+
+
+# Batch invites dedupe on case-insensitive email within an organization.
+Index("ix_invitations_org_email", Invitation.org_id, func.lower(Invitation.email))
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 import uuid
-from sqlalchemy import String, Boolean, DateTime, Integer, func
+from sqlalchemy import String, Boolean, DateTime, Integer, func, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base
@@ -22,6 +22,7 @@ class User(Base):
     is_verified: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     custom_fields: Mapped[dict] = mapped_column(JSONB_TYPE, default=dict, nullable=False)
     custom_schema_version: Mapped[int] = mapped_column(Integer, default=1, nullable=False)
+    token_epoch: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
     created_at: Mapped = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at: Mapped = mapped_column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
@@ -37,4 +38,14 @@ class User(Base):
     external_identities = relationship("ExternalIdentity", back_populates="user", cascade="all, delete-orphan")
     refresh_tokens = relationship("RefreshToken", back_populates="user", cascade="all, delete-orphan")
     memberships = relationship("Membership", back_populates="user", cascade="all, delete-orphan")
-    audit_events = relationship("AuditEvent", back_populates="user", cascade="all, delete-orphan")
+    audit_events = relationship("AuditEvent", back_populates="user", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),
+        # Serves `normalized_email LIKE 'prefix%'` regardless of the database collation.
+        Index(
+            "ix_users_normalized_email_prefix",
+            "normalized_email",
+            postgresql_ops={"normalized_email": "varchar_pattern_ops"},
+        ),
+    )
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import uuid
+from sqlalchemy import String, DateTime, ForeignKey, Integer, func, Index
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+from app.db.types import UUID_TYPE
+
+
+class UserImportJob(Base):
+    __tablename__ = "user_import_jobs"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID_TYPE, primary_key=True, default=uuid.uuid4)
+    org_id: Mapped = mapped_column(UUID_TYPE, ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False)
+    created_by: Mapped = mapped_column(UUID_TYPE, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    format: Mapped[str] = mapped_column(String(16), nullable=False)
+    status: Mapped[str] = mapped_column(String(16), nullable=False, default="running")
+    # Data rows (1-based, header excluded) fully committed; a resumed upload skips these.
+    processed_rows: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    skipped_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    failed_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    error: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    created_at: Mapped = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at: Mapped = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    completed_at: Mapped = mapped_column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (Index("ix_user_import_jobs_org_id", "org_id"),)
+
+
+class UserImportResult(Base):
+    __tablename__ = "user_import_results"
+
+    job_id: Mapped = mapped_column(
+        UUID_TYPE, ForeignKey("user_import_jobs.id", ondelete="CASCADE"), primary_key=True
+    )
+    row_number: Mapped[int] = mapped_column(Integer, primary_key=True)
+    email: Mapped[str | None] = mapped_column(String(320), nullable=True)
+    status: Mapped[str] = mapped_column(String(16), nullable=False)
+    code: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    user_id: Mapped = mapped_column(UUID_TYPE, nullable=True)
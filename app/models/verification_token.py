@@ -28,4 +28,7 @@ class VerificationToken(Base):
     expires_at: Mapped = mapped_column(DateTime(timezone=True), nullable=False)
     used_at: Mapped = mapped_column(DateTime(timezone=True), nullable=True)
 
-    __table_args__ = (Index("ix_verification_tokens_type", "token_type"),)
+    __table_args__ = (
+        Index("ix_verification_tokens_type", "token_type"),
+        Index("ix_verification_tokens_user_type_created", "user_id", "token_type", "created_at"),
+    )
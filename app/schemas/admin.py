@@ -9,10 +9,49 @@ from app.schemas.common import APIModel
 class AdminUserRead(APIModel):
     id: UUID
     email: EmailStr
+    display_name: str | None = None
     is_active: bool
     is_verified: bool
     created_at: datetime
 
 
+class AdminUserPage(APIModel):
+    items: list[AdminUserRead]
+    next_cursor: str | None = None
+
+
 class AdminDisableRequest(APIModel):
-    disable: bool
+    disable: bool
+
+
+class UserImportJobRead(APIModel):
+    id: UUID
+    org_id: UUID
+    format: str
+    status: str
+    processed_rows: int
+    created_count: int
+    skipped_count: int
+    failed_count: int
+    error: str | None
+    created_at: datetime
+    updated_at: datetime
+    completed_at: datetime | None
+
+
+class UserImportResultRead(APIModel):
+    row_number: int
+    email: str | None
+    status: str
+    code: str | None
+    user_id: UUID | None
+
+
+class UserImportReport(APIModel):
+    job: UserImportJobRead
+    failures: list[UserImportResultRead]
+
+
+class UserImportResultPage(APIModel):
+    items: list[UserImportResultRead]
+    next_cursor: str | None = None
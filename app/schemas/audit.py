@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from datetime import datetime
+from uuid import UUID
+
+from pydantic import Field
+
+from app.schemas.common import APIModel
+
+
+class AuditEventRead(APIModel):
+    id: UUID
+    user_id: UUID | None
+    org_id: UUID | None
+    action: str
+    ip_address: str | None
+    user_agent: str | None
+    metadata: dict = Field(validation_alias="event_metadata")
+    created_at: datetime
+
+
+class AuditEventPage(APIModel):
+    items: list[AuditEventRead]
+    next_cursor: str | None = None
+
+
+class AuditStatsBucket(APIModel):
+    bucket: datetime
+    action: str
+    count: int
+
+
+class AuditStatsResponse(APIModel):
+    granularity: str
+    since: datetime
+    until: datetime
+    items: list[AuditStatsBucket]
+    totals: dict[str, int]
@@ -29,6 +29,10 @@ class PasswordResetRequest(APIModel):
     email: EmailStr
 
 
+class ResendVerificationRequest(APIModel):
+    email: EmailStr
+
+
 class PasswordResetConfirm(APIModel):
     token: str
     new_password: str
@@ -60,4 +64,4 @@ class OAuthAuthorizeResponse(APIModel):
 class OAuthCallbackRequest(APIModel):
     code: str
     state: str
-    redirect_uri: str | None = None
+    redirect_uri: str | None = None
@@ -2,7 +2,8 @@ from __future__ import annotations
 
 from datetime import datetime
 from uuid import UUID
-from pydantic import EmailStr
+from pydantic import EmailStr, Field
+from app.models.enums import Role
 from app.schemas.common import APIModel
 
 
@@ -33,5 +34,41 @@ class InviteResponse(APIModel):
     message: str
 
 
+class BatchInviteItem(APIModel):
+    email: str
+    role: Role = Role.MEMBER
+
+
+class BatchInviteRequest(APIModel):
+    invitations: list[BatchInviteItem] = Field(min_length=1)
+
+
+class SkippedInvite(APIModel):
+    email: str
+    reason: str
+
+
+class BatchInviteResponse(APIModel):
+    invited: int
+    skipped: list[SkippedInvite]
+
+
+class InvitationRead(APIModel):
+    id: UUID
+    email: str
+    role: Role
+    status: str
+    inviter_user_id: UUID | None
+    expires_at: datetime
+    accepted_at: datetime | None
+    revoked_at: datetime | None
+    created_at: datetime
+
+
+class InvitationPage(APIModel):
+    items: list[InvitationRead]
+    next_cursor: str | None = None
+
+
 class InvitationAcceptRequest(APIModel):
-    token: str
+    token: str
@@ -18,4 +18,6 @@ class TokenPayload(APIModel):
     org_id: str
     scopes: list[str]
     iat: int
-    exp: int
+    exp: int
+    jti: str | None = None
+    epoch: int = 0
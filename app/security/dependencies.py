@@ -3,15 +3,17 @@ from __future__ import annotations
 from fastapi import Depends, HTTPException, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import joinedload, raiseload
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import get_settings, Settings
 from app.db.session import get_session
-from app.models import User, Membership, Organization, Role
+from app.models import User, Organization, Role
 from app.schemas.token import TokenPayload
 from app.security.jwt import decode_access_token
 from app.security.permissions import resolve_scopes
+from app.security.principal import Principal, get_principal_cache, load_principal
+from app.security.revocation import get_token_revocation
 from app.utils.context import org_id_ctx
 
 bearer = HTTPBearer(auto_error=False)
@@ -24,50 +26,84 @@ async def get_token_payload(
     if not credentials:
         raise HTTPException(status_code=401, detail="Not authenticated")
     try:
-        payload = decode_access_token(settings, credentials.credentials)
-        return TokenPayload(**payload)
+        payload = TokenPayload(**decode_access_token(settings, credentials.credentials))
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if await get_token_revocation().is_revoked(payload):
+        raise HTTPException(status_code=401, detail="Token revoked")
+    return payload
 
 
-async def get_current_user(
-    payload: TokenPayload = Depends(get_token_payload),
-    session: AsyncSession = Depends(get_session),
-) -> User:
-    result = await session.execute(
-        select(User).options(selectinload(User.credential)).where(User.id == payload.sub)
-    )
+async def get_optional_token_payload(
+    credentials: HTTPAuthorizationCredentials | None = Depends(bearer),
+    settings: Settings = Depends(get_settings),
+) -> TokenPayload | None:
+    if not credentials:
+        return None
+    try:
+        return await get_token_payload(credentials, settings)
+    except HTTPException:
+        return None
+
+
+async def _load_active_user(session: AsyncSession, user_id: str, with_credential: bool) -> User:
+    loader = joinedload(User.credential) if with_credential else raiseload(User.credential)
+    result = await session.execute(select(User).options(loader).where(User.id == user_id))
     user = result.scalar_one_or_none()
     if not user or not user.is_active:
         raise HTTPException(status_code=401, detail="User inactive or not found")
     return user
 
 
-async def get_current_membership(
+async def get_current_user(
+    payload: TokenPayload = Depends(get_token_payload),
+    session: AsyncSession = Depends(get_session),
+) -> User:
+    return await _load_active_user(session, payload.sub, with_credential=False)
+
+
+async def get_current_user_with_credential(
+    payload: TokenPayload = Depends(get_token_payload),
+    session: AsyncSession = Depends(get_session),
+) -> User:
+    return await _load_active_user(session, payload.sub, with_credential=True)
+
+
+async def get_current_principal(
     request: Request,
     payload: TokenPayload = Depends(get_token_payload),
     session: AsyncSession = Depends(get_session),
-) -> Membership:
+) -> Principal:
     org_id = request.headers.get("X-Org-Id") or payload.org_id
     if not org_id:
         raise HTTPException(status_code=400, detail="Organization context required")
     org_id_ctx.set(org_id)
-    result = await session.execute(
-        select(Membership).where(Membership.user_id == payload.sub, Membership.org_id == org_id)
-    )
-    membership = result.scalar_one_or_none()
-    if not membership:
+    cache = get_principal_cache()
+    principal = await cache.get(payload.sub, org_id)
+    if principal is None:
+        generation = await cache.generation(payload.sub)
+        principal = await load_principal(session, payload.sub, org_id)
+        if principal is not None:
+            await cache.set(principal, generation)
+    if not principal or not principal.is_active:
+        raise HTTPException(status_code=401, detail="User inactive or not found")
+    if principal.role is None:
         raise HTTPException(status_code=403, detail="No membership for organization")
-    return membership
+    if not principal.org_active:
+        raise HTTPException(status_code=403, detail="Organization inactive or not found")
+    return principal
+
+
+async def get_current_membership(principal: Principal = Depends(get_current_principal)) -> Principal:
+    return principal
 
 
 async def get_current_org(
-    membership: Membership = Depends(get_current_membership),
+    principal: Principal = Depends(get_current_principal),
     session: AsyncSession = Depends(get_session),
 ) -> Organization:
-    result = await session.execute(select(Organization).where(Organization.id == membership.org_id))
-    org = result.scalar_one_or_none()
-    if not org or not org.is_active:
+    org = await session.get(Organization, principal.org_id)
+    if not org:
         raise HTTPException(status_code=403, detail="Organization inactive or not found")
     return org
 
@@ -84,4 +120,4 @@ def require_scopes(required: list[str]):
 
 def resolve_token_scopes(payload: TokenPayload) -> list[str]:
     role = Role(payload.role)
-    return resolve_scopes(role)
+    return resolve_scopes(role)
@@ -1,21 +1,162 @@
 from __future__ import annotations
 
+import hashlib
+import hmac
+import time
+from dataclasses import dataclass, replace
+
 from passlib.context import CryptContext
 
-_pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+from app.core.config import Settings, get_settings
+
+TOKEN_DIGEST_SCHEME = "hmac-sha256"
+
+
+@dataclass(frozen=True)
+class Argon2Params:
+    time_cost: int
+    memory_cost: int
+    parallelism: int
+
+
+LOW_COST_ARGON2 = Argon2Params(time_cost=1, memory_cost=1024, parallelism=1)
+
+IMPORTABLE_HASH_SCHEMES = ("argon2", "bcrypt")
+
+_pwd_context: CryptContext | None = None
+
+
+def argon2_params(settings: Settings) -> Argon2Params:
+    if settings.PASSWORD_HASH_PROFILE == "low":
+        return LOW_COST_ARGON2
+    return Argon2Params(
+        time_cost=settings.ARGON2_TIME_COST,
+        memory_cost=settings.ARGON2_MEMORY_COST_KIB,
+        parallelism=settings.ARGON2_PARALLELISM,
+    )
+
+
+def _build_context(params: Argon2Params) -> CryptContext:
+    return CryptContext(
+        # bcrypt is only verified (imported legacy hashes); "auto" deprecates it so logins rehash to argon2.
+        schemes=["argon2", "bcrypt"],
+        deprecated="auto",
+        argon2__rounds=params.time_cost,
+        argon2__memory_cost=params.memory_cost,
+        argon2__parallelism=params.parallelism,
+    )
+
+
+def configure_password_hashing(params: Argon2Params) -> None:
+    global _pwd_context
+    _pwd_context = _build_context(params)
+
+
+def _password_context() -> CryptContext:
+    if _pwd_context is None:
+        configure_password_hashing(argon2_params(get_settings()))
+    return _pwd_context
+
+
+def current_argon2_params() -> Argon2Params:
+    handler = _password_context().handler("argon2")
+    return Argon2Params(
+        time_cost=int(handler.default_rounds),
+        memory_cost=int(handler.memory_cost),
+        parallelism=int(handler.parallelism),
+    )
+
+
+def calibrate_argon2(base: Argon2Params, target_ms: int, max_time_cost: int) -> Argon2Params:
+    for time_cost in range(1, max_time_cost + 1):
+        candidate = replace(base, time_cost=time_cost)
+        context = _build_context(candidate)
+        start = time.perf_counter()
+        context.hash("calibration-password")
+        if (time.perf_counter() - start) * 1000 >= target_ms:
+            return candidate
+    return replace(base, time_cost=max_time_cost)
+
+
+def init_password_hashing(settings: Settings) -> Argon2Params:
+    params = argon2_params(settings)
+    if settings.ARGON2_CALIBRATE and settings.PASSWORD_HASH_PROFILE != "low":
+        params = calibrate_argon2(
+            params, settings.ARGON2_CALIBRATION_TARGET_MS, settings.ARGON2_CALIBRATION_MAX_TIME_COST
+        )
+    configure_password_hashing(params)
+    return params
 
 
 def hash_password(password: str) -> str:
-    return _pwd_context.hash(password)
+    return _password_context().hash(password)
 
 
 def verify_password(password: str, password_hash: str) -> bool:
-    return _pwd_context.verify(password, password_hash)
+    return _password_context().verify(password, password_hash)
+
+
+def is_importable_password_hash(password_hash: str) -> bool:
+    context = _password_context()
+    scheme = context.identify(password_hash, required=False)
+    if scheme not in IMPORTABLE_HASH_SCHEMES:
+        return False
+    try:
+        context.handler(scheme).from_string(password_hash)
+    except ValueError:
+        return False
+    return True
+
+
+def password_needs_update(password_hash: str) -> bool:
+    context = _password_context()
+    if context.identify(password_hash) != "argon2":
+        return context.needs_update(password_hash)
+    handler = context.handler("argon2")
+    stored = handler.from_string(password_hash)
+    # Only upgrade: workers that calibrated slightly differently must not rehash back and forth.
+    return (
+        stored.type != handler.type
+        or stored.memory_cost < handler.memory_cost
+        or stored.rounds < handler.default_rounds
+    )
+
+
+def password_hash_memory_kib() -> int:
+    return current_argon2_params().memory_cost
+
+
+def _token_key(settings: Settings, key_id: str) -> bytes:
+    key = settings.TOKEN_HASH_KEYS.get(key_id)
+    if key:
+        return key.encode()
+    return hmac.new(settings.SECRET_KEY.encode(), f"token-hash:{key_id}".encode(), hashlib.sha256).digest()
+
+
+def _token_digest(settings: Settings, token: str, key_id: str) -> str:
+    return hmac.new(_token_key(settings, key_id), token.encode(), hashlib.sha256).hexdigest()
+
+
+def hash_token(settings: Settings, token: str) -> str:
+    key_id = settings.TOKEN_HASH_KEY_ID
+    return f"{TOKEN_DIGEST_SCHEME}${key_id}${_token_digest(settings, token, key_id)}"
+
+
+def is_legacy_token_hash(token_hash: str) -> bool:
+    # Rows written before keyed digests were introduced hold argon2 hashes.
+    return _password_context().identify(token_hash, required=False) == "argon2"
 
 
-def hash_token(token: str) -> str:
-    return _pwd_context.hash(token)
+def verify_token(settings: Settings, token: str, token_hash: str) -> bool:
+    # Keyed digests only; legacy argon2 rows are checked through PasswordHashingExecutor.verify_token.
+    scheme, _, rest = token_hash.partition("$")
+    if scheme != TOKEN_DIGEST_SCHEME:
+        return False
+    key_id, _, digest = rest.partition("$")
+    if not key_id or not digest:
+        return False
+    return hmac.compare_digest(digest, _token_digest(settings, token, key_id))
 
 
-def verify_token(token: str, token_hash: str) -> bool:
-    return _pwd_context.verify(token, token_hash)
+def token_hash_needs_update(settings: Settings, token_hash: str) -> bool:
+    return not token_hash.startswith(f"{TOKEN_DIGEST_SCHEME}${settings.TOKEN_HASH_KEY_ID}$")
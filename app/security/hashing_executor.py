@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from enum import IntEnum
+from functools import lru_cache
+from typing import Any, Callable
+
+from app.core.config import Settings, get_settings
+from app.core.exceptions import ServiceUnavailableError
+from app.security.hashing import (
+    configure_password_hashing,
+    current_argon2_params,
+    hash_password,
+    is_legacy_token_hash,
+    password_hash_memory_kib,
+    verify_password,
+    verify_token,
+)
+
+
+class HashPriority(IntEnum):
+    LOGIN = 0
+    CREDENTIAL_CHANGE = 1
+    REGISTRATION = 2
+    BULK_IMPORT = 3
+
+
+class HashAdmission:
+    def __init__(self, slots: int, max_queue: int, max_wait_seconds: float):
+        self.slots = slots
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._free = slots
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._queued = 0
+        self._seq = itertools.count()
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    async def acquire(self, priority: int) -> None:
+        if self._free > 0 and not self._queued:
+            self._free -= 1
+            return
+        if self._queued >= self.max_queue:
+            raise ServiceUnavailableError("Too many pending password operations", code="hashing_busy")
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+        self._queued += 1
+        try:
+            await asyncio.wait({waiter}, timeout=self.max_wait_seconds)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        finally:
+            self._queued -= 1
+        if not waiter.done():
+            self._abandon(waiter)
+            raise ServiceUnavailableError("Password operation timed out in queue", code="hashing_busy")
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._free += 1
+
+    def _abandon(self, waiter: asyncio.Future) -> None:
+        if waiter.done() and not waiter.cancelled():
+            # The slot was handed over just as the caller gave up; pass it on.
+            self.release()
+        else:
+            waiter.cancel()
+
+
+class PasswordHashingExecutor:
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.workers = settings.PASSWORD_HASH_WORKERS
+        self.admission = HashAdmission(
+            slots=self._slots(),
+            max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+            max_wait_seconds=settings.PASSWORD_HASH_MAX_WAIT_MS / 1000,
+        )
+        self._pool: Executor | None = None
+
+    def _slots(self) -> int:
+        by_memory = max(1, self.settings.PASSWORD_HASH_MEMORY_BUDGET_MB * 1024 // password_hash_memory_kib())
+        return min(by_memory, self.workers or os.cpu_count() or 1)
+
+    def _executor(self) -> Executor:
+        if self._pool is None:
+            if self.workers > 0:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=configure_password_hashing,
+                    initargs=(current_argon2_params(),),
+                )
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.admission.slots, thread_name_prefix="pwhash")
+        return self._pool
+
+    async def _run(self, priority: HashPriority, fn: Callable[..., Any], *args: Any) -> Any:
+        await self.admission.acquire(priority)
+        loop = asyncio.get_running_loop()
+        try:
+            work: Future = self._executor().submit(fn, *args)
+        except BaseException:
+            self.admission.release()
+            raise
+        # Hold the slot until the worker is actually done, even if the caller goes away.
+        work.add_done_callback(lambda _: loop.call_soon_threadsafe(self.admission.release))
+        return await asyncio.wrap_future(work)
+
+    async def hash(self, password: str, priority: HashPriority = HashPriority.REGISTRATION) -> str:
+        return await self._run(priority, hash_password, password)
+
+    async def verify(self, password: str, password_hash: str, priority: HashPriority = HashPriority.LOGIN) -> bool:
+        return await self._run(priority, verify_password, password, password_hash)
+
+    async def verify_token(self, token: str, token_hash: str, priority: HashPriority = HashPriority.LOGIN) -> bool:
+        if is_legacy_token_hash(token_hash):
+            return await self._run(priority, verify_password, token, token_hash)
+        return verify_token(self.settings, token, token_hash)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+@lru_cache
+def get_password_hasher() -> PasswordHashingExecutor:
+    return PasswordHashingExecutor(get_settings())
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import uuid
 from datetime import timedelta
+
 import jwt
 
 from app.core.config import Settings
+from app.security.keys import get_key_ring
 from app.utils.time import utcnow
 
 
@@ -14,6 +17,7 @@ def create_access_token(
     role: str,
     org_id: str,
     scopes: list[str],
+    epoch: int = 0,
 ) -> tuple[str, int]:
     now = utcnow()
     expires = now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -25,10 +29,24 @@ def create_access_token(
         "scopes": scopes,
         "iat": int(now.timestamp()),
         "exp": int(expires.timestamp()),
+        "jti": uuid.uuid4().hex,
+        "epoch": epoch,
     }
-    token = jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    key_ring = get_key_ring(settings)
+    signing_key = key_ring.signing_key(now)
+    token = jwt.encode(
+        payload,
+        signing_key.signing_key,
+        algorithm=key_ring.algorithm,
+        headers={"kid": signing_key.kid},
+    )
     return token, int(settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
 
 
 def decode_access_token(settings: Settings, token: str) -> dict:
-    return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+    key_ring = get_key_ring(settings)
+    header = jwt.get_unverified_header(token)
+    key = key_ring.verification_key(header.get("kid"))
+    if key is None:
+        raise jwt.InvalidKeyError("Unknown signing key")
+    return jwt.decode(token, key, algorithms=[key_ring.algorithm])
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from cryptography.hazmat.primitives.serialization import load_pem_private_key
+from jwt.algorithms import get_default_algorithms
+
+from app.core.config import Settings
+from app.core.exceptions import AppError
+from app.utils.time import utcnow
+
+SYMMETRIC_ALGORITHMS = {"HS256", "HS384", "HS512"}
+DEFAULT_SYMMETRIC_KID = "default"
+
+
+@dataclass(frozen=True)
+class SigningKey:
+    kid: str
+    signing_key: Any
+    verification_key: Any
+    not_before: datetime | None = None
+    not_after: datetime | None = None
+    public_jwk: dict[str, Any] | None = field(default=None, compare=False)
+
+    def is_published(self, now: datetime) -> bool:
+        return self.not_after is None or now < self.not_after
+
+    def can_sign(self, now: datetime) -> bool:
+        return (self.not_before is None or self.not_before <= now) and self.is_published(now)
+
+
+class KeyRing:
+    def __init__(self, algorithm: str, keys: list[SigningKey]):
+        self.algorithm = algorithm
+        self._keys = {key.kid: key for key in keys}
+
+    @property
+    def symmetric(self) -> bool:
+        return self.algorithm in SYMMETRIC_ALGORITHMS
+
+    def signing_key(self, now: datetime | None = None) -> SigningKey:
+        now = now or utcnow()
+        candidates = [key for key in self._keys.values() if key.can_sign(now)]
+        if not candidates:
+            raise AppError("No active JWT signing key", status_code=500, code="jwt_key_unavailable")
+        return max(candidates, key=lambda key: key.not_before or datetime.min.replace(tzinfo=now.tzinfo))
+
+    def verification_key(self, kid: str | None, now: datetime | None = None) -> Any | None:
+        if kid is None and self.symmetric:
+            kid = DEFAULT_SYMMETRIC_KID
+        key = self._keys.get(kid) if kid else None
+        if not key or not key.is_published(now or utcnow()):
+            return None
+        return key.verification_key
+
+    def jwks(self, now: datetime | None = None) -> dict[str, list[dict[str, Any]]]:
+        now = now or utcnow()
+        keys = [
+            key.public_jwk
+            for key in sorted(self._keys.values(), key=lambda key: key.kid)
+            if key.public_jwk is not None and key.is_published(now)
+        ]
+        return {"keys": keys}
+
+    def jwks_document(self, now: datetime | None = None) -> tuple[bytes, str]:
+        body = json.dumps(self.jwks(now), sort_keys=True, separators=(",", ":")).encode()
+        return body, f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def _parse_time(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    # Key windows without an offset are UTC, like every other timestamp here.
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _load_private_key(entry: dict[str, str]) -> Any:
+    if entry.get("private_key"):
+        pem = entry["private_key"].encode()
+    elif entry.get("private_key_path"):
+        pem = Path(entry["private_key_path"]).read_bytes()
+    else:
+        raise AppError(f"JWT key {entry.get('kid')!r} has no private key", status_code=500, code="jwt_key_invalid")
+    return load_pem_private_key(pem, password=None)
+
+
+def load_key_ring(algorithm: str, secret_key: str, entries: list[dict[str, str]]) -> KeyRing:
+    if algorithm in SYMMETRIC_ALGORITHMS:
+        return KeyRing(algorithm, [SigningKey(DEFAULT_SYMMETRIC_KID, secret_key, secret_key)])
+
+    jwk_algorithm = get_default_algorithms()[algorithm]
+    keys: list[SigningKey] = []
+    for entry in entries:
+        kid = entry.get("kid")
+        if not kid:
+            raise AppError("JWT signing keys require a kid", status_code=500, code="jwt_key_invalid")
+        private_key = _load_private_key(entry)
+        public_key = private_key.public_key()
+        public_jwk = jwk_algorithm.to_jwk(public_key, as_dict=True)
+        public_jwk.update({"kid": kid, "alg": algorithm, "use": "sig"})
+        keys.append(
+            SigningKey(
+                kid=kid,
+                signing_key=private_key,
+                verification_key=public_key,
+                not_before=_parse_time(entry.get("not_before")),
+                not_after=_parse_time(entry.get("not_after")),
+                public_jwk=public_jwk,
+            )
+        )
+    if not keys:
+        raise AppError(f"JWT_SIGNING_KEYS is required for {algorithm}", status_code=500, code="jwt_key_unavailable")
+    return KeyRing(algorithm, keys)
+
+
+@lru_cache(maxsize=8)
+def _cached_key_ring(algorithm: str, secret_key: str, entries_json: str) -> KeyRing:
+    return load_key_ring(algorithm, secret_key, json.loads(entries_json))
+
+
+def get_key_ring(settings: Settings) -> KeyRing:
+    return _cached_key_ring(
+        settings.JWT_ALGORITHM,
+        settings.SECRET_KEY,
+        json.dumps(settings.JWT_SIGNING_KEYS, sort_keys=True),
+    )
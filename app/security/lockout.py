@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import hashlib
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.core.config import Settings
+
+# KEYS: failure counter, lock flag. ARGV: threshold, counting window (ms), lockout duration (ms).
+# Returns the lockout duration in ms when this failure trips the lock, otherwise 0.
+_RECORD_FAILURE_SCRIPT = """
+local failures = redis.call('INCR', KEYS[1])
+if failures == 1 then
+  redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+if failures >= tonumber(ARGV[1]) then
+  redis.call('SET', KEYS[2], '1', 'PX', ARGV[3])
+  redis.call('DEL', KEYS[1])
+  return tonumber(ARGV[3])
+end
+return 0
+"""
+
+
+def email_key(normalized_email: str) -> str:
+    return hashlib.sha256(normalized_email.encode()).hexdigest()[:32]
+
+
+# Failed-login counters keyed on the normalized email, kept in Redis so attacks on an account never contend on its
+# credentials row. Every method returns None when Redis is absent or failing, and the caller falls back to the row.
+class LoginLockout:
+    def __init__(self, settings: Settings, redis: Redis | None):
+        self.settings = settings
+        self.redis = redis
+        self._record = redis.register_script(_RECORD_FAILURE_SCRIPT) if redis is not None else None
+
+    async def locked_for(self, normalized_email: str) -> float | None:
+        if self.redis is None:
+            return None
+        try:
+            remaining = await self.redis.pttl(self._keys(normalized_email)[1])
+        except RedisError:
+            return None
+        return max(remaining, 0) / 1000
+
+    async def record_failure(self, normalized_email: str) -> float | None:
+        if self._record is None:
+            return None
+        args = [
+            self.settings.LOCKOUT_THRESHOLD,
+            self.settings.LOCKOUT_WINDOW_MINUTES * 60_000,
+            self.settings.LOCKOUT_DURATION_MINUTES * 60_000,
+        ]
+        try:
+            return int(await self._record(keys=self._keys(normalized_email), args=args)) / 1000
+        except RedisError:
+            return None
+
+    async def clear(self, normalized_email: str) -> None:
+        if self.redis is None:
+            return
+        try:
+            await self.redis.delete(self._keys(normalized_email)[0])
+        except RedisError:
+            pass
+
+    def _keys(self, normalized_email: str) -> list[str]:
+        # Hash-tagged so both keys share a cluster slot, as the script touches them together.
+        digest = email_key(normalized_email)
+        return [f"lockout:{{{digest}}}:failures", f"lockout:{{{digest}}}:locked"]
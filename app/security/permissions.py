@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from app.core.exceptions import ForbiddenError
 from app.models.enums import Role
 
 ROLE_SCOPES: dict[Role, list[str]] = {
@@ -13,6 +14,7 @@ ROLE_SCOPES: dict[Role, list[str]] = {
         "users:write",
         "admin:users:read",
         "admin:users:write",
+        "admin:audit:read",
     ],
     Role.MEMBER: ["profile:read", "profile:write", "orgs:read", "users:read"],
     Role.READONLY: ["profile:read", "orgs:read", "users:read"],
@@ -20,4 +22,10 @@ ROLE_SCOPES: dict[Role, list[str]] = {
 
 
 def resolve_scopes(role: Role) -> list[str]:
-    return ROLE_SCOPES.get(role, [])
+    return ROLE_SCOPES.get(role, [])
+
+
+def require_org_scope(principal, scope: str, org_id: str | None = None) -> None:
+    # Org-scoped admin endpoints act on the caller's own organization only.
+    if scope not in resolve_scopes(principal.role) or (org_id and org_id != principal.org_id):
+        raise ForbiddenError("Insufficient permissions")
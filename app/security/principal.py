@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from functools import lru_cache
+from typing import Any, Iterable
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import and_, event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import Settings, get_settings
+from app.models import User, Membership, Organization, Role
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger("app.principal")
+
+INVALIDATION_CHANNEL = "principal:invalidate"
+_PENDING_KEY = "principal_invalidations"
+_MISSING = object()
+
+# KEYS: user generation, user memberships hash, org flag. ARGV: generation seen before the principal was loaded,
+# org id, membership JSON, TTL, org flag JSON ('' to skip). Writes nothing if the user was invalidated since.
+_SET_IF_CURRENT_SCRIPT = """
+if (redis.call('GET', KEYS[1]) or '') ~= ARGV[1] then
+  return 0
+end
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+if ARGV[5] ~= '' then
+  redis.call('SET', KEYS[3], ARGV[5], 'EX', ARGV[4])
+end
+return 1
+"""
+
+Generation = tuple[int, str | None]
+
+
+class Principal:
+    __slots__ = ("user_id", "org_id", "role", "is_active", "is_verified", "org_active")
+
+    def __init__(
+        self,
+        user_id: str,
+        org_id: str,
+        role: Role | None,
+        is_active: bool,
+        is_verified: bool,
+        org_active: bool | None,
+    ):
+        self.user_id = user_id
+        self.org_id = org_id
+        self.role = role
+        self.is_active = is_active
+        self.is_verified = is_verified
+        self.org_active = org_active
+
+
+async def load_principal(session: AsyncSession, user_id: str, org_id: str) -> Principal | None:
+    result = await session.execute(
+        select(User.is_active, User.is_verified, Membership.role, Organization.is_active.label("org_active"))
+        .select_from(User)
+        .outerjoin(Membership, and_(Membership.user_id == User.id, Membership.org_id == org_id))
+        .outerjoin(Organization, Organization.id == Membership.org_id)
+        .where(User.id == user_id)
+    )
+    row = result.first()
+    if not row:
+        return None
+    return Principal(str(user_id), str(org_id), row.role, row.is_active, row.is_verified, row.org_active)
+
+
+class PrincipalCache:
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.enabled = settings.PRINCIPAL_CACHE_ENABLED
+        self.ttl_seconds = settings.PRINCIPAL_CACHE_TTL_SECONDS
+        self._users: TTLCache[str, dict[str, dict[str, Any]]] = TTLCache(
+            settings.PRINCIPAL_CACHE_MAX_ENTRIES, settings.PRINCIPAL_CACHE_LOCAL_TTL_SECONDS
+        )
+        self._orgs: TTLCache[str, bool | None] = TTLCache(
+            settings.PRINCIPAL_CACHE_MAX_ENTRIES, settings.PRINCIPAL_CACHE_LOCAL_TTL_SECONDS
+        )
+        # Bumped on every local eviction, so a principal loaded before any invalidation is never stored locally.
+        self._generation = 0
+        self.redis: Redis | None = None
+        self._set_if_current = None
+        self._subscriber: asyncio.Task | None = None
+        self._background: set[asyncio.Task] = set()
+
+    async def start(self, redis: Redis | None) -> None:
+        self.redis = redis
+        self._set_if_current = redis.register_script(_SET_IF_CURRENT_SCRIPT) if redis is not None else None
+        if redis is not None and self.enabled:
+            self._subscriber = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._subscriber:
+            self._subscriber.cancel()
+            await asyncio.gather(self._subscriber, return_exceptions=True)
+            self._subscriber = None
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+        self.redis = None
+        self._set_if_current = None
+
+    async def generation(self, user_id: str) -> Generation:
+        # Taken before loading a principal from the database and passed to set(), which drops the principal if
+        # the user was invalidated in between: otherwise a load racing a commit could cache pre-commit state.
+        remote: str | None = ""
+        if self.enabled and self.redis is not None:
+            try:
+                remote = await self.redis.get(f"principal:g:{user_id}") or ""
+            except RedisError:
+                # Unknown generation: set() will not cache what the caller loads.
+                logger.warning("principal cache unavailable, loading from the database", exc_info=True)
+                remote = None
+        return self._generation, remote
+
+    async def get(self, user_id: str, org_id: str) -> Principal | None:
+        if not self.enabled:
+            return None
+        membership = (self._users.get(user_id) or {}).get(org_id)
+        org_active = self._orgs.get(org_id, _MISSING) if membership and membership["role"] else None
+        if membership is None or org_active is _MISSING:
+            if self.redis is None:
+                return None
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.hget(f"principal:u:{user_id}", org_id)
+                    pipe.get(f"principal:o:{org_id}")
+                    raw_membership, raw_org = await pipe.execute()
+            except RedisError:
+                logger.warning("principal cache unavailable, loading from the database", exc_info=True)
+                return None
+            if raw_membership is None:
+                return None
+            membership = json.loads(raw_membership)
+            if membership["role"] and raw_org is None:
+                return None
+            org_active = json.loads(raw_org) if membership["role"] else None
+            self._store_local(user_id, org_id, membership, org_active)
+        return Principal(
+            user_id,
+            org_id,
+            Role(membership["role"]) if membership["role"] else None,
+            membership["active"],
+            membership["verified"],
+            org_active,
+        )
+
+    async def set(self, principal: Principal, generation: Generation | None = None) -> None:
+        if not self.enabled:
+            return
+        membership = {
+            "active": principal.is_active,
+            "verified": principal.is_verified,
+            "role": principal.role.value if principal.role else None,
+        }
+        if generation is not None and generation[1] is None:
+            return
+        user_key = f"principal:u:{principal.user_id}"
+        org_flag = json.dumps(principal.org_active) if principal.role else None
+        try:
+            if self.redis is not None and generation is not None:
+                stored = await self._set_if_current(
+                    keys=[f"principal:g:{principal.user_id}", user_key, f"principal:o:{principal.org_id}"],
+                    args=[generation[1], principal.org_id, json.dumps(membership), self.ttl_seconds, org_flag or ""],
+                )
+                if not stored:
+                    return
+            elif self.redis is not None:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.hset(user_key, principal.org_id, json.dumps(membership))
+                    pipe.expire(user_key, self.ttl_seconds)
+                    if org_flag is not None:
+                        pipe.set(f"principal:o:{principal.org_id}", org_flag, ex=self.ttl_seconds)
+                    await pipe.execute()
+        except RedisError:
+            logger.warning("principal cache unavailable, not caching", exc_info=True)
+            return
+        if generation is None or generation[0] == self._generation:
+            self._store_local(principal.user_id, principal.org_id, membership, principal.org_active)
+
+    def _store_local(self, user_id: str, org_id: str, membership: dict[str, Any], org_active: bool | None) -> None:
+        memberships = dict(self._users.get(user_id) or {})
+        memberships[org_id] = membership
+        self._users.set(user_id, memberships)
+        if membership["role"]:
+            self._orgs.set(org_id, org_active)
+
+    def invalidate_user_after_commit(self, session: AsyncSession, user_id: str) -> None:
+        session.info.setdefault(_PENDING_KEY, set()).add(f"u:{user_id}")
+
+    async def invalidate(self, *targets: str) -> None:
+        self._evict_local(targets)
+        if self.redis is None:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for target in targets:
+                    kind, _, ident = target.partition(":")
+                    if kind == "u":
+                        # Bumped before the delete: a racing set() either lands first and is deleted, or is refused.
+                        pipe.incr(f"principal:g:{ident}")
+                        pipe.expire(f"principal:g:{ident}", self.ttl_seconds)
+                    pipe.delete(f"principal:{kind}:{ident}")
+                    pipe.publish(INVALIDATION_CHANNEL, target)
+                await pipe.execute()
+        except RedisError:
+            # Other workers keep their entries until PRINCIPAL_CACHE_LOCAL_TTL_SECONDS runs out.
+            logger.error("principal invalidation not published for %s", sorted(targets), exc_info=True)
+
+    def invalidate_soon(self, targets: set[str]) -> None:
+        self._evict_local(targets)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.invalidate(*targets))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _evict_local(self, targets: Iterable[str]) -> None:
+        self._generation += 1
+        for target in targets:
+            kind, _, ident = target.partition(":")
+            if kind == "u":
+                self._users.pop(ident)
+            elif kind == "o":
+                self._orgs.pop(ident)
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._evict_local([message["data"]])
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("principal invalidation subscriber disconnected", exc_info=True)
+                # Messages may have been missed while disconnected.
+                self._users.clear()
+                self._orgs.clear()
+                self._generation += 1
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+@lru_cache
+def get_principal_cache() -> PrincipalCache:
+    return PrincipalCache(get_settings())
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending_invalidations(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        get_principal_cache().invalidate_soon(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_invalidations(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import time
+import uuid
+from functools import lru_cache
+from typing import Awaitable, Callable
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from redis.asyncio import Redis
+
+from app.core.config import Settings, get_settings
+from app.security.hashing import hash_token
+from app.utils.cache import TTLCache
+
+RefreshResult = tuple[str, str, int]
+
+_LOCK_TTL_MS = 5000
+_POLL_INTERVAL_SECONDS = 0.025
+_RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _result_cipher(refresh_token: str) -> AESGCM:
+    # Only a caller holding the presented token can derive the key for its cached result.
+    return AESGCM(hashlib.sha256(f"refresh-grace:{refresh_token}".encode()).digest())
+
+
+def _seal(refresh_token: str, result: RefreshResult) -> str:
+    nonce = os.urandom(12)
+    sealed = _result_cipher(refresh_token).encrypt(nonce, json.dumps(result).encode(), None)
+    return base64.b64encode(nonce + sealed).decode()
+
+
+def _open(refresh_token: str, payload: str) -> RefreshResult:
+    raw = base64.b64decode(payload)
+    access, refresh, expires_in = json.loads(_result_cipher(refresh_token).decrypt(raw[:12], raw[12:], None))
+    return access, refresh, int(expires_in)
+
+
+class RefreshSingleFlight:
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.grace_seconds = settings.REFRESH_GRACE_SECONDS
+        self._results: TTLCache[str, RefreshResult] = TTLCache(10000, self.grace_seconds)
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.redis: Redis | None = None
+
+    async def start(self, redis: Redis | None) -> None:
+        self.redis = redis
+
+    async def stop(self) -> None:
+        self.redis = None
+
+    async def run(self, refresh_token: str, rotate: Callable[[], Awaitable[RefreshResult]]) -> RefreshResult:
+        if self.grace_seconds <= 0:
+            return await rotate()
+        key = hash_token(self.settings, refresh_token)
+        cached = self._results.get(key)
+        if cached is not None:
+            return cached
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await self._lead(key, refresh_token, rotate)
+        except BaseException as exc:
+            future.set_exception(exc)
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _lead(
+        self, key: str, refresh_token: str, rotate: Callable[[], Awaitable[RefreshResult]]
+    ) -> RefreshResult:
+        if self.redis is None:
+            result = await rotate()
+            self._results.set(key, result)
+            return result
+
+        result_key = f"refresh:grace:{key}"
+        lock_key = f"refresh:lock:{key}"
+        owner = uuid.uuid4().hex
+        acquired = await self.redis.set(lock_key, owner, nx=True, px=_LOCK_TTL_MS)
+        if not acquired:
+            result = await self._await_other_instance(refresh_token, result_key, lock_key)
+            if result is not None:
+                self._results.set(key, result)
+                return result
+        try:
+            payload = await self.redis.get(result_key)
+            if payload is not None:
+                result = _open(refresh_token, payload)
+            else:
+                result = await rotate()
+                await self.redis.set(result_key, _seal(refresh_token, result), ex=self.grace_seconds)
+        finally:
+            await self.redis.eval(_RELEASE_LOCK, 1, lock_key, owner)
+        self._results.set(key, result)
+        return result
+
+    async def _await_other_instance(self, refresh_token: str, result_key: str, lock_key: str) -> RefreshResult | None:
+        deadline = time.monotonic() + _LOCK_TTL_MS / 1000
+        while time.monotonic() < deadline:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.get(result_key)
+                pipe.exists(lock_key)
+                payload, locked = await pipe.execute()
+            if payload is not None:
+                return _open(refresh_token, payload)
+            if not locked:
+                # The other instance failed; rotating ourselves surfaces the real error.
+                return None
+            await asyncio.sleep(_POLL_INTERVAL_SECONDS)
+        return None
+
+
+@lru_cache
+def get_refresh_single_flight() -> RefreshSingleFlight:
+    return RefreshSingleFlight(get_settings())
@@ -0,0 +1,424 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import uuid
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any
+
+from redis.asyncio import Redis
+from sqlalchemy import bindparam, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import Settings, get_settings
+from app.core.exceptions import ServiceUnavailableError
+from app.db.session import AsyncSessionLocal
+from app.models import RefreshToken
+
+logger = logging.getLogger("app.refresh_sessions")
+
+# Every key of one user's sessions carries the {user_id} hash tag, so each script stays within one cluster slot.
+# Token ids map to their user through an index key, written before the session itself and left to expire.
+PENDING_KEY = "rs:pending"
+_HISTORY_LOCK_KEY = "rs:history:lock"
+_HISTORY_LOCK_TTL_MS = 30000
+
+# Shared by every script below: appends an event to the user's history, dropping the oldest entries beyond the cap
+# (always the last ARGV) so the list stays bounded while the history writer is behind.
+_LOG = """
+local function log(key, event)
+    redis.call('RPUSH', key, cjson.encode(event))
+    redis.call('LTRIM', key, -tonumber(ARGV[#ARGV]), -1)
+end
+"""
+
+# KEYS: token, user, generation, history
+# ARGV: token id, session json, now, ttl seconds, max sessions, token key prefix, history cap
+_CREATE = (
+    _LOG
+    + """
+local gen = redis.call('GET', KEYS[3]) or '0'
+local now = tonumber(ARGV[3])
+local entries = redis.call('HGETALL', KEYS[2])
+local live = {}
+for i = 1, #entries, 2 do
+    local meta = cjson.decode(entries[i + 1])
+    if meta.g ~= gen or meta.e <= now then
+        redis.call('HDEL', KEYS[2], entries[i])
+        redis.call('DEL', ARGV[6] .. entries[i])
+    else
+        table.insert(live, {entries[i], meta.c})
+    end
+end
+table.sort(live, function(a, b) return a[2] < b[2] end)
+local excess = #live - tonumber(ARGV[5]) + 1
+for i = 1, excess do
+    redis.call('HDEL', KEYS[2], live[i][1])
+    redis.call('DEL', ARGV[6] .. live[i][1])
+    log(KEYS[4], {op = 'revoke', id = live[i][1], at = now})
+end
+local session = cjson.decode(ARGV[2])
+session.g = gen
+redis.call('SET', KEYS[1], cjson.encode(session), 'EX', ARGV[4])
+redis.call('HSET', KEYS[2], ARGV[1], cjson.encode({g = gen, c = session.c, e = session.e}))
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+if gen ~= '0' then
+    redis.call('EXPIRE', KEYS[3], ARGV[4])
+end
+session.op = 'create'
+session.id = ARGV[1]
+log(KEYS[4], session)
+return 1
+"""
+)
+
+# KEYS: presented token, new token, user, generation, history
+# ARGV: expected session json, presented id, new id, new session json, now, ttl seconds, history cap
+_ROTATE = (
+    _LOG
+    + """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+local gen = redis.call('GET', KEYS[4]) or '0'
+if cjson.decode(ARGV[1]).g ~= gen then
+    return 0
+end
+local now = tonumber(ARGV[5])
+redis.call('DEL', KEYS[1])
+redis.call('HDEL', KEYS[3], ARGV[2])
+local session = cjson.decode(ARGV[4])
+session.g = gen
+redis.call('SET', KEYS[2], cjson.encode(session), 'EX', ARGV[6])
+redis.call('HSET', KEYS[3], ARGV[3], cjson.encode({g = gen, c = session.c, e = session.e}))
+redis.call('EXPIRE', KEYS[3], ARGV[6])
+if gen ~= '0' then
+    redis.call('EXPIRE', KEYS[4], ARGV[6])
+end
+log(KEYS[5], {op = 'revoke', id = ARGV[2], at = now, used = true})
+session.op = 'create'
+session.id = ARGV[3]
+log(KEYS[5], session)
+return 1
+"""
+)
+
+# KEYS: token, user, history
+# ARGV: expected session json, token id, now, history cap
+_REVOKE = (
+    _LOG
+    + """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('HDEL', KEYS[2], ARGV[2])
+log(KEYS[3], {op = 'revoke', id = ARGV[2], at = tonumber(ARGV[3])})
+return 1
+"""
+)
+
+# KEYS: generation, history
+# ARGV: user id, now, ttl seconds, history cap
+_REVOKE_ALL = (
+    _LOG
+    + """
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+log(KEYS[2], {op = 'revoke_all', user_id = ARGV[1], at = tonumber(ARGV[2])})
+return 1
+"""
+)
+
+_RELEASE_LOCK = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _index_key(token_id: str) -> str:
+    return f"rs:idx:{token_id}"
+
+
+def _token_key(user_id: str, token_id: str) -> str:
+    return f"rs:{{{user_id}}}:tok:{token_id}"
+
+
+def _user_key(user_id: str) -> str:
+    return f"rs:{{{user_id}}}:sessions"
+
+
+def _generation_key(user_id: str) -> str:
+    return f"rs:{{{user_id}}}:gen"
+
+
+def history_key(user_id: str) -> str:
+    return f"rs:{{{user_id}}}:history"
+
+
+class StoredSession:
+    __slots__ = ("token_id", "user_id", "token_hash", "expires_at", "raw")
+
+    def __init__(self, token_id: str, raw: str):
+        data = json.loads(raw)
+        self.token_id = token_id
+        self.user_id: str = data["u"]
+        self.token_hash: str = data["h"]
+        self.expires_at: float = data["e"]
+        self.raw = raw
+
+
+class RefreshSessionStore:
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.ttl_seconds = settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400
+        self.redis: Redis | None = None
+
+    async def start(self, redis: Redis | None) -> None:
+        self.redis = redis
+
+    async def stop(self) -> None:
+        self.redis = None
+
+    def _client(self) -> Redis:
+        if self.redis is None:
+            raise ServiceUnavailableError("Refresh session store unavailable", code="session_store_unavailable")
+        return self.redis
+
+    def _session_json(
+        self, user_id: str, token_hash: str, now: float, ip: str | None, user_agent: str | None
+    ) -> str:
+        return json.dumps(
+            {"u": user_id, "h": token_hash, "c": now, "e": now + self.ttl_seconds, "ip": ip, "ua": user_agent}
+        )
+
+    async def create(
+        self, user_id: str, token_id: str, token_hash: str, now: float, ip: str | None, user_agent: str | None
+    ) -> None:
+        redis = self._client()
+        await redis.set(_index_key(token_id), user_id, ex=self.ttl_seconds)
+        await redis.eval(
+            _CREATE,
+            4,
+            _token_key(user_id, token_id),
+            _user_key(user_id),
+            _generation_key(user_id),
+            history_key(user_id),
+            token_id,
+            self._session_json(user_id, token_hash, now, ip, user_agent),
+            now,
+            self.ttl_seconds,
+            self.settings.REFRESH_SESSION_MAX_PER_USER,
+            _token_key(user_id, ""),
+            self.settings.REFRESH_SESSION_HISTORY_MAX_PER_USER,
+        )
+        await self._mark_pending(user_id)
+
+    async def get(self, token_id: str) -> StoredSession | None:
+        redis = self._client()
+        user_id = await redis.get(_index_key(token_id))
+        if user_id is None:
+            return None
+        raw = await redis.get(_token_key(user_id, token_id))
+        return StoredSession(token_id, raw) if raw is not None else None
+
+    async def rotate(
+        self,
+        stored: StoredSession,
+        new_token_id: str,
+        new_token_hash: str,
+        now: float,
+        ip: str | None,
+        user_agent: str | None,
+    ) -> bool:
+        redis = self._client()
+        await redis.set(_index_key(new_token_id), stored.user_id, ex=self.ttl_seconds)
+        rotated = await redis.eval(
+            _ROTATE,
+            5,
+            _token_key(stored.user_id, stored.token_id),
+            _token_key(stored.user_id, new_token_id),
+            _user_key(stored.user_id),
+            _generation_key(stored.user_id),
+            history_key(stored.user_id),
+            stored.raw,
+            stored.token_id,
+            new_token_id,
+            self._session_json(stored.user_id, new_token_hash, now, ip, user_agent),
+            now,
+            self.ttl_seconds,
+            self.settings.REFRESH_SESSION_HISTORY_MAX_PER_USER,
+        )
+        if rotated:
+            await self._mark_pending(stored.user_id)
+        return bool(rotated)
+
+    async def revoke(self, stored: StoredSession, now: float) -> bool:
+        revoked = await self._client().eval(
+            _REVOKE,
+            3,
+            _token_key(stored.user_id, stored.token_id),
+            _user_key(stored.user_id),
+            history_key(stored.user_id),
+            stored.raw,
+            stored.token_id,
+            now,
+            self.settings.REFRESH_SESSION_HISTORY_MAX_PER_USER,
+        )
+        if revoked:
+            await self._mark_pending(stored.user_id)
+        return bool(revoked)
+
+    async def revoke_all(self, user_id: str, now: float) -> None:
+        await self._client().eval(
+            _REVOKE_ALL,
+            2,
+            _generation_key(user_id),
+            history_key(user_id),
+            user_id,
+            now,
+            self.ttl_seconds,
+            self.settings.REFRESH_SESSION_HISTORY_MAX_PER_USER,
+        )
+        await self._mark_pending(user_id)
+
+    async def _mark_pending(self, user_id: str) -> None:
+        # Lives in its own slot, so it cannot join the script; a user whose history is left unmarked is picked up with
+        # their next session change.
+        await self._client().sadd(PENDING_KEY, user_id)
+
+
+def _timestamp(value: float) -> datetime:
+    return datetime.fromtimestamp(value, tz=timezone.utc)
+
+
+async def apply_session_history(session: AsyncSession, events: list[dict[str, Any]]) -> None:
+    tokens = RefreshToken.__table__
+    created = [
+        {
+            "id": event["id"],
+            "user_id": event["u"],
+            "token_hash": event["h"],
+            "created_at": _timestamp(event["c"]),
+            "expires_at": _timestamp(event["e"]),
+            "ip_address": event.get("ip"),
+            "user_agent": event.get("ua"),
+        }
+        for event in events
+        if event["op"] == "create"
+    ]
+    revoked = [
+        {"rid": event["id"], "at": _timestamp(event["at"]), "used": event.get("used", False)}
+        for event in events
+        if event["op"] == "revoke"
+    ]
+    for row in revoked:
+        row["used"] = row["at"] if row["used"] else None
+    revoked_all = [
+        {"uid": event["user_id"], "at": _timestamp(event["at"])} for event in events if event["op"] == "revoke_all"
+    ]
+    # Every statement is idempotent, so a batch replayed after a failed write is harmless.
+    if created:
+        insert = pg_insert if session.get_bind().dialect.name == "postgresql" else sqlite_insert
+        await session.execute(insert(tokens).on_conflict_do_nothing(index_elements=["id"]), created)
+    if revoked:
+        await session.execute(
+            update(tokens)
+            .where(tokens.c.id == bindparam("rid"), tokens.c.revoked_at.is_(None))
+            .values(revoked_at=bindparam("at"), last_used_at=bindparam("used")),
+            revoked,
+        )
+    if revoked_all:
+        await session.execute(
+            update(tokens)
+            .where(
+                tokens.c.user_id == bindparam("uid"),
+                tokens.c.created_at <= bindparam("at"),
+                tokens.c.revoked_at.is_(None),
+            )
+            .values(revoked_at=bindparam("at")),
+            revoked_all,
+        )
+
+
+class RefreshSessionHistoryWriter:
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.batch_size = settings.REFRESH_SESSION_FLUSH_BATCH
+        self.interval_seconds = settings.REFRESH_SESSION_FLUSH_INTERVAL_SECONDS
+        self.redis: Redis | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self, redis: Redis | None) -> None:
+        self.redis = redis
+        if redis is not None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            await self.flush()
+        self.redis = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("refresh session history flush failed", exc_info=True)
+
+    async def flush(self) -> int:
+        owner = uuid.uuid4().hex
+        # One drainer at a time keeps each user's events in order across instances.
+        if not await self.redis.set(_HISTORY_LOCK_KEY, owner, nx=True, px=_HISTORY_LOCK_TTL_MS):
+            return 0
+        written = 0
+        try:
+            while True:
+                user_ids = await self.redis.spop(PENDING_KEY, self.batch_size)
+                if not user_ids:
+                    return written
+                pipe = self.redis.pipeline(transaction=False)
+                for user_id in user_ids:
+                    pipe.lpop(history_key(user_id), self.settings.REFRESH_SESSION_HISTORY_MAX_PER_USER)
+                drained = [(user_id, raw) for user_id, raw in zip(user_ids, await pipe.execute()) if raw]
+                try:
+                    await self._write([json.loads(item) for _, raw in drained for item in raw])
+                except Exception:
+                    pipe = self.redis.pipeline(transaction=False)
+                    for user_id, raw in drained:
+                        pipe.lpush(history_key(user_id), *reversed(raw))
+                    pipe.sadd(PENDING_KEY, *user_ids)
+                    await pipe.execute()
+                    raise
+                written += sum(len(raw) for _, raw in drained)
+                if len(user_ids) < self.batch_size:
+                    return written
+        finally:
+            await self.redis.eval(_RELEASE_LOCK, 1, _HISTORY_LOCK_KEY, owner)
+
+    async def _write(self, events: list[dict[str, Any]]) -> None:
+        async with AsyncSessionLocal() as session:
+            await apply_session_history(session, events)
+            await session.commit()
+
+
+@lru_cache
+def get_refresh_session_store() -> RefreshSessionStore:
+    return RefreshSessionStore(get_settings())
+
+
+@lru_cache
+def get_refresh_session_history_writer() -> RefreshSessionHistoryWriter:
+    return RefreshSessionHistoryWriter(get_settings())
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from functools import lru_cache
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import Settings, get_settings
+from app.core.exceptions import ServiceUnavailableError
+from app.models import User
+from app.schemas.token import TokenPayload
+from app.utils.bloom import BloomFilter
+
+logger = logging.getLogger("app.revocation")
+
+REVOKED_JTI_KEY = "revocation:jti"
+REVOKED_EPOCH_KEY = "revocation:epoch"
+REVOCATION_CHANNEL = "revocation:events"
+_PENDING_KEY = "token_epoch_bumps"
+
+
+class TokenRevocation:
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        self.enabled = settings.TOKEN_REVOCATION_ENABLED
+        self.capacity = settings.TOKEN_REVOCATION_BLOOM_CAPACITY
+        self.error_rate = settings.TOKEN_REVOCATION_BLOOM_ERROR_RATE
+        self.rebuild_seconds = settings.TOKEN_REVOCATION_REBUILD_SECONDS
+        # Revocations only matter while tokens issued before them can still be valid.
+        self.retention_seconds = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+        self._bloom = BloomFilter(self.capacity, self.error_rate)
+        self._local_jtis: dict[str, float] = {}
+        self._epochs: dict[str, tuple[int, float]] = {}
+        self.redis: Redis | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._background: set[asyncio.Task] = set()
+
+    async def start(self, redis: Redis | None) -> None:
+        self.redis = redis
+        if not self.enabled:
+            return
+        await self.reload()
+        if redis is not None:
+            self._tasks = [asyncio.create_task(self._listen()), asyncio.create_task(self._rebuild_periodically())]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._background, return_exceptions=True)
+        self._tasks = []
+        self.redis = None
+
+    async def is_revoked(self, payload: TokenPayload) -> bool:
+        if not self.enabled:
+            return False
+        now = time.time()
+        minimum = self._epochs.get(payload.sub)
+        if minimum and minimum[1] > now and payload.epoch < minimum[0]:
+            return True
+        if payload.jti is None or payload.jti not in self._bloom:
+            return False
+        if self.redis is None:
+            return self._local_jtis.get(payload.jti, 0) > now
+        # Bloom filter hit: confirm, since it may be a false positive.
+        try:
+            expires_at = await self.redis.zscore(REVOKED_JTI_KEY, payload.jti)
+        except RedisError:
+            # Degraded: trust the filter (and the epoch check above), rejecting the rare false positive.
+            logger.warning("token revocation store unavailable, trusting the bloom filter", exc_info=True)
+            return True
+        return expires_at is not None and expires_at > now
+
+    async def revoke_token(self, jti: str, expires_at: float) -> None:
+        self._note_jti(jti, expires_at)
+        if self.redis is None:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.zadd(REVOKED_JTI_KEY, {jti: expires_at})
+                pipe.publish(REVOCATION_CHANNEL, f"j:{jti}:{expires_at}")
+                await pipe.execute()
+        except RedisError as exc:
+            # Only this worker knows the token is revoked; the caller has to retry.
+            logger.error("token revocation not published for %s", jti, exc_info=True)
+            raise ServiceUnavailableError("Token revocation unavailable", code="revocation_unavailable") from exc
+
+    async def revoke_epochs(self, epochs: dict[str, int]) -> None:
+        await self._publish_epochs(epochs, self._note_epochs(epochs))
+
+    def bump_epoch_after_commit(self, session: AsyncSession, user: User) -> None:
+        user.token_epoch = (user.token_epoch or 0) + 1
+        session.info.setdefault(_PENDING_KEY, {})[str(user.id)] = user.token_epoch
+
+    def revoke_epochs_soon(self, epochs: dict[str, int]) -> None:
+        until = self._note_epochs(epochs)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._publish_epochs(epochs, until))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _publish_epochs(self, epochs: dict[str, int], until: float) -> None:
+        if self.redis is None:
+            return
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for user_id, epoch in epochs.items():
+                    pipe.zadd(REVOKED_EPOCH_KEY, {f"{user_id}:{epoch}": until})
+                    pipe.publish(REVOCATION_CHANNEL, f"e:{user_id}:{epoch}:{until}")
+                await pipe.execute()
+        except RedisError:
+            # Runs after commit, so there is no caller to fail: this worker rejects the old tokens, others accept
+            # them until they expire. Refresh tokens were already revoked in the database.
+            logger.error("token epoch revocations not published for %s", sorted(epochs), exc_info=True)
+
+    def _note_epochs(self, epochs: dict[str, int]) -> float:
+        until = time.time() + self.retention_seconds
+        for user_id, epoch in epochs.items():
+            self._note_epoch(user_id, epoch, until)
+        return until
+
+    def _note_jti(self, jti: str, expires_at: float) -> None:
+        self._bloom.add(jti)
+        if self.redis is None:
+            self._local_jtis[jti] = expires_at
+
+    def _note_epoch(self, user_id: str, epoch: int, until: float) -> None:
+        current = self._epochs.get(user_id)
+        if current is None or current[0] <= epoch:
+            self._epochs[user_id] = (epoch, until)
+
+    async def reload(self) -> None:
+        now = time.time()
+        if self.redis is None:
+            self._local_jtis = {jti: exp for jti, exp in self._local_jtis.items() if exp > now}
+            jtis = list(self._local_jtis)
+            epochs = [(user_id, epoch, until) for user_id, (epoch, until) in self._epochs.items() if until > now]
+        else:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.zremrangebyscore(REVOKED_JTI_KEY, "-inf", now)
+                pipe.zremrangebyscore(REVOKED_EPOCH_KEY, "-inf", now)
+                pipe.zrange(REVOKED_JTI_KEY, 0, -1)
+                pipe.zrange(REVOKED_EPOCH_KEY, 0, -1, withscores=True)
+                _, _, jtis, raw_epochs = await pipe.execute()
+            epochs = []
+            for member, until in raw_epochs:
+                user_id, _, epoch = member.rpartition(":")
+                epochs.append((user_id, int(epoch), until))
+        self._bloom = BloomFilter.from_items(jtis, max(self.capacity, len(jtis) * 2), self.error_rate)
+        self._epochs = {}
+        for user_id, epoch, until in epochs:
+            self._note_epoch(user_id, epoch, until)
+
+    async def _rebuild_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.rebuild_seconds)
+            try:
+                await self.reload()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("token revocation reload failed", exc_info=True)
+
+    async def _listen(self) -> None:
+        resync = False
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(REVOCATION_CHANNEL)
+                if resync:
+                    # Messages may have been missed while disconnected.
+                    await self.reload()
+                    resync = False
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    kind, _, rest = message["data"].partition(":")
+                    if kind == "j":
+                        jti, _, expires_at = rest.rpartition(":")
+                        self._note_jti(jti, float(expires_at))
+                    elif kind == "e":
+                        user_id, epoch, until = rest.rsplit(":", 2)
+                        self._note_epoch(user_id, int(epoch), float(until))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("token revocation subscriber disconnected", exc_info=True)
+                resync = True
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+@lru_cache
+def get_token_revocation() -> TokenRevocation:
+    return TokenRevocation(get_settings())
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_epoch_bumps(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        get_token_revocation().revoke_epochs_soon(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_epoch_bumps(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator
+
+from sqlalchemy import Select, exists, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import Settings
+from app.models import Membership, User
+from app.utils.pagination import decode_time_cursor, encode_cursor
+from app.utils.security import normalize_email
+
+EXPORT_COLUMNS = ("id", "email", "display_name", "is_active", "is_verified", "created_at")
+
+
+@dataclass(frozen=True)
+class UserFilters:
+    org_id: str | None = None
+    is_verified: bool | None = None
+    is_active: bool | None = None
+    created_after: datetime | None = None
+    created_before: datetime | None = None
+    email_prefix: str | None = None
+
+
+class AdminUserService:
+    def __init__(self, session: AsyncSession, settings: Settings):
+        self.session = session
+        self.settings = settings
+
+    def _select(self, filters: UserFilters) -> Select:
+        users = User.__table__
+        # Plain column projection: no identity map, no eager-loaded credentials.
+        stmt = select(*(users.c[name] for name in EXPORT_COLUMNS))
+        if filters.org_id:
+            stmt = stmt.where(
+                exists().where(Membership.user_id == users.c.id, Membership.org_id == filters.org_id)
+            )
+        if filters.is_verified is not None:
+            stmt = stmt.where(users.c.is_verified == filters.is_verified)
+        if filters.is_active is not None:
+            stmt = stmt.where(users.c.is_active == filters.is_active)
+        if filters.created_after:
+            stmt = stmt.where(users.c.created_at >= filters.created_after)
+        if filters.created_before:
+            stmt = stmt.where(users.c.created_at < filters.created_before)
+        if filters.email_prefix:
+            prefix = normalize_email(filters.email_prefix)
+            prefix = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            stmt = stmt.where(users.c.normalized_email.like(f"{prefix}%", escape="\\"))
+        return stmt
+
+    async def list_users(
+        self, filters: UserFilters, cursor: str | None = None, limit: int = 50
+    ) -> tuple[list[dict[str, Any]], str | None]:
+        users = User.__table__
+        stmt = self._select(filters)
+        if cursor:
+            created_at, user_id = decode_time_cursor(cursor)
+            stmt = stmt.where(tuple_(users.c.created_at, users.c.id) < tuple_(created_at, user_id))
+        stmt = stmt.order_by(users.c.created_at.desc(), users.c.id.desc()).limit(limit + 1)
+        rows = [dict(row) for row in (await self.session.execute(stmt)).mappings().all()]
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+
+    async def stream_users(self, filters: UserFilters, batch_size: int = 1000) -> AsyncIterator[dict[str, Any]]:
+        users = User.__table__
+        stmt = self._select(filters).order_by(users.c.created_at, users.c.id)
+        # yield_per keeps a server-side cursor open and fetches `batch_size` rows at a time.
+        result = await self.session.stream(stmt.execution_options(yield_per=batch_size))
+        async for row in result.mappings():
+            yield dict(row)
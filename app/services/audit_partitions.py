@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import Settings, get_settings
+from app.db.session import AsyncSessionLocal
+from app.utils.time import utcnow
+
+logger = logging.getLogger("app.audit")
+
+PARENT_TABLE = "audit_events"
+_ADVISORY_LOCK_ID = 0x61756469  # "audi"
+_BOUND = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def period_start(value: datetime, interval: str) -> datetime:
+    value = value.astimezone(timezone.utc)
+    if interval == "day":
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_period(value: datetime, interval: str) -> datetime:
+    start = period_start(value, interval)
+    if interval == "day":
+        return start + timedelta(days=1)
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(start: datetime, interval: str) -> str:
+    return f"{PARENT_TABLE}_p{start.strftime('%Y%m%d' if interval == 'day' else '%Y%m')}"
+
+
+def plan_partitions(
+    existing: list[tuple[str, datetime, datetime]], now: datetime, interval: str, premake: int
+) -> list[tuple[str, datetime, datetime]]:
+    target = now
+    for _ in range(premake + 1):
+        target = next_period(target, interval)
+    start = max((upper for _, _, upper in existing), default=period_start(now, interval))
+    planned = []
+    while start < target:
+        # The first step may be partial when the interval setting changed since the last partition.
+        end = next_period(start, interval)
+        planned.append((partition_name(start, interval), start, end))
+        start = end
+    return planned
+
+
+def expired_partitions(
+    existing: list[tuple[str, datetime, datetime]], now: datetime, retention_days: int
+) -> list[str]:
+    if retention_days <= 0:
+        return []
+    cutoff = now - timedelta(days=retention_days)
+    return [name for name, _, upper in existing if upper <= cutoff]
+
+
+class AuditPartitionManager:
+    def __init__(self, settings: Settings, session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal):
+        self.settings = settings
+        self.session_factory = session_factory
+        self.interval = settings.AUDIT_PARTITION_INTERVAL
+        self.premake = settings.AUDIT_PARTITION_PREMAKE
+        self.retention_days = settings.AUDIT_RETENTION_DAYS
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if not self.settings.DATABASE_URL.startswith("postgresql"):
+            return
+        try:
+            await self.run_once()
+        except Exception:
+            logger.warning("audit partition maintenance failed", exc_info=True)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.settings.AUDIT_PARTITION_MAINTENANCE_INTERVAL_SECONDS)
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("audit partition maintenance failed", exc_info=True)
+
+    async def run_once(self) -> tuple[list[str], list[str]]:
+        now = utcnow()
+        async with self.session_factory() as session:
+            # Instances race for maintenance; the loser simply skips this round.
+            locked = await session.scalar(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": _ADVISORY_LOCK_ID})
+            if not locked:
+                return [], []
+            existing = await self._partitions(session)
+            created = plan_partitions(existing, now, self.interval, self.premake)
+            for name, start, end in created:
+                await session.execute(
+                    text(
+                        f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF {PARENT_TABLE} '
+                        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                    )
+                )
+            dropped = expired_partitions(existing, now, self.retention_days)
+            for name in dropped:
+                await session.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION "{name}"'))
+                await session.execute(text(f'DROP TABLE "{name}"'))
+            await session.commit()
+        if created or dropped:
+            logger.info(
+                "audit partitions maintained",
+                extra={"created": [name for name, _, _ in created], "dropped": dropped},
+            )
+        return [name for name, _, _ in created], dropped
+
+    async def _partitions(self, session: AsyncSession) -> list[tuple[str, datetime, datetime]]:
+        result = await session.execute(
+            text(
+                "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+                "JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = CAST(:parent AS regclass)"
+            ),
+            {"parent": PARENT_TABLE},
+        )
+        partitions = []
+        for name, bound in result.all():
+            match = _BOUND.search(bound or "")
+            if match:
+                lower, upper = (_parse_bound(value) for value in match.groups())
+                partitions.append((name, lower, upper))
+        return partitions
+
+
+def _parse_bound(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+@lru_cache
+def get_audit_partition_manager() -> AuditPartitionManager:
+    return AuditPartitionManager(get_settings())
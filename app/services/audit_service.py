@@ -1,16 +1,22 @@
 from __future__ import annotations
 
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import Settings
-from app.models import AuditEvent
-from app.utils.time import utcnow
+from app.models import AuditEvent, AuditRollup
+from app.services.audit_writer import AuditWriter, get_audit_writer, rollup_bucket
+from app.utils.pagination import decode_time_cursor, encode_cursor
 
 
 class AuditService:
-    def __init__(self, session: AsyncSession, settings: Settings):
+    def __init__(self, session: AsyncSession, settings: Settings, writer: AuditWriter | None = None):
         self.session = session
         self.settings = settings
+        self.writer = writer or get_audit_writer()
 
     async def log_event(
         self,
@@ -23,13 +29,66 @@ class AuditService:
     ) -> None:
         if not self.settings.AUDIT_LOG_ENABLED:
             return
-        event = AuditEvent(
+        self.writer.enqueue(
+            action=action,
             user_id=user_id,
             org_id=org_id,
-            action=action,
             ip_address=ip_address,
             user_agent=user_agent,
-            event_metadata=metadata or {},
-            created_at=utcnow(),
+            metadata=metadata,
+        )
+
+    async def list_events(
+        self,
+        org_id: str | None = None,
+        user_id: str | None = None,
+        action: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        cursor: str | None = None,
+        limit: int = 50,
+    ) -> tuple[list[AuditEvent], str | None]:
+        stmt = select(AuditEvent)
+        if org_id:
+            stmt = stmt.where(AuditEvent.org_id == org_id)
+        if user_id:
+            stmt = stmt.where(AuditEvent.user_id == user_id)
+        if action:
+            stmt = stmt.where(AuditEvent.action == action)
+        if since:
+            stmt = stmt.where(AuditEvent.created_at >= since)
+        if until:
+            stmt = stmt.where(AuditEvent.created_at < until)
+        if cursor:
+            # Keyset: resume strictly after the last row of the previous page, so any page
+            # is an index range scan of `limit` rows regardless of depth.
+            created_at, event_id = decode_time_cursor(cursor)
+            stmt = stmt.where(tuple_(AuditEvent.created_at, AuditEvent.id) < tuple_(created_at, event_id))
+        stmt = stmt.order_by(AuditEvent.created_at.desc(), AuditEvent.id.desc()).limit(limit + 1)
+        events = list((await self.session.execute(stmt)).scalars().all())
+        if len(events) <= limit:
+            return events, None
+        events = events[:limit]
+        return events, encode_cursor(events[-1].created_at, events[-1].id)
+
+    async def rollup_stats(
+        self,
+        org_id: str,
+        since: datetime,
+        until: datetime,
+        actions: list[str] | None = None,
+        granularity: str = "hour",
+    ) -> list[tuple[datetime, str, int]]:
+        stmt = select(AuditRollup.bucket, AuditRollup.action, AuditRollup.count).where(
+            AuditRollup.org_id == org_id,
+            AuditRollup.bucket >= rollup_bucket(since),
+            AuditRollup.bucket < until,
         )
-        self.session.add(event)
+        if actions:
+            stmt = stmt.where(AuditRollup.action.in_(actions))
+        counts: dict[tuple[datetime, str], int] = defaultdict(int)
+        for bucket, action, count in (await self.session.execute(stmt)).all():
+            if granularity == "day":
+                bucket = bucket.replace(hour=0)
+            counts[(bucket, action)] += count
+        return [(bucket, action, count) for (bucket, action), count in sorted(counts.items())]
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from collections import Counter as Tally
+import uuid
+from datetime import datetime
+from functools import lru_cache
+from typing import Any
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import Settings, get_settings
+from app.db.session import AsyncSessionLocal
+from app.models import AuditEvent, AuditRollup, NO_ORG_ID
+from app.utils.time import utcnow
+
+logger = logging.getLogger("app.audit")
+
+AUDIT_QUEUE_DEPTH = Gauge("audit_queue_depth", "Audit events waiting to be written")
+AUDIT_EVENTS_WRITTEN = Counter("audit_events_written_total", "Audit events persisted")
+AUDIT_EVENTS_DROPPED = Counter("audit_events_dropped_total", "Audit events discarded", ["reason"])
+AUDIT_EVENTS_SAMPLED_OUT = Counter(
+    "audit_events_sampled_out_total", "Audit events counted in rollups but not stored", ["action"]
+)
+AUDIT_FLUSH_LATENCY = Histogram("audit_flush_duration_seconds", "Time spent writing one audit batch")
+
+
+class AuditWriter:
+    def __init__(self, settings: Settings, session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal):
+        self.settings = settings
+        self.session_factory = session_factory
+        self.batch_size = settings.AUDIT_BATCH_SIZE
+        self.flush_interval_seconds = settings.AUDIT_FLUSH_INTERVAL_MS / 1000
+        self.sample_rates = settings.AUDIT_SAMPLE_RATES
+        # Entries are (row, stored): rows sampled out still feed the hourly rollups.
+        self._queue: asyncio.Queue[tuple[dict[str, Any], bool]] = asyncio.Queue(maxsize=settings.AUDIT_QUEUE_MAX_SIZE)
+        self._task: asyncio.Task | None = None
+        self._batch: list[tuple[dict[str, Any], bool]] = []
+        self._write_lock = asyncio.Lock()
+
+    def enqueue(
+        self,
+        action: str,
+        user_id: str | None = None,
+        org_id: str | None = None,
+        ip_address: str | None = None,
+        user_agent: str | None = None,
+        metadata: dict | None = None,
+    ) -> None:
+        rate = self.sample_rates.get(action, 1.0)
+        stored = rate >= 1.0 or random.random() < rate
+        if stored and rate < 1.0:
+            metadata = {**(metadata or {}), "sample_rate": rate}
+        row = {
+            "id": str(uuid.uuid4()),
+            "user_id": str(user_id) if user_id else None,
+            "org_id": str(org_id) if org_id else None,
+            "action": action,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "metadata": metadata or {},
+            "created_at": utcnow(),
+        }
+        try:
+            self._queue.put_nowait((row, stored))
+        except asyncio.QueueFull:
+            # Never block a request on audit; shed the event and make it visible.
+            AUDIT_EVENTS_DROPPED.labels("queue_full").inc()
+            return
+        AUDIT_QUEUE_DEPTH.set(self._queue.qsize())
+        self._ensure_started()
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def start(self) -> None:
+        self._ensure_started()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        batch, self._batch = self._batch, []
+        await self._write(batch)
+        await self.flush()
+
+    async def flush(self) -> int:
+        written = 0
+        while not self._queue.empty():
+            written += await self._write(self._take(self.batch_size))
+        return written
+
+    def _take(self, limit: int) -> list[tuple[dict[str, Any], bool]]:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._batch.append(await self._queue.get())
+            deadline = loop.time() + self.flush_interval_seconds
+            while len(self._batch) < self.batch_size:
+                self._batch.extend(self._take(self.batch_size - len(self._batch)))
+                remaining = deadline - loop.time()
+                if len(self._batch) >= self.batch_size or remaining <= 0:
+                    break
+                try:
+                    self._batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            batch, self._batch = self._batch, []
+            # A shutdown mid-write must not abandon rows already taken off the queue.
+            await asyncio.shield(self._write(batch))
+
+    async def _write(self, batch: list[tuple[dict[str, Any], bool]]) -> int:
+        if not batch:
+            return 0
+        rows = [row for row, stored in batch if stored]
+        async with self._write_lock:
+            AUDIT_QUEUE_DEPTH.set(self._queue.qsize())
+            start = time.perf_counter()
+            try:
+                async with self.session_factory() as session:
+                    if rows:
+                        # executemany over a Core insert is sent as multi-row INSERT ... VALUES batches.
+                        await session.execute(insert(AuditEvent.__table__), rows)
+                    await _increment_rollups(session, [row for row, _ in batch])
+                    await session.commit()
+            except Exception:
+                logger.exception("failed to write %d audit events", len(batch))
+                AUDIT_EVENTS_DROPPED.labels("write_error").inc(len(batch))
+                return 0
+            AUDIT_FLUSH_LATENCY.observe(time.perf_counter() - start)
+            AUDIT_EVENTS_WRITTEN.inc(len(rows))
+            # Sampled-out events still count once their rollup increment is committed.
+            for row, stored in batch:
+                if not stored:
+                    AUDIT_EVENTS_SAMPLED_OUT.labels(row["action"]).inc()
+            return len(rows)
+
+
+def rollup_bucket(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+async def _increment_rollups(session: AsyncSession, rows: list[dict[str, Any]]) -> None:
+    counts = Tally((row["org_id"] or str(NO_ORG_ID), row["action"], rollup_bucket(row["created_at"])) for row in rows)
+    # Sorted so concurrent writers lock rollup rows in the same order.
+    params = [
+        {"org_id": org_id, "action": action, "bucket": bucket, "count": count}
+        for (org_id, action, bucket), count in sorted(counts.items())
+    ]
+    table = AuditRollup.__table__
+    stmt = (pg_insert if session.get_bind().dialect.name == "postgresql" else sqlite_insert)(table)
+    await session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["org_id", "action", "bucket"], set_={"count": table.c.count + stmt.excluded.count}
+        ),
+        params,
+    )
+
+
+@lru_cache
+def get_audit_writer() -> AuditWriter:
+    return AuditWriter(get_settings())
@@ -2,6 +2,9 @@ from __future__ import annotations
 
 from datetime import timedelta
 
+from prometheus_client import Counter
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
 from sqlalchemy import select
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -11,15 +14,29 @@ from app.core.exceptions import AuthError, ConflictError, ValidationError
 from app.core.hooks import HookManager
 from app.models import User, Credential, VerificationToken, Membership, Organization, Role
 from app.models.enums import VerificationTokenType
-from app.security.hashing import hash_password, verify_password, hash_token, verify_token
+from app.schemas.token import TokenPayload
+from app.security.hashing import hash_token, token_hash_needs_update, password_needs_update
+from app.security.hashing_executor import HashPriority, PasswordHashingExecutor, get_password_hasher
+from app.security.lockout import LoginLockout, email_key
 from app.security.permissions import resolve_scopes
+from app.security.principal import get_principal_cache
+from app.security.revocation import get_token_revocation
+from app.security.refresh_flight import RefreshSingleFlight, get_refresh_single_flight
+from app.services.rate_limit_service import RateLimit, get_rate_limiter
 from app.services.token_service import TokenService
 from app.services.email_service import EmailService
+from app.services.email_outbox import enqueue_email
 from app.services.audit_service import AuditService
 from app.utils.security import normalize_email, generate_token_secret, split_token
 from app.utils.time import utcnow
 from app.utils.validation import slugify
 
+TOKEN_REQUESTS_COALESCED = Counter(
+    "verification_token_requests_coalesced_total",
+    "Token requests dropped because an unexpired token was issued within the coalescing window",
+    ["token_type"],
+)
+
 
 class AuthService:
     def __init__(
@@ -30,6 +47,9 @@ class AuthService:
         token_service: TokenService,
         email_service: EmailService,
         audit_service: AuditService,
+        password_hasher: PasswordHashingExecutor | None = None,
+        refresh_flight: RefreshSingleFlight | None = None,
+        redis: Redis | None = None,
     ):
         self.session = session
         self.settings = settings
@@ -37,6 +57,9 @@ class AuthService:
         self.token_service = token_service
         self.email_service = email_service
         self.audit_service = audit_service
+        self.password_hasher = password_hasher or get_password_hasher()
+        self.refresh_flight = refresh_flight or get_refresh_single_flight()
+        self.redis = redis
 
     async def register(self, email: str, password: str, display_name: str | None, org_name: str | None) -> None:
         normalized = normalize_email(email)
@@ -57,7 +80,8 @@ class AuthService:
         self.session.add(user)
         await self.session.flush()
 
-        credential = Credential(user_id=user.id, password_hash=hash_password(password))
+        password_hash = await self.password_hasher.hash(password, HashPriority.REGISTRATION)
+        credential = Credential(user_id=user.id, password_hash=password_hash)
         self.session.add(credential)
 
         org = await self._create_default_org(user, org_name)
@@ -70,9 +94,8 @@ class AuthService:
             user_id=str(user.id),
             org_id=str(org.id),
         )
-
+        await enqueue_email(self.session, "send_verification_email", user.email, token)
         await self.session.commit()
-        await self.email_service.send_verification_email(user.email, token)
 
     async def verify_email(self, token: str) -> None:
         record = await self._consume_token(token, VerificationTokenType.EMAIL_VERIFY)
@@ -80,16 +103,28 @@ class AuthService:
         if not user:
             raise ValidationError("User not found", code="user_not_found")
         user.is_verified = True
+        get_principal_cache().invalidate_user_after_commit(self.session, str(user.id))
         await self.audit_service.log_event(action="email_verified", user_id=str(user.id))
         await self.session.commit()
+        # The token is spent, so a new request must not be absorbed by the coalescing marker.
+        await self._release_issue(user, VerificationTokenType.EMAIL_VERIFY)
 
     async def login(self, email: str, password: str, org_id: str | None, ip: str | None, user_agent: str | None):
         normalized = normalize_email(email)
+        # Caps attempts against one account however many addresses they come from.
+        await get_rate_limiter().hit(
+            RateLimit(f"login_email:{email_key(normalized)}", self.settings.RATE_LIMIT_LOGIN_PER_EMAIL_PER_MINUTE, 60)
+        )
+        lockout = LoginLockout(self.settings, self.redis)
+        if await lockout.locked_for(normalized):
+            raise AuthError("Account locked. Try later.", code="account_locked")
+
         result = await self.session.execute(
             select(User).options(selectinload(User.credential)).where(User.normalized_email == normalized)
         )
         user = result.scalar_one_or_none()
         if not user or not user.credential:
+            await lockout.record_failure(normalized)
             await self.audit_service.log_event(action="login_failed", metadata={"email": email})
             raise AuthError("Invalid credentials", code="invalid_credentials")
         if not user.is_verified:
@@ -99,12 +134,16 @@ class AuthService:
         if credential.lockout_until and credential.lockout_until > utcnow():
             raise AuthError("Account locked. Try later.", code="account_locked")
 
-        if not verify_password(password, credential.password_hash):
-            await self._record_failed_login(credential)
-            await self.audit_service.log_event(action="login_failed", user_id=str(user.id))
+        if not await self.password_hasher.verify(password, credential.password_hash, HashPriority.LOGIN):
+            await self._record_failed_login(lockout, normalized, credential)
+            await self.audit_service.log_event(
+                action="login_failed", user_id=str(user.id), org_id=await self._audit_org_id(user.id, org_id)
+            )
             raise AuthError("Invalid credentials", code="invalid_credentials")
 
-        await self._clear_failed_login(credential)
+        await self._clear_failed_login(lockout, normalized, credential)
+        if password_needs_update(credential.password_hash):
+            credential.password_hash = await self.password_hasher.hash(password, HashPriority.LOGIN)
 
         membership = await self._resolve_membership(user.id, org_id)
         scopes = resolve_scopes(membership.role)
@@ -114,6 +153,7 @@ class AuthService:
             role=membership.role.value,
             org_id=str(membership.org_id),
             scopes=scopes,
+            epoch=user.token_epoch,
         )
         refresh_token = await self.token_service.create_refresh_token(str(user.id), ip, user_agent)
 
@@ -123,24 +163,30 @@ class AuthService:
         return access_token, refresh_token, expires_in
 
     async def refresh(self, refresh_token: str, ip: str | None, user_agent: str | None):
-        new_refresh = await self.token_service.rotate_refresh_token(refresh_token, ip, user_agent)
-        refresh_obj = await self.token_service.verify_refresh_token(new_refresh)
+        return await self.refresh_flight.run(refresh_token, lambda: self._rotate(refresh_token, ip, user_agent))
 
-        user = await self.session.get(User, refresh_obj.user_id)
-        membership = await self._resolve_membership(user.id, None)
-        scopes = resolve_scopes(membership.role)
+    async def _rotate(self, refresh_token: str, ip: str | None, user_agent: str | None):
+        rotated = await self.token_service.rotate_refresh_token(refresh_token, ip, user_agent)
+        if not rotated.is_active:
+            raise AuthError("User inactive", code="user_inactive")
+        if rotated.role is None:
+            raise AuthError("No organization membership", code="org_membership_missing")
+        scopes = resolve_scopes(rotated.role)
         access_token, expires_in = await self.token_service.create_access_token(
-            user_id=str(user.id),
-            email=user.email,
-            role=membership.role.value,
-            org_id=str(membership.org_id),
+            user_id=rotated.user_id,
+            email=rotated.email,
+            role=rotated.role.value,
+            org_id=rotated.org_id,
             scopes=scopes,
+            epoch=rotated.token_epoch,
         )
         await self.session.commit()
-        return access_token, new_refresh, expires_in
+        return access_token, rotated.refresh_token, expires_in
 
-    async def logout(self, refresh_token: str) -> None:
+    async def logout(self, refresh_token: str, access_token: TokenPayload | None = None) -> None:
         await self.token_service.revoke_refresh_token(refresh_token)
+        if access_token is not None and access_token.jti:
+            await get_token_revocation().revoke_token(access_token.jti, access_token.exp)
         await self.session.commit()
 
     async def request_password_reset(self, email: str) -> None:
@@ -149,9 +195,15 @@ class AuthService:
         user = result.scalar_one_or_none()
         if not user:
             return
-        token = await self._create_verification_token(user, VerificationTokenType.PASSWORD_RESET)
-        await self.session.commit()
-        await self.email_service.send_password_reset_email(user.email, token)
+        await self._issue_coalesced(user, VerificationTokenType.PASSWORD_RESET, "send_password_reset_email")
+
+    async def request_email_verification(self, email: str) -> None:
+        normalized = normalize_email(email)
+        result = await self.session.execute(select(User).where(User.normalized_email == normalized))
+        user = result.scalar_one_or_none()
+        if not user or user.is_verified:
+            return
+        await self._issue_coalesced(user, VerificationTokenType.EMAIL_VERIFY, "send_verification_email")
 
     async def confirm_password_reset(self, token: str, new_password: str) -> None:
         await self.hooks.run_password_policy(new_password)
@@ -159,24 +211,31 @@ class AuthService:
         user = await self.session.get(User, record.user_id)
         if not user or not user.credential:
             raise ValidationError("User not found", code="user_not_found")
-        user.credential.password_hash = hash_password(new_password)
+        user.credential.password_hash = await self.password_hasher.hash(new_password, HashPriority.CREDENTIAL_CHANGE)
         user.credential.password_changed_at = utcnow()
         await self.token_service.revoke_all_tokens_for_user(str(user.id))
+        get_token_revocation().bump_epoch_after_commit(self.session, user)
         await self.audit_service.log_event(action="password_reset", user_id=str(user.id))
         await self.session.commit()
+        await self._release_issue(user, VerificationTokenType.PASSWORD_RESET)
 
     async def change_password(self, user: User, current_password: str, new_password: str) -> None:
-        if not verify_password(current_password, user.credential.password_hash):
+        if not await self.password_hasher.verify(
+            current_password, user.credential.password_hash, HashPriority.CREDENTIAL_CHANGE
+        ):
             raise AuthError("Invalid current password", code="invalid_password")
         await self.hooks.run_password_policy(new_password)
-        user.credential.password_hash = hash_password(new_password)
+        user.credential.password_hash = await self.password_hasher.hash(new_password, HashPriority.CREDENTIAL_CHANGE)
         user.credential.password_changed_at = utcnow()
         await self.token_service.revoke_all_tokens_for_user(str(user.id))
+        get_token_revocation().bump_epoch_after_commit(self.session, user)
         await self.audit_service.log_event(action="password_changed", user_id=str(user.id))
         await self.session.commit()
 
     async def request_email_change(self, user: User, new_email: str, current_password: str) -> None:
-        if not verify_password(current_password, user.credential.password_hash):
+        if not await self.password_hasher.verify(
+            current_password, user.credential.password_hash, HashPriority.CREDENTIAL_CHANGE
+        ):
             raise AuthError("Invalid password", code="invalid_password")
         normalized = normalize_email(new_email)
         existing = await self.session.execute(select(User).where(User.normalized_email == normalized))
@@ -187,8 +246,8 @@ class AuthService:
         token = await self._create_verification_token(
             user, VerificationTokenType.EMAIL_CHANGE, email=new_email
         )
+        await enqueue_email(self.session, "send_email_change_email", new_email, token)
         await self.session.commit()
-        await self.email_service.send_email_change_email(new_email, token)
 
     async def confirm_email_change(self, token: str) -> None:
         record = await self._consume_token(token, VerificationTokenType.EMAIL_CHANGE)
@@ -198,14 +257,60 @@ class AuthService:
         user.email = record.email
         user.normalized_email = normalize_email(record.email)
         user.is_verified = True
+        get_principal_cache().invalidate_user_after_commit(self.session, str(user.id))
         await self.audit_service.log_event(action="email_changed", user_id=str(user.id))
         await self.session.commit()
 
+    async def _issue_coalesced(self, user: User, token_type: VerificationTokenType, email_kind: str) -> None:
+        if not await self._claim_issue(user, token_type):
+            TOKEN_REQUESTS_COALESCED.labels(token_type.value).inc()
+            return
+        try:
+            token = await self._create_verification_token(user, token_type)
+            await enqueue_email(self.session, email_kind, user.email, token)
+            await self.session.commit()
+        except BaseException:
+            await self._release_issue(user, token_type)
+            raise
+
+    async def _claim_issue(self, user: User, token_type: VerificationTokenType) -> bool:
+        # Only the hash is stored, so an outstanding token cannot be sent again; a repeat request inside the
+        # window is dropped and the link already on its way stays the valid one.
+        window = self.settings.VERIFICATION_TOKEN_COALESCE_SECONDS
+        if window <= 0:
+            return True
+        if self.redis is not None:
+            try:
+                return bool(await self.redis.set(_issue_key(user, token_type), "1", nx=True, ex=window))
+            except RedisError:
+                pass
+        now = utcnow()
+        recent = await self.session.scalar(
+            select(VerificationToken.id)
+            .where(
+                VerificationToken.user_id == user.id,
+                VerificationToken.token_type == token_type,
+                VerificationToken.used_at.is_(None),
+                VerificationToken.expires_at > now,
+                VerificationToken.created_at >= now - timedelta(seconds=window),
+            )
+            .limit(1)
+        )
+        return recent is None
+
+    async def _release_issue(self, user: User, token_type: VerificationTokenType) -> None:
+        if self.redis is None or self.settings.VERIFICATION_TOKEN_COALESCE_SECONDS <= 0:
+            return
+        try:
+            await self.redis.delete(_issue_key(user, token_type))
+        except RedisError:
+            pass
+
     async def _create_verification_token(
         self, user: User, token_type: VerificationTokenType, email: str | None = None
     ) -> str:
         secret = generate_token_secret(32)
-        token_hash = hash_token(secret)
+        token_hash = hash_token(self.settings, secret)
         expires_at = utcnow() + timedelta(
             hours={
                 VerificationTokenType.EMAIL_VERIFY: self.settings.EMAIL_VERIFY_EXPIRE_HOURS,
@@ -231,8 +336,10 @@ class AuthService:
             raise ValidationError("Invalid token", code="token_invalid")
         if record.used_at or record.expires_at <= utcnow():
             raise ValidationError("Token expired", code="token_expired")
-        if not verify_token(secret, record.token_hash):
+        if not await self.password_hasher.verify_token(secret, record.token_hash, HashPriority.CREDENTIAL_CHANGE):
             raise ValidationError("Invalid token", code="token_invalid")
+        if token_hash_needs_update(self.settings, record.token_hash):
+            record.token_hash = hash_token(self.settings, secret)
         record.used_at = utcnow()
         return record
 
@@ -251,15 +358,40 @@ class AuthService:
             raise AuthError("No organization membership", code="org_membership_missing")
         return membership
 
-    async def _record_failed_login(self, credential: Credential) -> None:
-        credential.failed_login_attempts += 1
-        if credential.failed_login_attempts >= self.settings.LOCKOUT_THRESHOLD:
-            credential.lockout_until = utcnow() + timedelta(minutes=self.settings.LOCKOUT_DURATION_MINUTES)
+    async def _audit_org_id(self, user_id: str, org_id: str | None) -> str | None:
+        # Files the event under the requested org when the user belongs to it, else under their oldest membership.
+        stmt = select(Membership.org_id).where(Membership.user_id == user_id)
+        if org_id:
+            stmt = stmt.where(Membership.org_id == org_id)
+        membership_org_id = await self.session.scalar(stmt.order_by(Membership.created_at).limit(1))
+        if membership_org_id is None and org_id:
+            return await self._audit_org_id(user_id, None)
+        return str(membership_org_id) if membership_org_id is not None else None
+
+    async def _record_failed_login(self, lockout: LoginLockout, normalized: str, credential: Credential) -> None:
+        locked_for = await lockout.record_failure(normalized)
+        if locked_for is None:
+            credential.failed_login_attempts += 1
+            if credential.failed_login_attempts >= self.settings.LOCKOUT_THRESHOLD:
+                credential.lockout_until = utcnow() + timedelta(minutes=self.settings.LOCKOUT_DURATION_MINUTES)
+        elif locked_for:
+            # The row is only written when a lockout trips, so it outlives a Redis flush.
+            credential.failed_login_attempts = self.settings.LOCKOUT_THRESHOLD
+            credential.lockout_until = utcnow() + timedelta(seconds=locked_for)
+        else:
+            return
+        await self.session.commit()
 
-    async def _clear_failed_login(self, credential: Credential) -> None:
-        credential.failed_login_attempts = 0
-        credential.lockout_until = None
-        credential.last_login_at = utcnow()
+    async def _clear_failed_login(self, lockout: LoginLockout, normalized: str, credential: Credential) -> None:
+        await lockout.clear(normalized)
+        if credential.failed_login_attempts or credential.lockout_until:
+            credential.failed_login_attempts = 0
+            credential.lockout_until = None
+        # Coarse on purpose: a frequent user does not rewrite the credentials row on every login.
+        now = utcnow()
+        interval = timedelta(seconds=self.settings.LAST_LOGIN_UPDATE_INTERVAL_SECONDS)
+        if credential.last_login_at is None or credential.last_login_at <= now - interval:
+            credential.last_login_at = now
 
     async def _create_default_org(self, user: User, org_name: str | None) -> Organization:
         name = org_name or f"{user.display_name or user.email}'s Org"
@@ -267,4 +399,8 @@ class AuthService:
         org = Organization(name=name, slug=slug)
         self.session.add(org)
         await self.session.flush()
-        return org
+        return org
+
+
+def _issue_key(user: User, token_type: VerificationTokenType) -> str:
+    return f"token_issue:{token_type.value}:{user.id}"
@@ -0,0 +1,283 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import uuid
+from datetime import timedelta
+from functools import lru_cache
+from typing import Any
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from prometheus_client import Counter
+from sqlalchemy import bindparam, delete, event, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from app.core.config import Settings, get_settings
+from app.db.session import AsyncSessionLocal
+from app.models import EmailOutboxMessage
+from app.services.email_service import EmailService
+from app.utils.time import utcnow
+
+logger = logging.getLogger("app.email")
+
+EMAILS_SENT = Counter("emails_sent_total", "Outbox emails delivered", ["kind"])
+EMAILS_FAILED = Counter("emails_failed_total", "Outbox email delivery failures", ["kind", "outcome"])
+
+_PENDING_KEY = "email_outbox_pending"
+_PURGE_INTERVAL_SECONDS = 3600
+
+
+def _payload_cipher(settings: Settings) -> AESGCM:
+    return AESGCM(hmac.new(settings.SECRET_KEY.encode(), b"email-outbox-payload", hashlib.sha256).digest())
+
+
+def seal_payload(settings: Settings, message_id: str, args: tuple[Any, ...]) -> dict[str, Any]:
+    # Args carry live reset, verification and invitation links, so they are only stored encrypted, bound to the row.
+    nonce = os.urandom(12)
+    sealed = _payload_cipher(settings).encrypt(nonce, json.dumps(list(args)).encode(), message_id.encode())
+    return {"sealed": base64.b64encode(nonce + sealed).decode()}
+
+
+def open_payload(settings: Settings, message_id: str, payload: dict[str, Any]) -> list[Any]:
+    if "sealed" not in payload:
+        return payload.get("args", [])
+    raw = base64.b64decode(payload["sealed"])
+    return json.loads(_payload_cipher(settings).decrypt(raw[:12], raw[12:], message_id.encode()))
+
+
+def _outbox_row(kind: str, recipient: str, args: tuple[Any, ...]) -> dict[str, Any]:
+    now = utcnow()
+    message_id = str(uuid.uuid4())
+    return {
+        "id": message_id,
+        "kind": kind,
+        "recipient": recipient,
+        "payload": seal_payload(get_settings(), message_id, args),
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "created_at": now,
+    }
+
+
+async def enqueue_email(session: AsyncSession, kind: str, recipient: str, *args: Any) -> None:
+    # Written in the caller's transaction: the email exists if and only if the change that triggered it commits.
+    await enqueue_emails(session, [(kind, recipient, args)])
+
+
+async def enqueue_emails(session: AsyncSession, messages: list[tuple[str, str, tuple[Any, ...]]]) -> None:
+    if not messages:
+        return
+    await session.execute(
+        insert(EmailOutboxMessage.__table__), [_outbox_row(kind, recipient, args) for kind, recipient, args in messages]
+    )
+    session.info[_PENDING_KEY] = True
+
+
+class EmailOutboxWorker:
+    def __init__(
+        self,
+        settings: Settings,
+        session_factory: async_sessionmaker[AsyncSession] = AsyncSessionLocal,
+        email_service: EmailService | None = None,
+    ):
+        self.settings = settings
+        self.session_factory = session_factory
+        self.email_service = email_service or EmailService(settings)
+        self.batch_size = settings.EMAIL_OUTBOX_BATCH_SIZE
+        self.concurrency = settings.EMAIL_OUTBOX_CONCURRENCY
+        self.poll_interval = settings.EMAIL_OUTBOX_POLL_INTERVAL_SECONDS
+        self.max_attempts = settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._last_purge = 0.0
+
+    def notify(self) -> None:
+        self._wakeup.set()
+        self._ensure_started()
+
+    def _ensure_started(self) -> None:
+        if self._task is None or self._task.done():
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._task = loop.create_task(self._run())
+
+    async def start(self) -> None:
+        self._ensure_started()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                claimed = await self.process_once()
+                await self._purge_if_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("email outbox pass failed", exc_info=True)
+                claimed = 0
+            if claimed >= self.batch_size:
+                continue
+            try:
+                # Commits on this instance wake the worker; other instances' rows and retries are found by polling.
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def process_once(self) -> int:
+        messages = await self._claim()
+        if not messages:
+            return 0
+        limit = asyncio.Semaphore(self.concurrency)
+
+        async def _deliver(message: dict[str, Any]) -> dict[str, Any]:
+            async with limit:
+                return await self._deliver(message)
+
+        outcomes = await asyncio.gather(*(_deliver(message) for message in messages))
+        async with self.session_factory() as session:
+            table = EmailOutboxMessage.__table__
+            await session.execute(
+                update(table)
+                .where(table.c.id == bindparam("message_id"))
+                .values(
+                    status=bindparam("new_status"),
+                    next_attempt_at=bindparam("retry_at"),
+                    last_error=bindparam("error"),
+                    sent_at=bindparam("delivered_at"),
+                    payload=bindparam("new_payload"),
+                    locked_until=None,
+                ),
+                outcomes,
+            )
+            await session.commit()
+        return len(messages)
+
+    async def _claim(self) -> list[dict[str, Any]]:
+        now = utcnow()
+        table = EmailOutboxMessage.__table__
+        # FOR UPDATE SKIP LOCKED lets every instance claim a disjoint batch without blocking the others; a
+        # "sending" row whose lease expired belongs to a worker that died mid-send and is claimed again.
+        due = (
+            select(table.c.id)
+            .where(
+                or_(
+                    (table.c.status == "pending") & (table.c.next_attempt_at <= now),
+                    (table.c.status == "sending") & (table.c.locked_until < now),
+                )
+            )
+            .order_by(table.c.next_attempt_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        async with self.session_factory() as session:
+            result = await session.execute(
+                update(table)
+                .where(table.c.id.in_(due.scalar_subquery()))
+                .values(
+                    status="sending",
+                    attempts=table.c.attempts + 1,
+                    locked_until=now + timedelta(seconds=self.settings.EMAIL_OUTBOX_LEASE_SECONDS),
+                )
+                .returning(table.c.id, table.c.kind, table.c.recipient, table.c.payload, table.c.attempts)
+            )
+            messages = [dict(row) for row in result.mappings().all()]
+            await session.commit()
+        return messages
+
+    async def _deliver(self, message: dict[str, Any]) -> dict[str, Any]:
+        kind = message["kind"]
+        outcome = {
+            "message_id": message["id"],
+            "new_status": "sent",
+            "retry_at": utcnow(),
+            "error": None,
+            "delivered_at": None,
+            # Payloads carry live tokens; they are dropped once the message is settled either way.
+            "new_payload": {},
+        }
+        sender = getattr(self.email_service, kind, None) if kind.startswith("send_") else None
+        if sender is None:
+            EMAILS_FAILED.labels(kind, "failed").inc()
+            outcome.update(new_status="failed", error=f"unknown email kind {kind}")
+            return outcome
+        try:
+            args = open_payload(self.settings, str(message["id"]), message["payload"])
+        except (InvalidTag, ValueError):
+            # Sealed under a different SECRET_KEY; retrying cannot help.
+            EMAILS_FAILED.labels(kind, "failed").inc()
+            outcome.update(new_status="failed", error="payload cannot be decrypted")
+            return outcome
+        try:
+            await sender(message["recipient"], *args)
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"[:512]
+            if message["attempts"] >= self.max_attempts:
+                logger.error("giving up on %s email after %d attempts", kind, message["attempts"])
+                EMAILS_FAILED.labels(kind, "failed").inc()
+                outcome.update(new_status="failed", error=error)
+            else:
+                EMAILS_FAILED.labels(kind, "retry").inc()
+                outcome.update(
+                    new_status="pending",
+                    error=error,
+                    retry_at=utcnow() + timedelta(seconds=self._backoff(message["attempts"])),
+                    new_payload=message["payload"],
+                )
+            return outcome
+        EMAILS_SENT.labels(kind).inc()
+        outcome["delivered_at"] = utcnow()
+        return outcome
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(
+            self.settings.EMAIL_OUTBOX_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1),
+            self.settings.EMAIL_OUTBOX_BACKOFF_MAX_SECONDS,
+        )
+        # Jitter spreads retries after an SMTP outage instead of replaying them in lockstep.
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def _purge_if_due(self) -> None:
+        loop = asyncio.get_running_loop()
+        if loop.time() - self._last_purge < _PURGE_INTERVAL_SECONDS:
+            return
+        self._last_purge = loop.time()
+        cutoff = utcnow() - timedelta(days=self.settings.EMAIL_OUTBOX_RETENTION_DAYS)
+        table = EmailOutboxMessage.__table__
+        async with self.session_factory() as session:
+            await session.execute(
+                delete(table).where(table.c.status.in_(["sent", "failed"]), table.c.created_at < cutoff)
+            )
+            await session.commit()
+
+
+@lru_cache
+def get_email_outbox_worker() -> EmailOutboxWorker:
+    return EmailOutboxWorker(get_settings())
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_outbox_worker(session: Session) -> None:
+    if session.info.pop(_PENDING_KEY, None):
+        get_email_outbox_worker().notify()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_outbox_wakeup(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
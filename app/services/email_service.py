@@ -4,11 +4,15 @@ from email.message import EmailMessage
 import aiosmtplib
 
 from app.core.config import Settings
+from app.services.smtp_pool import SMTPConnectionPool, get_smtp_pool
 
 
 class EmailService:
-    def __init__(self, settings: Settings):
+    def __init__(self, settings: Settings, smtp_pool: SMTPConnectionPool | None = None):
         self.settings = settings
+        if smtp_pool is None and settings.SMTP_POOL_SIZE > 0:
+            smtp_pool = get_smtp_pool()
+        self.smtp_pool = smtp_pool
 
     async def send_email(self, to_email: str, subject: str, text_body: str, html_body: str | None = None) -> None:
         message = EmailMessage()
@@ -19,6 +23,9 @@ class EmailService:
         if html_body:
             message.add_alternative(html_body, subtype="html")
 
+        if self.smtp_pool is not None:
+            await self.smtp_pool.send(message)
+            return
         await aiosmtplib.send(
             message,
             hostname=self.settings.SMTP_HOST,
@@ -50,4 +57,4 @@ class EmailService:
         link = f"{self.settings.PUBLIC_BASE_URL}/accept-invite?token={token}"
         text_body = f"You were invited to {org_name}. Accept: {link}"
         html_body = f"<p>You were invited to {org_name}.</p><p><a href='{link}'>Accept Invite</a></p>"
-        await self.send_email(to_email, f"Invitation to {org_name}", text_body, html_body)
+        await self.send_email(to_email, f"Invitation to {org_name}", text_body, html_body)
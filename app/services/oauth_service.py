@@ -3,22 +3,26 @@ from __future__ import annotations
 import json
 import secrets
 from dataclasses import dataclass
+from functools import lru_cache
 
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.config import Settings
-from app.core.exceptions import AuthError, ConflictError
+from app.core.config import Settings, get_settings
+from app.core.exceptions import AuthError, ConflictError, ValidationError
 from app.core.plugins import PluginRegistry
 from app.models import User, ExternalIdentity, Credential, Membership, Organization
 from app.models.enums import ExternalProvider, Role
-from app.security.hashing import hash_password
+from app.security.hashing_executor import HashPriority, PasswordHashingExecutor, get_password_hasher
 from app.security.permissions import resolve_scopes
+from app.security.principal import get_principal_cache
 from app.services.token_service import TokenService
 from app.services.email_service import EmailService
 from app.services.audit_service import AuditService
 from app.services.oauth_providers import OAuthUserInfo
+from app.utils.cache import TTLCache
 from app.utils.security import generate_pkce_pair, normalize_email
+from app.utils.shm_table import SharedMemoryTable, open_shared_table
 from app.utils.validation import slugify
 
 
@@ -28,33 +32,47 @@ class OAuthState:
     redirect_uri: str
 
 
+_OAUTH_STATE_SIZE = 2048
+_local_states: TTLCache[str, str] = TTLCache(10_000, 600)
+
+
+@lru_cache
+def get_oauth_state_table() -> SharedMemoryTable | None:
+    settings = get_settings()
+    return open_shared_table(settings, "oauth_state", settings.SHARED_STATE_OAUTH_SLOTS, _OAUTH_STATE_SIZE)
+
+
 class OAuthStateStore:
     def __init__(self, redis, settings: Settings):
         self.redis = redis
         self.settings = settings
-        self._memory: dict[str, OAuthState] = {}
+        # Without Redis the callback may land on another worker; the host-wide table lets any of them consume it.
+        self.table = get_oauth_state_table() if redis is None else None
 
     async def store(self, state: str, data: OAuthState) -> None:
+        raw = json.dumps({"code_verifier": data.code_verifier, "redirect_uri": data.redirect_uri})
+        ttl = self.settings.OAUTH_STATE_TTL_SECONDS
         if self.redis:
-            await self.redis.setex(
-                f"oauth:state:{state}",
-                self.settings.OAUTH_STATE_TTL_SECONDS,
-                json.dumps({"code_verifier": data.code_verifier, "redirect_uri": data.redirect_uri}),
-            )
-            return
-        self._memory[state] = data
+            await self.redis.setex(f"oauth:state:{state}", ttl, raw)
+        elif self.table is not None:
+            if len(raw.encode()) > _OAUTH_STATE_SIZE:
+                raise ValidationError("Redirect URI too long", code="oauth_redirect_invalid")
+            self.table.set(f"oauth:state:{state}", raw.encode(), ttl)
+        else:
+            _local_states.set(state, raw, ttl)
 
     async def consume(self, state: str) -> OAuthState:
         if self.redis:
             raw = await self.redis.getdel(f"oauth:state:{state}")
-            if not raw:
-                raise AuthError("Invalid OAuth state", code="oauth_state_invalid")
-            payload = json.loads(raw)
-            return OAuthState(code_verifier=payload["code_verifier"], redirect_uri=payload["redirect_uri"])
-        data = self._memory.pop(state, None)
-        if not data:
+        elif self.table is not None:
+            raw = self.table.pop(f"oauth:state:{state}")
+        else:
+            raw = _local_states.get(state)
+            _local_states.pop(state)
+        if not raw:
             raise AuthError("Invalid OAuth state", code="oauth_state_invalid")
-        return data
+        payload = json.loads(raw)
+        return OAuthState(code_verifier=payload["code_verifier"], redirect_uri=payload["redirect_uri"])
 
 
 class OAuthService:
@@ -67,6 +85,7 @@ class OAuthService:
         email_service: EmailService,
         audit_service: AuditService,
         redis=None,
+        password_hasher: PasswordHashingExecutor | None = None,
     ):
         self.session = session
         self.settings = settings
@@ -75,6 +94,7 @@ class OAuthService:
         self.email_service = email_service
         self.audit_service = audit_service
         self.state_store = OAuthStateStore(redis, settings)
+        self.password_hasher = password_hasher or get_password_hasher()
 
     async def authorization_url(self, provider_name: str, redirect_uri: str | None) -> tuple[str, str]:
         provider = self.registry.get_oauth_provider(provider_name)
@@ -113,7 +133,7 @@ class OAuthService:
             user = result.scalar_one_or_none()
             if user:
                 if not user.is_verified:
-                    user.is_verified = True
+                    await self._claim_unverified(user)
                 identity = ExternalIdentity(
                     user_id=user.id,
                     provider=ExternalProvider(provider_name),
@@ -131,7 +151,8 @@ class OAuthService:
                 )
                 self.session.add(user)
                 await self.session.flush()
-                credential = Credential(user_id=user.id, password_hash=hash_password(secrets.token_urlsafe(32)))
+                password_hash = await self.password_hasher.hash(secrets.token_urlsafe(32), HashPriority.REGISTRATION)
+                credential = Credential(user_id=user.id, password_hash=password_hash)
                 self.session.add(credential)
                 identity = ExternalIdentity(
                     user_id=user.id,
@@ -142,6 +163,7 @@ class OAuthService:
                 self.session.add(identity)
 
             await self._ensure_personal_org(user)
+            get_principal_cache().invalidate_user_after_commit(self.session, str(user.id))
 
         await self.audit_service.log_event(
             action="oauth_login",
@@ -157,10 +179,20 @@ class OAuthService:
             role=membership.role.value,
             org_id=str(membership.org_id),
             scopes=scopes,
+            epoch=user.token_epoch,
         )
         refresh_token = await self.token_service.create_refresh_token(str(user.id), None, None)
         return access_token, refresh_token, expires_in
 
+    async def _claim_unverified(self, user: User) -> None:
+        # Whoever set the password never proved they own the mailbox, so it must not survive the link.
+        user.is_verified = True
+        credential = await self.session.get(Credential, user.id)
+        if credential is not None:
+            credential.password_hash = await self.password_hasher.hash(
+                secrets.token_urlsafe(32), HashPriority.REGISTRATION
+            )
+
     async def _ensure_personal_org(self, user: User) -> None:
         result = await self.session.execute(select(Membership).where(Membership.user_id == user.id))
         membership = result.scalar_one_or_none()
@@ -184,4 +216,4 @@ class OAuthService:
             return self.settings.GOOGLE_REDIRECT_URI
         if provider_name == "microsoft":
             return self.settings.MICROSOFT_REDIRECT_URI
-        return None
+        return None
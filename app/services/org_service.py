@@ -1,21 +1,42 @@
 from __future__ import annotations
 
-from datetime import timedelta
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 import secrets
+import uuid
 
-from sqlalchemy import select
+from email_validator import EmailNotValidError, validate_email
+from sqlalchemy import func, insert, literal, select, tuple_, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import Settings
-from app.core.exceptions import ConflictError, ValidationError
-from app.models import Organization, Membership, Invitation, Role
-from app.security.hashing import hash_token, verify_token
+from app.core.exceptions import ConflictError, NotFoundError, ValidationError
+from app.models import Organization, Membership, Invitation, Role, User
+from app.security.hashing import hash_token, token_hash_needs_update
+from app.security.hashing_executor import HashPriority, get_password_hasher
+from app.security.principal import get_principal_cache
+from app.services.email_outbox import enqueue_email, enqueue_emails
 from app.services.email_service import EmailService
-from app.utils.security import split_token
+from app.utils.pagination import decode_time_cursor, encode_cursor
+from app.utils.security import normalize_email, split_token
 from app.utils.time import utcnow
 from app.utils.validation import slugify
 
 
+@dataclass
+class BatchInviteResult:
+    invited: list[tuple[str, str]] = field(default_factory=list)
+    skipped: list[tuple[str, str]] = field(default_factory=list)
+
+
+def invitation_status(invitation: Invitation, now: datetime) -> str:
+    if invitation.accepted_at:
+        return "accepted"
+    if invitation.revoked_at:
+        return "revoked"
+    return "pending" if invitation.expires_at > now else "expired"
+
+
 class OrgService:
     def __init__(self, session: AsyncSession, settings: Settings, email_service: EmailService):
         self.session = session
@@ -31,6 +52,7 @@ class OrgService:
         self.session.add(org)
         await self.session.flush()
         self.session.add(Membership(user_id=user_id, org_id=org.id, role=Role.ADMIN))
+        get_principal_cache().invalidate_user_after_commit(self.session, str(user_id))
         return org
 
     async def list_orgs(self, user_id: str) -> list[Organization]:
@@ -41,8 +63,8 @@ class OrgService:
 
     async def invite(self, org_id: str, inviter_user_id: str, email: str, role: Role) -> None:
         secret = secrets.token_urlsafe(32)
-        token_hash = hash_token(secret)
-        expires_at = utcnow() + timedelta(days=7)
+        token_hash = hash_token(self.settings, secret)
+        expires_at = utcnow() + timedelta(days=self.settings.INVITATION_EXPIRE_DAYS)
         invitation = Invitation(
             org_id=org_id,
             inviter_user_id=inviter_user_id,
@@ -58,19 +80,145 @@ class OrgService:
         org = await self.session.get(Organization, org_id)
         if not org:
             raise ValidationError("Organization not found", code="org_not_found")
-        await self.email_service.send_invitation_email(email, org.name, token)
+        await enqueue_email(self.session, "send_invitation_email", email, org.name, token)
+
+    async def invite_batch(
+        self, org_id: str, inviter_user_id: str, items: list[tuple[str, Role]]
+    ) -> BatchInviteResult:
+        if len(items) > self.settings.INVITATION_BATCH_MAX_SIZE:
+            raise ValidationError("Too many invitations in one batch", code="invite_batch_too_large")
+        org = await self.session.get(Organization, org_id)
+        if not org:
+            raise ValidationError("Organization not found", code="org_not_found")
+        result = BatchInviteResult()
+
+        candidates: dict[str, Role] = {}
+        for email, role in items:
+            try:
+                email = validate_email(email, check_deliverability=False).normalized
+            except EmailNotValidError:
+                result.skipped.append((email, "invalid_email"))
+                continue
+            normalized = normalize_email(email)
+            if normalized in candidates:
+                result.skipped.append((email, "duplicate"))
+                continue
+            candidates[normalized] = role
+        if not candidates:
+            return result
+
+        now = utcnow()
+        # Existing members and still-pending invitations, found in a single round trip.
+        members = (
+            select(User.normalized_email.label("email"), literal("already_member").label("reason"))
+            .join(Membership, Membership.user_id == User.id)
+            .where(Membership.org_id == org_id, User.normalized_email.in_(candidates))
+        )
+        pending = select(func.lower(Invitation.email), literal("already_invited")).where(
+            Invitation.org_id == org_id,
+            func.lower(Invitation.email).in_(candidates),
+            Invitation.accepted_at.is_(None),
+            Invitation.revoked_at.is_(None),
+            Invitation.expires_at > now,
+        )
+        for email, reason in (await self.session.execute(union_all(members, pending))).all():
+            if candidates.pop(email, None) is not None:
+                result.skipped.append((email, reason))
+
+        rows = []
+        expires_at = now + timedelta(days=self.settings.INVITATION_EXPIRE_DAYS)
+        for email, role in candidates.items():
+            invitation_id = str(uuid.uuid4())
+            secret = secrets.token_urlsafe(32)
+            rows.append(
+                {
+                    "id": invitation_id,
+                    "org_id": str(org_id),
+                    "inviter_user_id": str(inviter_user_id),
+                    "email": email,
+                    "role": role,
+                    "token_hash": hash_token(self.settings, secret),
+                    "expires_at": expires_at,
+                    "created_at": now,
+                }
+            )
+            result.invited.append((email, f"{invitation_id}.{secret}"))
+        if rows:
+            await self.session.execute(insert(Invitation.__table__), rows)
+            await enqueue_emails(
+                self.session,
+                [("send_invitation_email", email, (org.name, token)) for email, token in result.invited],
+            )
+        return result
+
+    async def list_invitations(
+        self, org_id: str, status: str | None = None, cursor: str | None = None, limit: int = 50
+    ) -> tuple[list[Invitation], str | None]:
+        now = utcnow()
+        stmt = select(Invitation).where(Invitation.org_id == org_id)
+        if status == "accepted":
+            stmt = stmt.where(Invitation.accepted_at.is_not(None))
+        elif status == "revoked":
+            stmt = stmt.where(Invitation.accepted_at.is_(None), Invitation.revoked_at.is_not(None))
+        elif status in ("pending", "expired"):
+            stmt = stmt.where(
+                Invitation.accepted_at.is_(None),
+                Invitation.revoked_at.is_(None),
+                Invitation.expires_at > now if status == "pending" else Invitation.expires_at <= now,
+            )
+        if cursor:
+            created_at, invitation_id = decode_time_cursor(cursor)
+            stmt = stmt.where(tuple_(Invitation.created_at, Invitation.id) < tuple_(created_at, invitation_id))
+        stmt = stmt.order_by(Invitation.created_at.desc(), Invitation.id.desc()).limit(limit + 1)
+        invitations = list((await self.session.execute(stmt)).scalars().all())
+        if len(invitations) <= limit:
+            return invitations, None
+        invitations = invitations[:limit]
+        return invitations, encode_cursor(invitations[-1].created_at, invitations[-1].id)
+
+    async def _get_invitation(self, org_id: str, invitation_id: str) -> Invitation:
+        invitation = await self.session.get(Invitation, invitation_id)
+        if not invitation or str(invitation.org_id) != str(org_id):
+            raise NotFoundError("Invitation not found", code="invite_not_found")
+        return invitation
+
+    async def revoke_invitation(self, org_id: str, invitation_id: str) -> Invitation:
+        invitation = await self._get_invitation(org_id, invitation_id)
+        if invitation.accepted_at:
+            raise ConflictError("Invitation already accepted", code="invite_accepted")
+        if not invitation.revoked_at:
+            invitation.revoked_at = utcnow()
+        return invitation
+
+    async def resend_invitation(self, org_id: str, invitation_id: str) -> Invitation:
+        invitation = await self._get_invitation(org_id, invitation_id)
+        status = invitation_status(invitation, utcnow())
+        if status in ("accepted", "revoked"):
+            raise ConflictError(f"Invitation already {status}", code=f"invite_{status}")
+        # A fresh secret invalidates the previously mailed link.
+        secret = secrets.token_urlsafe(32)
+        invitation.token_hash = hash_token(self.settings, secret)
+        invitation.expires_at = utcnow() + timedelta(days=self.settings.INVITATION_EXPIRE_DAYS)
+        org = await self.session.get(Organization, invitation.org_id)
+        token = f"{invitation.id}.{secret}"
+        await enqueue_email(self.session, "send_invitation_email", invitation.email, org.name if org else "", token)
+        return invitation
 
     async def accept_invitation(self, token: str, user_id: str, user_email: str) -> Organization:
         token_id_str, secret = split_token(token)
         invitation = await self.session.get(Invitation, token_id_str)
         if not invitation:
             raise ValidationError("Invalid invitation token", code="invite_invalid")
+        if invitation.revoked_at:
+            raise ValidationError("Invitation revoked", code="invite_revoked")
         if invitation.accepted_at or invitation.expires_at <= utcnow():
             raise ValidationError("Invitation expired", code="invite_expired")
         if invitation.email.lower() != user_email.lower():
             raise ValidationError("Invitation email mismatch", code="invite_email_mismatch")
-        if not verify_token(secret, invitation.token_hash):
+        if not await get_password_hasher().verify_token(secret, invitation.token_hash, HashPriority.REGISTRATION):
             raise ValidationError("Invalid invitation token", code="invite_invalid")
+        if token_hash_needs_update(self.settings, invitation.token_hash):
+            invitation.token_hash = hash_token(self.settings, secret)
 
         existing = await self.session.execute(
             select(Membership).where(Membership.user_id == user_id, Membership.org_id == invitation.org_id)
@@ -79,9 +227,10 @@ class OrgService:
             self.session.add(
                 Membership(user_id=user_id, org_id=invitation.org_id, role=invitation.role)
             )
+            get_principal_cache().invalidate_user_after_commit(self.session, str(user_id))
 
         invitation.accepted_at = utcnow()
         org = await self.session.get(Organization, invitation.org_id)
         if not org:
             raise ValidationError("Organization not found", code="org_not_found")
-        return org
+        return org
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import hashlib
+import ipaddress
+from functools import lru_cache
+from typing import Literal
+
+import jwt
+from pydantic import BaseModel, Field, TypeAdapter
+from starlette.requests import Request
+
+from app.core.config import Settings, get_settings
+from app.security.jwt import decode_access_token
+from app.services.rate_limit_service import RateLimit
+
+
+class RateLimitPolicy(BaseModel, frozen=True):
+    name: str
+    limit: int = Field(gt=0)
+    period_seconds: int = Field(gt=0)
+    key: Literal["ip", "ip_prefix", "user", "org", "api_key"] = "ip"
+    applies_to: Literal["all", "anonymous", "authenticated"] = "all"
+    # Exact request paths, or path prefixes; neither means every request.
+    paths: tuple[str, ...] = ()
+    prefixes: tuple[str, ...] = ()
+    # Per-org quota tiers (RATE_LIMIT_ORG_TIERS maps org ids to tier names); only used by org-keyed policies.
+    tier_limits: dict[str, int] = {}
+    # Limit for callers with a valid access token, when it should differ from `limit`.
+    authenticated_limit: int | None = Field(default=None, gt=0)
+
+
+_POLICIES = TypeAdapter(list[RateLimitPolicy])
+
+
+def default_policies(settings: Settings) -> list[RateLimitPolicy]:
+    prefix = settings.API_V1_PREFIX
+    return [
+        RateLimitPolicy(
+            name="global",
+            limit=settings.RATE_LIMIT_GLOBAL_PER_MINUTE,
+            authenticated_limit=settings.RATE_LIMIT_GLOBAL_AUTHENTICATED_PER_MINUTE,
+            period_seconds=60,
+        ),
+        RateLimitPolicy(
+            name="user",
+            key="user",
+            limit=settings.RATE_LIMIT_USER_PER_MINUTE,
+            period_seconds=60,
+            applies_to="authenticated",
+        ),
+        RateLimitPolicy(
+            name="org",
+            key="org",
+            limit=settings.RATE_LIMIT_ORG_PER_MINUTE,
+            period_seconds=60,
+            applies_to="authenticated",
+        ),
+        RateLimitPolicy(
+            name="login",
+            limit=settings.RATE_LIMIT_LOGIN_PER_MINUTE,
+            period_seconds=60,
+            paths=(f"{prefix}/login",),
+        ),
+        RateLimitPolicy(
+            name="register",
+            limit=settings.RATE_LIMIT_REGISTER_PER_HOUR,
+            period_seconds=3600,
+            paths=(f"{prefix}/register",),
+        ),
+        RateLimitPolicy(
+            name="pwreset",
+            limit=settings.RATE_LIMIT_RESET_PER_HOUR,
+            period_seconds=3600,
+            paths=(f"{prefix}/password-reset/request",),
+        ),
+        RateLimitPolicy(
+            name="verifyemail",
+            limit=settings.RATE_LIMIT_RESET_PER_HOUR,
+            period_seconds=3600,
+            paths=(f"{prefix}/verify-email/request",),
+        ),
+    ]
+
+
+class _Identity:
+    __slots__ = ("ip", "user_id", "org_id", "api_key")
+
+    def __init__(self, ip: str, user_id: str | None, org_id: str | None, api_key: str | None):
+        self.ip = ip
+        self.user_id = user_id
+        self.org_id = org_id
+        self.api_key = api_key
+
+
+class RateLimitPolicyEngine:
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        configured = _POLICIES.validate_python(settings.RATE_LIMIT_POLICIES)
+        # Configured policies add to the built-in ones and replace any built-in with the same name.
+        policies = {policy.name: policy for policy in default_policies(settings)}
+        policies.update((policy.name, policy) for policy in configured)
+        self.policies = list(policies.values())
+        self._global = tuple(policy for policy in self.policies if not policy.paths and not policy.prefixes)
+        self._prefixed = sorted(
+            ((prefix, policy) for policy in self.policies for prefix in policy.prefixes),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+        # Every exact path gets its full policy list up front, so a hot route costs one dict lookup.
+        self._exact: dict[str, tuple[RateLimitPolicy, ...]] = {}
+        for policy in self.policies:
+            for path in policy.paths:
+                self._exact.setdefault(path, ())
+        for path in self._exact:
+            self._exact[path] = self._compile(path) + tuple(policy for policy in self.policies if path in policy.paths)
+
+    def _compile(self, path: str) -> tuple[RateLimitPolicy, ...]:
+        return self._global + tuple(policy for prefix, policy in self._prefixed if path.startswith(prefix))
+
+    def policies_for(self, path: str) -> tuple[RateLimitPolicy, ...]:
+        policies = self._exact.get(path)
+        return policies if policies is not None else self._compile(path)
+
+    def limits_for(self, request: Request) -> tuple[RateLimit, ...]:
+        policies = self.policies_for(request.url.path)
+        if not policies:
+            return ()
+        identity = self._identity(request)
+        authenticated = identity.user_id is not None
+        limits = []
+        for policy in policies:
+            if policy.applies_to == "anonymous" and authenticated:
+                continue
+            if policy.applies_to == "authenticated" and not authenticated:
+                continue
+            subject = self._subject(policy, identity)
+            if subject is None:
+                continue
+            limit = policy.limit
+            if authenticated and policy.authenticated_limit is not None:
+                limit = policy.authenticated_limit
+            if policy.key == "org":
+                tier = self.settings.RATE_LIMIT_ORG_TIERS.get(subject)
+                limit = policy.tier_limits.get(tier, limit) if tier else limit
+            limits.append(RateLimit(f"{policy.name}:{subject}", limit, policy.period_seconds))
+        return tuple(limits)
+
+    def _subject(self, policy: RateLimitPolicy, identity: _Identity) -> str | None:
+        if policy.key == "ip":
+            return identity.ip
+        if policy.key == "ip_prefix":
+            try:
+                address = ipaddress.ip_address(identity.ip)
+            except ValueError:
+                return identity.ip
+            # A single IPv6 client usually controls a whole /64, so per-address keys are trivially sidestepped.
+            if address.version == 6:
+                bits = self.settings.RATE_LIMIT_IPV6_PREFIX
+            else:
+                bits = self.settings.RATE_LIMIT_IPV4_PREFIX
+            return str(ipaddress.ip_network(f"{address}/{bits}", strict=False))
+        if policy.key == "user":
+            return identity.user_id
+        if policy.key == "org":
+            return identity.org_id
+        return identity.api_key
+
+    def _identity(self, request: Request) -> _Identity:
+        ip = request.client.host if request.client else "unknown"
+        user_id = org_id = None
+        authorization = request.headers.get("Authorization", "")
+        if authorization[:7].lower() == "bearer ":
+            try:
+                # Signature-checked but not revocation-checked: good enough to pick a bucket, never to grant access.
+                claims = decode_access_token(self.settings, authorization[7:])
+                user_id, org_id = claims.get("sub"), claims.get("org_id")
+            except jwt.PyJWTError:
+                pass
+        api_key = request.headers.get(self.settings.RATE_LIMIT_API_KEY_HEADER)
+        if api_key:
+            api_key = hashlib.sha256(api_key.encode()).hexdigest()[:32]
+        return _Identity(ip, user_id, org_id, api_key)
+
+
+@lru_cache
+def get_rate_limit_policy_engine() -> RateLimitPolicyEngine:
+    return RateLimitPolicyEngine(get_settings())
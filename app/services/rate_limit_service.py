@@ -1,38 +1,375 @@
 from __future__ import annotations
 
+import asyncio
+import logging
+import math
+import struct
 import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Awaitable, Callable
 
+from prometheus_client import Counter
 from redis.asyncio import Redis
+from redis.exceptions import RedisError
 
+from app.core.config import Settings, get_settings
 from app.core.exceptions import RateLimitError
+from app.utils.shm_table import SharedMemoryTable, open_shared_table
+
+logger = logging.getLogger("app.rate_limit")
+
+RATE_LIMIT_DECISIONS = Counter("rate_limit_decisions_total", "Rate limit checks by where they were decided", ["source"])
+RATE_LIMIT_REDIS_CALLS = Counter("rate_limit_redis_calls_total", "Redis round trips made by the rate limiter", ["kind"])
+
+_SYNC_CHUNK = 500
+_TAT = struct.Struct("<d")
+
+# GCRA over every key at once: each key stores its theoretical arrival time (TAT, ms). A request is admitted only if
+# every key admits it, and only then are the TATs advanced, so a rejected request consumes nothing. Redis TIME keeps
+# all instances on one clock and PX expiry means a key can never outlive its window.
+_GCRA_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local results = {}
+local tats = {}
+local admitted = true
+for i = 1, #KEYS do
+    local limit = tonumber(ARGV[2 * i - 1])
+    local period = tonumber(ARGV[2 * i])
+    local interval = period / limit
+    local tat = math.max(tonumber(redis.call('GET', KEYS[i]) or now), now)
+    local new_tat = tat + interval
+    local allow_at = new_tat - period
+    if now < allow_at then
+        admitted = false
+        results[i] = {0, 0, math.ceil(tat - now), math.ceil(allow_at - now)}
+    else
+        results[i] = {1, math.floor((period - (new_tat - now)) / interval), math.ceil(new_tat - now), 0}
+    end
+    tats[i] = math.ceil(new_tat)
+end
+if admitted then
+    for i = 1, #KEYS do
+        redis.call('SET', KEYS[i], tats[i], 'PX', math.max(tats[i] - now, 1))
+    end
+end
+return results
+"""
+
+# Hybrid mode: fixed-window counters that workers add their locally admitted hits to in batches. ARGV holds
+# (delta, ttl ms, limit) per key; limit 0 only adds the delta. With limits, the pending deltas are always added and the
+# current request is added only if every key stays within its limit. Returns {admitted, total per key...}.
+_WINDOW_SYNC_SCRIPT = """
+local admitted = 1
+local totals = {}
+for i = 1, #KEYS do
+    local limit = tonumber(ARGV[3 * i])
+    totals[i] = tonumber(redis.call('GET', KEYS[i]) or 0) + tonumber(ARGV[3 * i - 2])
+    if limit == 0 or totals[i] + 1 > limit then
+        admitted = 0
+    end
+end
+local out = {admitted}
+for i = 1, #KEYS do
+    local add = tonumber(ARGV[3 * i - 2]) + admitted
+    if add > 0 and redis.call('INCRBY', KEYS[i], add) == add then
+        redis.call('PEXPIRE', KEYS[i], ARGV[3 * i - 1])
+    end
+    out[i + 1] = totals[i] + admitted
+end
+return out
+"""
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    key: str
+    limit: int
+    period_seconds: int
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_seconds: float
+    retry_after_seconds: float
+
+    def headers(self) -> dict[str, str]:
+        headers = {
+            "RateLimit-Limit": str(self.limit),
+            "RateLimit-Remaining": str(self.remaining),
+            "RateLimit-Reset": str(math.ceil(self.reset_seconds)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(math.ceil(self.retry_after_seconds), 1))
+        return headers
+
+
+def _most_restrictive(limits: tuple[RateLimit, ...], raw: list[tuple[int, int, float, float]]) -> RateLimitResult:
+    results = [
+        RateLimitResult(bool(allowed), rule.limit, remaining, reset, retry)
+        for rule, (allowed, remaining, reset, retry) in zip(limits, raw)
+    ]
+    denied = [result for result in results if not result.allowed]
+    if denied:
+        return max(denied, key=lambda result: result.retry_after_seconds)
+    return min(results, key=lambda result: (result.remaining, -result.reset_seconds))
+
+
+def _gcra(
+    limits: tuple[RateLimit, ...], stored: list[float | None], now: float
+) -> tuple[list[tuple[int, int, float, float]], list[float] | None]:
+    # Same algorithm as _GCRA_SCRIPT; returns per-key results and the new TATs, or None when the request is rejected.
+    raw, tats, admitted = [], [], True
+    for rule, tat in zip(limits, stored):
+        interval = rule.period_seconds / rule.limit
+        tat = max(tat or now, now)
+        new_tat = tat + interval
+        allow_at = new_tat - rule.period_seconds
+        if now < allow_at:
+            admitted = False
+            raw.append((0, 0, tat - now, allow_at - now))
+        else:
+            raw.append((1, math.floor((rule.period_seconds - (new_tat - now)) / interval), new_tat - now, 0.0))
+        tats.append(new_tat)
+    return raw, tats if admitted else None
 
 
 class InMemoryRateLimiter:
-    def __init__(self):
-        self._store: dict[str, tuple[int, float]] = {}
+    def __init__(self, max_keys: int = 100_000, table: SharedMemoryTable | None = None):
+        self.max_keys = max_keys
+        self.table = table
+        self._tats: dict[str, float] = {}
+
+    def check(self, limits: tuple[RateLimit, ...]) -> list[tuple[int, int, float, float]]:
+        if self.table is not None:
+            return self._check_shared(limits)
+        now = time.monotonic()
+        if len(self._tats) >= self.max_keys:
+            self._tats = {key: tat for key, tat in self._tats.items() if tat > now}
+        raw, tats = _gcra(limits, [self._tats.get(rule.key) for rule in limits], now)
+        if tats is not None:
+            for rule, tat in zip(limits, tats):
+                self._tats[rule.key] = tat
+        return raw
 
-    async def hit(self, key: str, limit: int, period_seconds: int) -> None:
+    def _check_shared(self, limits: tuple[RateLimit, ...]) -> list[tuple[int, int, float, float]]:
+        # Wall-clock TATs so every worker on the host reads them the same way.
         now = time.time()
-        count, reset_at = self._store.get(key, (0, now + period_seconds))
-        if now > reset_at:
-            count, reset_at = 0, now + period_seconds
-        count += 1
-        self._store[key] = (count, reset_at)
-        if count > limit:
-            raise RateLimitError()
+        raw: list[tuple[int, int, float, float]] = []
+
+        def _apply(values: list[bytes | None]) -> list[tuple[bytes, float] | None]:
+            results, tats = _gcra(limits, [_TAT.unpack(value)[0] if value else None for value in values], now)
+            raw.extend(results)
+            if tats is None:
+                return [None] * len(limits)
+            return [(_TAT.pack(tat), tat - now) for tat in tats]
+
+        self.table.update([rule.key for rule in limits], _apply)
+        return raw
+
+
+class _Window:
+    __slots__ = ("key", "period_seconds", "index", "synced", "pending")
+
+    def __init__(self, rule: RateLimit, index: int):
+        self.key = f"ratelimit:w:{rule.key}:{index}"
+        self.period_seconds = rule.period_seconds
+        self.index = index
+        self.synced = 0
+        self.pending = 0
+
+    @property
+    def ttl_ms(self) -> int:
+        return self.period_seconds * 1000 + 1000
+
+
+class HybridRateLimiter:
+    def __init__(self, settings: Settings, script: Callable[..., Awaitable[Any]]):
+        self.script = script
+        self.sync_interval_seconds = settings.RATE_LIMIT_SYNC_INTERVAL_MS / 1000
+        self.sync_hits = settings.RATE_LIMIT_SYNC_HITS
+        self.local_fraction = settings.RATE_LIMIT_LOCAL_FRACTION
+        self._windows: dict[str, _Window] = {}
+        self._unsynced = 0
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def check(self, limits: tuple[RateLimit, ...]) -> RateLimitResult:
+        now = time.time()
+        windows = [self._window(rule, now) for rule in limits]
+        if any(window.synced >= rule.limit for rule, window in zip(limits, windows)):
+            # Window counters only grow, so a key Redis reported full stays full until the window rolls over.
+            RATE_LIMIT_DECISIONS.labels("local").inc()
+            return self._result(limits, windows, now, False)
+        local_limits = [rule.limit * self.local_fraction for rule in limits]
+        if all(window.synced + window.pending + 1 <= limit for limit, window in zip(local_limits, windows)):
+            for window in windows:
+                window.pending += 1
+            self._unsynced += 1
+            self._schedule_sync()
+            RATE_LIMIT_DECISIONS.labels("local").inc()
+            return self._result(limits, windows, now, True)
+        return await self._check_remote(limits, windows, now)
+
+    async def _check_remote(self, limits: tuple[RateLimit, ...], windows: list[_Window], now: float) -> RateLimitResult:
+        # Near a limit the local estimate is not trusted: hand this worker's pending hits over and decide in Redis.
+        deltas = [window.pending for window in windows]
+        for window in windows:
+            window.pending = 0
+        try:
+            RATE_LIMIT_REDIS_CALLS.labels("check").inc()
+            raw = await self.script(
+                keys=[window.key for window in windows],
+                args=[
+                    value
+                    for rule, window, delta in zip(limits, windows, deltas)
+                    for value in (delta, window.ttl_ms, rule.limit)
+                ],
+            )
+        except RedisError:
+            logger.warning("redis rate limit sync failed; deciding locally", exc_info=True)
+            for window, delta in zip(windows, deltas):
+                window.pending += delta
+            allowed = all(window.synced + window.pending + 1 <= rule.limit for rule, window in zip(limits, windows))
+            if allowed:
+                for window in windows:
+                    window.pending += 1
+            RATE_LIMIT_DECISIONS.labels("local_fallback").inc()
+            return self._result(limits, windows, now, allowed)
+        for window, total in zip(windows, raw[1:]):
+            window.synced = max(window.synced, int(total))
+        RATE_LIMIT_DECISIONS.labels("redis").inc()
+        return self._result(limits, windows, now, bool(raw[0]))
+
+    def _window(self, rule: RateLimit, now: float) -> _Window:
+        index = int(now // rule.period_seconds)
+        window = self._windows.get(rule.key)
+        if window is None or window.index != index:
+            # Hits still pending for a finished window no longer matter to anyone.
+            window = self._windows[rule.key] = _Window(rule, index)
+        return window
+
+    @staticmethod
+    def _result(limits: tuple[RateLimit, ...], windows: list[_Window], now: float, allowed: bool) -> RateLimitResult:
+        raw = []
+        for rule, window in zip(limits, windows):
+            used = window.synced + window.pending
+            reset = (window.index + 1) * window.period_seconds - now
+            if allowed or used + 1 <= rule.limit:
+                raw.append((1, max(rule.limit - used, 0), reset, 0.0))
+            else:
+                raw.append((0, 0, reset, reset))
+        return _most_restrictive(limits, raw)
+
+    def _schedule_sync(self) -> None:
+        if self._unsynced >= self.sync_hits:
+            self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.sync_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.sync()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("rate limit sync failed", exc_info=True)
+
+    async def sync(self) -> None:
+        self._unsynced = 0
+        now = time.time()
+        batch: list[tuple[_Window, int]] = []
+        for name, window in list(self._windows.items()):
+            if window.pending:
+                batch.append((window, window.pending))
+                window.pending = 0
+            elif window.index < now // window.period_seconds:
+                del self._windows[name]
+        for start in range(0, len(batch), _SYNC_CHUNK):
+            chunk = batch[start : start + _SYNC_CHUNK]
+            RATE_LIMIT_REDIS_CALLS.labels("sync").inc()
+            try:
+                raw = await self.script(
+                    keys=[window.key for window, _ in chunk],
+                    args=[value for window, delta in chunk for value in (delta, window.ttl_ms, 0)],
+                )
+            except RedisError:
+                for window, delta in chunk:
+                    window.pending += delta
+                raise
+            for (window, _), total in zip(chunk, raw[1:]):
+                window.synced = max(window.synced, int(total))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.sync()
+        except RedisError:
+            logger.warning("final rate limit sync failed", exc_info=True)
 
 
 class RateLimiter:
-    def __init__(self, redis: Redis | None):
+    def __init__(self, settings: Settings, redis: Redis | None = None):
+        self.settings = settings
+        self.memory = InMemoryRateLimiter(
+            table=open_shared_table(settings, "ratelimit", settings.SHARED_STATE_RATE_LIMIT_SLOTS, _TAT.size)
+        )
+        self.redis: Redis | None = None
+        self.hybrid: HybridRateLimiter | None = None
+        self._script = None
+        self.attach(redis)
+
+    def attach(self, redis: Redis | None) -> None:
         self.redis = redis
-        self.memory = InMemoryRateLimiter()
-
-    async def hit(self, key: str, limit: int, period_seconds: int) -> None:
-        if not self.redis:
-            await self.memory.hit(key, limit, period_seconds)
-            return
-        count = await self.redis.incr(key)
-        if count == 1:
-            await self.redis.expire(key, period_seconds)
-        if count > limit:
-            raise RateLimitError()
+        # register_script sends EVALSHA and only falls back to EVAL (loading the script) on NOSCRIPT.
+        self._script = redis.register_script(_GCRA_SCRIPT) if redis is not None else None
+        self.hybrid = None
+        if redis is not None and self.settings.RATE_LIMIT_MODE == "hybrid":
+            self.hybrid = HybridRateLimiter(self.settings, redis.register_script(_WINDOW_SYNC_SCRIPT))
+
+    async def stop(self) -> None:
+        if self.hybrid is not None:
+            await self.hybrid.stop()
+        self.attach(None)
+
+    async def check(self, *limits: RateLimit) -> RateLimitResult:
+        if self.hybrid is not None:
+            return await self.hybrid.check(limits)
+        if self._script is not None:
+            try:
+                RATE_LIMIT_REDIS_CALLS.labels("check").inc()
+                raw = await self._script(
+                    keys=[f"ratelimit:{rule.key}" for rule in limits],
+                    args=[value for rule in limits for value in (rule.limit, rule.period_seconds * 1000)],
+                )
+                raw = [(allowed, remaining, reset / 1000, retry / 1000) for allowed, remaining, reset, retry in raw]
+                RATE_LIMIT_DECISIONS.labels("redis").inc()
+                return _most_restrictive(limits, raw)
+            except RedisError:
+                logger.warning("redis rate limit check failed; using local limits", exc_info=True)
+        RATE_LIMIT_DECISIONS.labels("memory").inc()
+        return _most_restrictive(limits, self.memory.check(limits))
+
+    async def hit(self, *limits: RateLimit) -> RateLimitResult:
+        result = await self.check(*limits)
+        if not result.allowed:
+            raise RateLimitError(headers=result.headers())
+        return result
+
+
+@lru_cache
+def get_rate_limiter() -> RateLimiter:
+    return RateLimiter(get_settings())
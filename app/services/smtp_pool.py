@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+from functools import lru_cache
+from typing import Any, Callable
+
+import aiosmtplib
+from prometheus_client import Counter, Gauge
+
+from app.core.config import Settings, get_settings
+
+logger = logging.getLogger("app.email")
+
+SMTP_CONNECTIONS_OPENED = Counter("smtp_connections_opened_total", "SMTP connections opened by the pool")
+SMTP_CONNECTIONS_CLOSED = Counter("smtp_connections_closed_total", "SMTP connections closed by the pool", ["reason"])
+SMTP_POOL_IDLE = Gauge("smtp_pool_idle_connections", "Authenticated SMTP connections waiting in the pool")
+
+# Failures that say nothing about the message itself: the connection is gone or unusable.
+_CONNECTION_ERRORS = (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+@dataclass
+class _PooledConnection:
+    client: Any
+    sent: int = 0
+    last_used: float = field(default_factory=lambda: asyncio.get_running_loop().time())
+
+
+class SMTPConnectionPool:
+    def __init__(self, settings: Settings, client_factory: Callable[[], Any] | None = None):
+        self.settings = settings
+        self.client_factory = client_factory or self._new_client
+        self.size = settings.SMTP_POOL_SIZE
+        self.max_messages = settings.SMTP_POOL_MAX_MESSAGES_PER_CONNECTION
+        self.idle_check_seconds = settings.SMTP_POOL_IDLE_CHECK_SECONDS
+        self._slots = asyncio.Semaphore(max(self.size, 1))
+        self._idle: list[_PooledConnection] = []
+
+    def _new_client(self) -> aiosmtplib.SMTP:
+        return aiosmtplib.SMTP(
+            hostname=self.settings.SMTP_HOST,
+            port=self.settings.SMTP_PORT,
+            username=self.settings.SMTP_USER or None,
+            password=self.settings.SMTP_PASSWORD or None,
+            start_tls=self.settings.SMTP_USE_TLS,
+        )
+
+    async def send(self, message: EmailMessage) -> None:
+        async with self._slots:
+            connection = await self._checkout()
+            try:
+                try:
+                    await connection.client.send_message(message)
+                except _CONNECTION_ERRORS:
+                    # Servers drop idle sessions without telling us; one retry on a fresh connection covers that.
+                    await self._close(connection, "disconnected")
+                    connection = await self._connect()
+                    await connection.client.send_message(message)
+            except BaseException:
+                await self._close(connection, "error")
+                raise
+            connection.sent += 1
+            await self._checkin(connection)
+
+    async def close(self) -> None:
+        idle, self._idle = self._idle, []
+        SMTP_POOL_IDLE.set(0)
+        for connection in idle:
+            await self._close(connection, "shutdown")
+
+    async def _checkout(self) -> _PooledConnection:
+        loop = asyncio.get_running_loop()
+        while self._idle:
+            connection = self._idle.pop()
+            SMTP_POOL_IDLE.set(len(self._idle))
+            if loop.time() - connection.last_used < self.idle_check_seconds:
+                return connection
+            try:
+                await connection.client.noop()
+                return connection
+            except (aiosmtplib.SMTPException, ConnectionError, TimeoutError):
+                await self._close(connection, "health_check")
+        return await self._connect()
+
+    async def _checkin(self, connection: _PooledConnection) -> None:
+        if connection.sent >= self.max_messages:
+            await self._close(connection, "recycled")
+            return
+        connection.last_used = asyncio.get_running_loop().time()
+        # LIFO keeps the busiest connections warm and lets the rest age out through the health check.
+        self._idle.append(connection)
+        SMTP_POOL_IDLE.set(len(self._idle))
+
+    async def _connect(self) -> _PooledConnection:
+        client = self.client_factory()
+        # connect() performs EHLO, STARTTLS and AUTH once; every message after that reuses the session.
+        await client.connect()
+        SMTP_CONNECTIONS_OPENED.inc()
+        return _PooledConnection(client)
+
+    async def _close(self, connection: _PooledConnection, reason: str) -> None:
+        SMTP_CONNECTIONS_CLOSED.labels(reason).inc()
+        try:
+            if connection.client.is_connected:
+                await connection.client.quit()
+        except Exception:
+            connection.client.close()
+
+
+@lru_cache
+def get_smtp_pool() -> SMTPConnectionPool:
+    return SMTPConnectionPool(get_settings())
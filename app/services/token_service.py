@@ -1,26 +1,44 @@
 from __future__ import annotations
 
 import uuid
+from dataclasses import dataclass
 from datetime import timedelta
 
-from sqlalchemy import select, update
+from sqlalchemy import DateTime, Row, String, Update, insert, literal, select, true, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import Settings
 from app.core.exceptions import AuthError
-from app.models import RefreshToken
-from app.security.hashing import hash_token, verify_token
+from app.db.types import UUID_TYPE
+from app.models import Membership, RefreshToken, Role, User
+from app.security.hashing import hash_token, verify_token, token_hash_needs_update
+from app.security.hashing_executor import get_password_hasher
 from app.security.jwt import create_access_token
+from app.security.refresh_sessions import get_refresh_session_store
 from app.utils.security import generate_token_secret, split_token
 from app.utils.time import utcnow
 
 
+@dataclass(frozen=True)
+class RotatedRefreshToken:
+    refresh_token: str
+    user_id: str
+    email: str
+    is_active: bool
+    token_epoch: int
+    org_id: str | None
+    role: Role | None
+
+
 class TokenService:
     def __init__(self, session: AsyncSession, settings: Settings):
         self.session = session
         self.settings = settings
+        self.sessions = get_refresh_session_store() if settings.REFRESH_SESSION_BACKEND == "redis" else None
 
-    async def create_access_token(self, user_id: str, email: str, role: str, org_id: str, scopes: list[str]):
+    async def create_access_token(
+        self, user_id: str, email: str, role: str, org_id: str, scopes: list[str], epoch: int = 0
+    ):
         token, expires_in = create_access_token(
             settings=self.settings,
             subject=str(user_id),
@@ -28,13 +46,17 @@ class TokenService:
             role=role,
             org_id=org_id,
             scopes=scopes,
+            epoch=epoch,
         )
         return token, expires_in
 
     async def create_refresh_token(self, user_id: str, ip: str | None, user_agent: str | None) -> str:
         token_id = uuid.uuid4()
         secret = generate_token_secret(32)
-        token_hash = hash_token(secret)
+        token_hash = hash_token(self.settings, secret)
+        if self.sessions is not None:
+            await self.sessions.create(str(user_id), str(token_id), token_hash, utcnow().timestamp(), ip, user_agent)
+            return f"{token_id}.{secret}"
         expires_at = utcnow() + timedelta(days=self.settings.REFRESH_TOKEN_EXPIRE_DAYS)
         refresh = RefreshToken(
             id=token_id,
@@ -48,38 +70,174 @@ class TokenService:
         await self.session.flush()
         return f"{token_id}.{secret}"
 
-    async def verify_refresh_token(self, token: str) -> RefreshToken:
+    def _parse_refresh_token(self, token: str) -> tuple[uuid.UUID, str]:
         token_id_str, secret = split_token(token)
         try:
-            token_id = uuid.UUID(token_id_str)
+            return uuid.UUID(token_id_str), secret
         except ValueError:
             raise AuthError("Invalid refresh token", code="refresh_invalid")
+
+    async def verify_refresh_token(self, token: str) -> RefreshToken:
+        token_id, secret = self._parse_refresh_token(token)
         result = await self.session.execute(select(RefreshToken).where(RefreshToken.id == token_id))
         refresh = result.scalar_one_or_none()
         if not refresh:
             raise AuthError("Invalid refresh token", code="refresh_invalid")
         if refresh.revoked_at is not None or refresh.expires_at <= utcnow():
             raise AuthError("Refresh token expired or revoked", code="refresh_expired")
-        if not verify_token(secret, refresh.token_hash):
+        if not await get_password_hasher().verify_token(secret, refresh.token_hash):
             raise AuthError("Invalid refresh token", code="refresh_invalid")
+        if token_hash_needs_update(self.settings, refresh.token_hash):
+            refresh.token_hash = hash_token(self.settings, secret)
         return refresh
 
-    async def rotate_refresh_token(self, token: str, ip: str | None, user_agent: str | None) -> str:
-        refresh = await self.verify_refresh_token(token)
-        await self.session.execute(
-            update(RefreshToken)
-            .where(RefreshToken.id == refresh.id)
-            .values(revoked_at=utcnow(), last_used_at=utcnow())
+    async def rotate_refresh_token(self, token: str, ip: str | None, user_agent: str | None) -> RotatedRefreshToken:
+        token_id, secret = self._parse_refresh_token(token)
+        if self.sessions is not None:
+            return await self._rotate_session(str(token_id), secret, ip, user_agent)
+        rotated = await self._rotate(token_id, secret, ip, user_agent)
+        if rotated is None:
+            # Unknown, spent or expired tokens raise here; digests under an older key or
+            # legacy argon2 hashes verify, get re-digested in place and rotate on retry.
+            await self.verify_refresh_token(token)
+            await self.session.flush()
+            rotated = await self._rotate(token_id, secret, ip, user_agent)
+            if rotated is None:
+                raise AuthError("Refresh token expired or revoked", code="refresh_expired")
+        return rotated
+
+    async def _rotate(
+        self, token_id: uuid.UUID, secret: str, ip: str | None, user_agent: str | None
+    ) -> RotatedRefreshToken | None:
+        now = utcnow()
+        new_id = uuid.uuid4()
+        new_secret = generate_token_secret(32)
+        issued = {
+            "id": new_id,
+            "token_hash": hash_token(self.settings, new_secret),
+            "expires_at": now + timedelta(days=self.settings.REFRESH_TOKEN_EXPIRE_DAYS),
+            "ip_address": ip,
+            "user_agent": user_agent,
+        }
+        tokens = RefreshToken.__table__
+        consume = (
+            update(tokens)
+            .where(
+                tokens.c.id == token_id,
+                tokens.c.token_hash == hash_token(self.settings, secret),
+                tokens.c.revoked_at.is_(None),
+                tokens.c.expires_at > now,
+            )
+            .values(revoked_at=now, last_used_at=now)
+            .returning(tokens.c.user_id)
+        )
+        if self.session.get_bind().dialect.name == "postgresql":
+            row = await self._rotate_in_one_statement(consume, issued)
+        else:
+            row = await self._rotate_sequentially(consume, issued)
+        if row is None:
+            return None
+        return self._rotated(f"{new_id}.{new_secret}", row)
+
+    async def _rotate_session(
+        self, token_id: str, secret: str, ip: str | None, user_agent: str | None
+    ) -> RotatedRefreshToken:
+        stored = await self.sessions.get(token_id)
+        if stored is None or not verify_token(self.settings, secret, stored.token_hash):
+            raise AuthError("Invalid refresh token", code="refresh_invalid")
+        now = utcnow().timestamp()
+        new_id = uuid.uuid4()
+        new_secret = generate_token_secret(32)
+        if stored.expires_at <= now or not await self.sessions.rotate(
+            stored, str(new_id), hash_token(self.settings, new_secret), now, ip, user_agent
+        ):
+            raise AuthError("Refresh token expired or revoked", code="refresh_expired")
+        row = await self._principal_row(stored.user_id)
+        if row is None:
+            raise AuthError("Invalid refresh token", code="refresh_invalid")
+        return self._rotated(f"{new_id}.{new_secret}", row)
+
+    @staticmethod
+    def _rotated(refresh_token: str, row: Row) -> RotatedRefreshToken:
+        return RotatedRefreshToken(
+            refresh_token=refresh_token,
+            user_id=str(row.id),
+            email=row.email,
+            is_active=row.is_active,
+            token_epoch=row.token_epoch,
+            org_id=str(row.org_id) if row.org_id is not None else None,
+            role=row.role,
         )
-        return await self.create_refresh_token(refresh.user_id, ip, user_agent)
+
+    async def _rotate_in_one_statement(self, consume: Update, issued: dict) -> Row | None:
+        tokens = RefreshToken.__table__
+        consumed = consume.cte("consumed")
+        inserted = (
+            insert(tokens)
+            .from_select(
+                ["id", "user_id", "token_hash", "expires_at", "ip_address", "user_agent"],
+                select(
+                    literal(issued["id"], UUID_TYPE),
+                    consumed.c.user_id,
+                    literal(issued["token_hash"], String),
+                    literal(issued["expires_at"], DateTime(timezone=True)),
+                    literal(issued["ip_address"], String),
+                    literal(issued["user_agent"], String),
+                ),
+            )
+            .returning(tokens.c.user_id)
+            .cte("inserted")
+        )
+        primary = (
+            select(Membership.org_id, Membership.role)
+            .where(Membership.user_id == inserted.c.user_id)
+            .order_by(Membership.created_at, Membership.id)
+            .limit(1)
+            .lateral("primary_membership")
+        )
+        result = await self.session.execute(
+            select(User.id, User.email, User.is_active, User.token_epoch, primary.c.org_id, primary.c.role)
+            .select_from(inserted)
+            .join(User, User.id == inserted.c.user_id)
+            .outerjoin(primary, true())
+        )
+        return result.first()
+
+    async def _rotate_sequentially(self, consume: Update, issued: dict) -> Row | None:
+        user_id = (await self.session.execute(consume)).scalar_one_or_none()
+        if user_id is None:
+            return None
+        await self.session.execute(insert(RefreshToken.__table__).values(user_id=user_id, **issued))
+        return await self._principal_row(user_id)
+
+    async def _principal_row(self, user_id: str) -> Row | None:
+        result = await self.session.execute(
+            select(User.id, User.email, User.is_active, User.token_epoch, Membership.org_id, Membership.role)
+            .outerjoin(Membership, Membership.user_id == User.id)
+            .where(User.id == user_id)
+            .order_by(Membership.created_at, Membership.id)
+            .limit(1)
+        )
+        return result.first()
 
     async def revoke_refresh_token(self, token: str) -> None:
+        if self.sessions is not None:
+            token_id, secret = self._parse_refresh_token(token)
+            stored = await self.sessions.get(str(token_id))
+            if stored is None or not verify_token(self.settings, secret, stored.token_hash):
+                raise AuthError("Invalid refresh token", code="refresh_invalid")
+            if not await self.sessions.revoke(stored, utcnow().timestamp()):
+                raise AuthError("Refresh token expired or revoked", code="refresh_expired")
+            return
         refresh = await self.verify_refresh_token(token)
         await self.session.execute(
             update(RefreshToken).where(RefreshToken.id == refresh.id).values(revoked_at=utcnow())
         )
 
     async def revoke_all_tokens_for_user(self, user_id: str) -> None:
+        if self.sessions is not None:
+            await self.sessions.revoke_all(str(user_id), utcnow().timestamp())
+            return
         await self.session.execute(
             update(RefreshToken).where(RefreshToken.user_id == user_id).values(revoked_at=utcnow())
-        )
+        )
@@ -0,0 +1,415 @@
+from __future__ import annotations
+
+import asyncio
+import codecs
+import csv
+import json
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, AsyncIterator
+
+from email_validator import EmailNotValidError, validate_email
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import Settings
+from app.core.exceptions import AppError, ConflictError, NotFoundError, ServiceUnavailableError, ValidationError
+from app.core.hooks import HookManager
+from app.models import Credential, Membership, Role, User, UserImportJob, UserImportResult, VerificationToken
+from app.models.enums import VerificationTokenType
+from app.security.hashing import hash_token, is_importable_password_hash
+from app.security.hashing_executor import HashPriority, PasswordHashingExecutor, get_password_hasher
+from app.services.audit_service import AuditService
+from app.services.email_outbox import enqueue_emails
+from app.utils.security import generate_token_secret, normalize_email
+from app.utils.time import utcnow
+
+IMPORT_FORMATS = ("csv", "ndjson")
+_HASH_ATTEMPTS = 4
+
+
+@dataclass
+class _ImportRow:
+    row_number: int
+    email: str
+    normalized_email: str
+    display_name: str | None
+    role: Role
+    is_verified: bool
+    password: str | None
+    password_hash: str | None
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *complete, pending = pending.split("\n")
+        for line in complete:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def parse_records(
+    chunks: AsyncIterator[bytes], format: str, max_record_length: int = 65536
+) -> AsyncIterator[tuple[int, dict[str, Any] | None]]:
+    # Yields (1-based data row number, record); record is None when the row cannot be parsed.
+    row_number = 0
+    if format == "ndjson":
+        async for line in _lines(chunks):
+            if not line.strip():
+                continue
+            row_number += 1
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield row_number, record if isinstance(record, dict) else None
+        return
+
+    header: list[str] | None = None
+    buffered = ""
+    async for line in _lines(chunks):
+        buffered += line
+        # A quoted field may span lines; "" escapes keep the quote count even once the record is complete.
+        if buffered.count('"') % 2:
+            # A stray quote would otherwise swallow the rest of the file into one record.
+            if len(buffered) > max_record_length:
+                if header is None:
+                    raise ValidationError("Malformed CSV header", code="malformed_header")
+                row_number += 1
+                yield row_number, None
+                buffered = ""
+            continue
+        record_text, buffered = buffered, ""
+        if not record_text.strip():
+            continue
+        values = next(csv.reader([record_text]))
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            continue
+        row_number += 1
+        yield row_number, dict(zip(header, values)) if len(values) == len(header) else None
+    if buffered.strip() and header is not None:
+        yield row_number + 1, None
+
+
+class UserImportService:
+    def __init__(
+        self,
+        session: AsyncSession,
+        settings: Settings,
+        hooks: HookManager,
+        audit_service: AuditService,
+        password_hasher: PasswordHashingExecutor | None = None,
+    ):
+        self.session = session
+        self.settings = settings
+        self.hooks = hooks
+        self.audit_service = audit_service
+        self.password_hasher = password_hasher or get_password_hasher()
+        self.batch_size = settings.USER_IMPORT_BATCH_SIZE
+
+    async def get_job(self, org_id: str, job_id: str) -> UserImportJob:
+        job = await self.session.get(UserImportJob, job_id)
+        if job is None or str(job.org_id) != str(org_id):
+            raise NotFoundError("Import job not found", code="import_not_found")
+        return job
+
+    async def list_results(
+        self, job: UserImportJob, after_row: int = 0, limit: int = 100, failures_only: bool = False
+    ) -> list[UserImportResult]:
+        stmt = select(UserImportResult).where(
+            UserImportResult.job_id == job.id, UserImportResult.row_number > after_row
+        )
+        if failures_only:
+            stmt = stmt.where(UserImportResult.status != "created")
+        stmt = stmt.order_by(UserImportResult.row_number).limit(limit)
+        return list((await self.session.execute(stmt)).scalars().all())
+
+    async def start_job(self, org_id: str, created_by: str | None, format: str, job_id: str | None) -> UserImportJob:
+        if format not in IMPORT_FORMATS:
+            raise ValidationError("Unsupported import format", code="invalid_import_format")
+        if job_id is None:
+            job_id = str(uuid.uuid4())
+            await self.session.execute(
+                insert(UserImportJob.__table__).values(
+                    id=job_id,
+                    org_id=str(org_id),
+                    created_by=str(created_by) if created_by else None,
+                    format=format,
+                    status="running",
+                    processed_rows=0,
+                    created_count=0,
+                    skipped_count=0,
+                    failed_count=0,
+                )
+            )
+            await self.session.commit()
+            return await self.get_job(org_id, job_id)
+        job = await self.get_job(org_id, job_id)
+        now = utcnow()
+        # Only one upload may drive a job; a "running" job whose uploader vanished can be taken over.
+        claimed = await self.session.execute(
+            update(UserImportJob)
+            .where(
+                UserImportJob.id == job.id,
+                UserImportJob.status != "completed",
+                or_(
+                    UserImportJob.status != "running",
+                    UserImportJob.updated_at < now - timedelta(seconds=self.settings.USER_IMPORT_STALE_SECONDS),
+                ),
+            )
+            .values(status="running", error=None, updated_at=now)
+            .returning(UserImportJob.id)
+        )
+        if claimed.first() is None:
+            await self.session.rollback()
+            raise ConflictError(f"Import job is {job.status}", code=f"import_{job.status}")
+        await self.session.commit()
+        await self.session.refresh(job)
+        return job
+
+    async def run(
+        self,
+        job: UserImportJob,
+        chunks: AsyncIterator[bytes],
+        default_role: Role = Role.MEMBER,
+        verified: bool = False,
+    ) -> UserImportJob:
+        job_id = job.id
+        seen: set[str] = set()
+        batch: list[tuple[int, dict[str, Any] | None]] = []
+        try:
+            if verified and not self.verified_domains(job.org_id):
+                raise ValidationError("Organization has no verified email domains", code="no_verified_domains")
+            async for row_number, record in parse_records(
+                chunks, job.format, self.settings.USER_IMPORT_MAX_RECORD_LENGTH
+            ):
+                if row_number <= job.processed_rows:
+                    continue
+                batch.append((row_number, record))
+                if len(batch) >= self.batch_size:
+                    await self._process_batch(job, batch, seen, default_role, verified)
+                    batch = []
+            if batch:
+                await self._process_batch(job, batch, seen, default_role, verified)
+        except BaseException as exc:
+            await self.session.rollback()
+            await self._fail(job_id, exc)
+            raise
+        job.status = "completed"
+        job.completed_at = job.updated_at = utcnow()
+        await self.audit_service.log_event(
+            action="users_imported",
+            org_id=str(job.org_id),
+            user_id=str(job.created_by) if job.created_by else None,
+            metadata={
+                "job_id": str(job.id),
+                "created": job.created_count,
+                "skipped": job.skipped_count,
+                "failed": job.failed_count,
+            },
+        )
+        await self.session.commit()
+        return job
+
+    async def _fail(self, job_id: uuid.UUID, exc: BaseException) -> None:
+        # Committed batches stay; the job can be resumed from processed_rows with the same file.
+        code = exc.code if isinstance(exc, AppError) else type(exc).__name__
+        try:
+            await self.session.execute(
+                update(UserImportJob)
+                .where(UserImportJob.id == job_id)
+                .values(status="failed", error=code[:255], updated_at=utcnow())
+            )
+            await self.session.commit()
+        except Exception:
+            await self.session.rollback()
+
+    async def _process_batch(
+        self,
+        job: UserImportJob,
+        batch: list[tuple[int, dict[str, Any] | None]],
+        seen: set[str],
+        default_role: Role,
+        verified: bool,
+    ) -> None:
+        results: dict[int, dict[str, Any]] = {}
+        rows: list[_ImportRow] = []
+        verified_domains = self.verified_domains(job.org_id) if verified else None
+        for row_number, record in batch:
+            try:
+                row = await self._validate(row_number, record, default_role, verified_domains)
+            except AppError as exc:
+                email = record.get("email") if isinstance(record, dict) else None
+                results[row_number] = _result(job, row_number, str(email)[:320] if email else None, "failed", exc.code)
+                continue
+            if row.normalized_email in seen:
+                results[row_number] = _result(job, row_number, row.email, "skipped", "duplicate_in_file")
+                continue
+            seen.add(row.normalized_email)
+            rows.append(row)
+
+        if rows:
+            existing = set(
+                (
+                    await self.session.execute(
+                        select(User.normalized_email).where(
+                            User.normalized_email.in_([row.normalized_email for row in rows])
+                        )
+                    )
+                ).scalars()
+            )
+            for row in rows:
+                if row.normalized_email in existing:
+                    results[row.row_number] = _result(job, row.row_number, row.email, "skipped", "email_exists")
+            rows = [row for row in rows if row.normalized_email not in existing]
+
+        hashes = await self._hash_all(rows)
+        users, credentials, memberships, tokens, emails = [], [], [], [], []
+        expires_at = utcnow() + timedelta(hours=self.settings.EMAIL_VERIFY_EXPIRE_HOURS)
+        for row, password_hash in zip(rows, hashes):
+            if isinstance(password_hash, AppError):
+                results[row.row_number] = _result(job, row.row_number, row.email, "failed", password_hash.code)
+                continue
+            user_id = str(uuid.uuid4())
+            users.append(
+                {
+                    "id": user_id,
+                    "email": row.email,
+                    "normalized_email": row.normalized_email,
+                    "display_name": row.display_name,
+                    "is_active": True,
+                    "is_verified": row.is_verified,
+                    "custom_fields": {},
+                    "custom_schema_version": self.settings.PROFILE_SCHEMA_VERSION,
+                }
+            )
+            credentials.append({"user_id": user_id, "password_hash": password_hash, "failed_login_attempts": 0})
+            memberships.append(
+                {"id": str(uuid.uuid4()), "user_id": user_id, "org_id": str(job.org_id), "role": row.role}
+            )
+            results[row.row_number] = _result(job, row.row_number, row.email, "created", None, user_id)
+            if not row.is_verified:
+                token_id, secret = str(uuid.uuid4()), generate_token_secret(32)
+                tokens.append(
+                    {
+                        "id": token_id,
+                        "user_id": user_id,
+                        "token_type": VerificationTokenType.EMAIL_VERIFY,
+                        "token_hash": hash_token(self.settings, secret),
+                        "expires_at": expires_at,
+                    }
+                )
+                emails.append(("send_verification_email", row.email, (f"{token_id}.{secret}",)))
+
+        # executemany over Core inserts: one multi-row INSERT per table per batch.
+        if users:
+            await self.session.execute(insert(User.__table__), users)
+            await self.session.execute(insert(Credential.__table__), credentials)
+            await self.session.execute(insert(Membership.__table__), memberships)
+        if tokens:
+            await self.session.execute(insert(VerificationToken.__table__), tokens)
+            await enqueue_emails(self.session, emails)
+        await self.session.execute(insert(UserImportResult.__table__), [results[key] for key in sorted(results)])
+
+        statuses = [result["status"] for result in results.values()]
+        job.processed_rows = batch[-1][0]
+        job.created_count += statuses.count("created")
+        job.skipped_count += statuses.count("skipped")
+        job.failed_count += statuses.count("failed")
+        job.updated_at = utcnow()
+        await self.session.commit()
+
+    def verified_domains(self, org_id: Any) -> frozenset[str]:
+        return frozenset(domain.lower() for domain in self.settings.USER_IMPORT_VERIFIED_DOMAINS.get(str(org_id), []))
+
+    async def _validate(
+        self,
+        row_number: int,
+        record: dict[str, Any] | None,
+        default_role: Role,
+        verified_domains: frozenset[str] | None,
+    ) -> _ImportRow:
+        if record is None:
+            raise ValidationError("Malformed row", code="malformed_row")
+        if "is_verified" in record:
+            raise ValidationError("is_verified cannot be set per row", code="is_verified_not_allowed")
+        email = str(record.get("email") or "").strip()
+        try:
+            validate_email(email, check_deliverability=False)
+        except EmailNotValidError:
+            raise ValidationError("Invalid email", code="invalid_email")
+        await self.hooks.run_email_domain_checks(email)
+        # Marking an address verified skips proof of mailbox ownership, so it is limited to domains the org owns.
+        if verified_domains is not None and email.rpartition("@")[2].lower() not in verified_domains:
+            raise ValidationError("Email domain not verified for this organization", code="domain_not_verified")
+
+        password = record.get("password") or None
+        password_hash = record.get("password_hash") or None
+        if password and password_hash:
+            raise ValidationError("Provide either password or password_hash", code="ambiguous_password")
+        if password_hash:
+            if not is_importable_password_hash(str(password_hash)):
+                raise ValidationError("Unsupported password hash", code="invalid_password_hash")
+        elif password:
+            await self.hooks.run_password_policy(str(password))
+        else:
+            raise ValidationError("Password required", code="password_required")
+
+        try:
+            role = Role(record.get("role") or default_role)
+        except ValueError:
+            raise ValidationError("Invalid role", code="invalid_role")
+        display_name = record.get("display_name") or None
+        return _ImportRow(
+            row_number=row_number,
+            email=email,
+            normalized_email=normalize_email(email),
+            display_name=str(display_name)[:160] if display_name else None,
+            role=role,
+            is_verified=verified_domains is not None,
+            password=str(password) if password else None,
+            password_hash=str(password_hash) if password_hash else None,
+        )
+
+    async def _hash_all(self, rows: list[_ImportRow]) -> list[str | AppError]:
+        # Keep at most one hash per admission slot in flight, at the lowest priority, so a large
+        # import neither overflows the hashing queue nor delays interactive logins.
+        limit = asyncio.Semaphore(self.password_hasher.admission.slots)
+
+        async def _hash(row: _ImportRow) -> str | AppError:
+            if row.password_hash:
+                return row.password_hash
+            async with limit:
+                for attempt in range(_HASH_ATTEMPTS):
+                    try:
+                        return await self.password_hasher.hash(row.password, HashPriority.BULK_IMPORT)
+                    except ServiceUnavailableError as exc:
+                        # Interactive traffic has the hashing queue; back off instead of failing the row.
+                        if attempt == _HASH_ATTEMPTS - 1:
+                            return exc
+                        await asyncio.sleep(0.5 * 2**attempt)
+                    except Exception:
+                        return ValidationError("Password could not be hashed", code="password_hash_failed")
+
+        return list(await asyncio.gather(*(_hash(row) for row in rows)))
+
+
+def _result(
+    job: UserImportJob, row_number: int, email: str | None, status: str, code: str | None, user_id: str | None = None
+) -> dict[str, Any]:
+    return {
+        "job_id": str(job.id),
+        "row_number": row_number,
+        "email": email,
+        "status": status,
+        "code": code,
+        "user_id": user_id,
+    }
+
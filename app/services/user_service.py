@@ -4,6 +4,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import Settings
 from app.models import User
+from app.security.principal import get_principal_cache
+from app.security.revocation import get_token_revocation
 from app.utils.profile_schema import ProfileSchemaRegistry
 
 
@@ -27,4 +29,6 @@ class UserService:
         return user
 
     async def deactivate_user(self, user: User) -> None:
-        user.is_active = False
+        user.is_active = False
+        get_principal_cache().invalidate_user_after_commit(self.session, str(user.id))
+        get_token_revocation().bump_epoch_after_commit(self.session, user)
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import base64
+import json
+import uuid
+from datetime import datetime
+from typing import Any
+
+from app.core.exceptions import ValidationError
+
+
+def encode_cursor(*values: Any) -> str:
+    payload = [value.isoformat() if isinstance(value, datetime) else str(value) for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list[str]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise ValidationError("Invalid cursor", code="invalid_cursor")
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(v, str) for v in values):
+        raise ValidationError("Invalid cursor", code="invalid_cursor")
+    return values
+
+
+def decode_time_cursor(cursor: str) -> tuple[datetime, str]:
+    created_at, ident = decode_cursor(cursor, 2)
+    try:
+        return datetime.fromisoformat(created_at), str(uuid.UUID(ident))
+    except ValueError:
+        raise ValidationError("Invalid cursor", code="invalid_cursor")
+
+
+def decode_int_cursor(cursor: str) -> int:
+    (value,) = decode_cursor(cursor, 1)
+    if not value.isdigit():
+        raise ValidationError("Invalid cursor", code="invalid_cursor")
+    return int(value)
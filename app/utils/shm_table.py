@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+from contextlib import contextmanager
+from stat import S_IMODE, S_ISREG
+from typing import Callable, Iterator
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from app.core.config import Settings
+
+logger = logging.getLogger("app.shared_state")
+
+BUCKET_SLOTS = 8
+_MAGIC = b"UAMSHM01"
+_HEADER = struct.Struct("<8sIII")
+_HEADER_SIZE = 64
+# Slot: blake2b-128 key digest, wall-clock expiry (0 = empty), value length, then value_size bytes.
+_SLOT = struct.Struct("<16sdH")
+
+Update = Callable[[list[bytes | None]], list[tuple[bytes, float] | None]]
+
+
+class TimingWheel:
+    def __init__(self, size: int, tick_seconds: float = 1.0):
+        self.size = size
+        self.tick_seconds = tick_seconds
+        self._slots: list[set[int]] = [set() for _ in range(size)]
+        self._tick = int(time.time() // tick_seconds)
+
+    def schedule(self, at: float, item: int) -> None:
+        # Deadlines past the wheel's span land in its last slot and are rescheduled when that slot comes up.
+        tick = min(max(int(at // self.tick_seconds) + 1, self._tick + 1), self._tick + self.size)
+        self._slots[tick % self.size].add(item)
+
+    def advance(self, now: float) -> set[int]:
+        current = int(now // self.tick_seconds)
+        due: set[int] = set()
+        for tick in range(max(self._tick + 1, current - self.size + 1), current + 1):
+            slot = self._slots[tick % self.size]
+            due |= slot
+            slot.clear()
+        self._tick = max(self._tick, current)
+        return due
+
+
+# Fixed-size hash table in a memory-mapped file, shared by every process on the host that opens the same path. Keys
+# hash to a bucket of BUCKET_SLOTS slots guarded by an fcntl byte-range lock, so operations on different buckets never
+# contend. A full bucket evicts its soonest-expiring entry; the file never grows.
+class SharedMemoryTable:
+    def __init__(self, path: str, slots: int, value_size: int):
+        self.path = path
+        self.buckets = max(slots // BUCKET_SLOTS, 1)
+        self.value_size = value_size
+        self.slot_size = _SLOT.size + value_size
+        self.bucket_size = self.slot_size * BUCKET_SLOTS
+        size = _HEADER_SIZE + self.buckets * self.bucket_size
+        # The file lives in a shared directory and holds OAuth verifiers: never follow a planted symlink, and only
+        # use a regular file this user owns and nobody else can read.
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        try:
+            stat = os.fstat(self._fd)
+            if not S_ISREG(stat.st_mode) or stat.st_uid != os.geteuid() or S_IMODE(stat.st_mode) != 0o600:
+                raise PermissionError(f"refusing shared state file {path}: not a private regular file of this user")
+            header = _HEADER.pack(_MAGIC, self.buckets, BUCKET_SLOTS, value_size)
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, 0)
+            try:
+                # Other processes may have the file mapped, and shrinking it under them is fatal (SIGBUS), so only a
+                # brand-new file is sized here; one with a different layout is refused.
+                if os.fstat(self._fd).st_size == 0:
+                    os.ftruncate(self._fd, size)
+                    os.pwrite(self._fd, header, 0)
+                elif os.pread(self._fd, _HEADER.size, 0) != header or os.fstat(self._fd).st_size != size:
+                    raise ValueError(f"shared state file {path} has a different layout")
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, 0)
+            self._map = mmap.mmap(self._fd, size)
+        except BaseException:
+            os.close(self._fd)
+            raise
+        # Each process sweeps the buckets it wrote to once their entries expire; reads also skip expired entries.
+        self._wheel = TimingWheel(3600)
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+    def get(self, key: str) -> bytes | None:
+        return self.update([key], lambda values: [None])[0]
+
+    def set(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        self.update([key], lambda values: [(value, ttl_seconds)])
+
+    def pop(self, key: str) -> bytes | None:
+        return self.update([key], lambda values: [(b"", 0.0)])[0]
+
+    def update(self, keys: list[str], apply: Update) -> list[bytes | None]:
+        # apply() sees the current values of all keys and returns, per key, (value, ttl) to write, None to leave the
+        # entry alone, or a ttl <= 0 to delete it. It runs with every involved bucket locked, so the whole
+        # read-modify-write is atomic across processes.
+        now = time.time()
+        self._sweep(now)
+        digests = [hashlib.blake2b(key.encode(), digest_size=16).digest() for key in keys]
+        buckets = [self._bucket(digest) for digest in digests]
+        with self._locked(buckets):
+            found = [self._find(bucket, digest, now) for bucket, digest in zip(buckets, digests)]
+            current = [self._value(offset) if offset is not None else None for offset in found]
+            for bucket, digest, offset, change in zip(buckets, digests, found, apply(current)):
+                if change is None:
+                    continue
+                value, ttl = change
+                if len(value) > self.value_size:
+                    raise ValueError(f"value of {len(value)} bytes exceeds slot size {self.value_size}")
+                if ttl <= 0:
+                    if offset is not None:
+                        _SLOT.pack_into(self._map, offset, b"", 0.0, 0)
+                    continue
+                if offset is None:
+                    offset = self._free_slot(bucket, now)
+                _SLOT.pack_into(self._map, offset, digest, now + ttl, len(value))
+                self._map[offset + _SLOT.size : offset + _SLOT.size + len(value)] = value
+                self._wheel.schedule(now + ttl, bucket)
+        return current
+
+    def _bucket(self, digest: bytes) -> int:
+        return int.from_bytes(digest[:8], "little") % self.buckets
+
+    def _slots(self, bucket: int) -> range:
+        start = _HEADER_SIZE + bucket * self.bucket_size
+        return range(start, start + self.bucket_size, self.slot_size)
+
+    def _find(self, bucket: int, digest: bytes, now: float) -> int | None:
+        for offset in self._slots(bucket):
+            slot_digest, expires_at, _ = _SLOT.unpack_from(self._map, offset)
+            if expires_at > now and slot_digest == digest:
+                return offset
+        return None
+
+    def _value(self, offset: int) -> bytes:
+        length = _SLOT.unpack_from(self._map, offset)[2]
+        return bytes(self._map[offset + _SLOT.size : offset + _SLOT.size + length])
+
+    def _free_slot(self, bucket: int, now: float) -> int:
+        soonest, soonest_expiry = None, float("inf")
+        for offset in self._slots(bucket):
+            expires_at = _SLOT.unpack_from(self._map, offset)[1]
+            if expires_at <= now:
+                return offset
+            if expires_at < soonest_expiry:
+                soonest, soonest_expiry = offset, expires_at
+        return soonest
+
+    def _sweep(self, now: float) -> None:
+        for bucket in self._wheel.advance(now):
+            with self._locked([bucket]):
+                live = []
+                for offset in self._slots(bucket):
+                    expires_at = _SLOT.unpack_from(self._map, offset)[1]
+                    if 0 < expires_at <= now:
+                        _SLOT.pack_into(self._map, offset, b"", 0.0, 0)
+                    elif expires_at > now:
+                        live.append(expires_at)
+            if live:
+                self._wheel.schedule(min(live), bucket)
+
+    @contextmanager
+    def _locked(self, buckets: list[int]) -> Iterator[None]:
+        # Sorted so processes locking several buckets always take them in the same order.
+        ordered = sorted(set(buckets))
+        for bucket in ordered:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, 1 + bucket)
+        try:
+            yield
+        finally:
+            for bucket in reversed(ordered):
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, 1 + bucket)
+
+
+def open_shared_table(settings: Settings, name: str, slots: int, value_size: int) -> SharedMemoryTable | None:
+    if not settings.SHARED_STATE_ENABLED or fcntl is None:
+        return None
+    directory = settings.SHARED_STATE_DIR or ("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+    # The layout is part of the name, so workers of a deploy with different sizes get their own file.
+    buckets = max(slots // BUCKET_SLOTS, 1)
+    path = os.path.join(directory, f"{settings.SHARED_STATE_NAMESPACE}-{name}-{buckets}x{value_size}.shm")
+    try:
+        return SharedMemoryTable(path, slots, value_size)
+    except (OSError, ValueError):
+        logger.warning("shared state table unavailable, falling back to per-process state", exc_info=True)
+        return None
@@ -1,10 +1,20 @@
 from __future__ import annotations
 
 import re
+import uuid
+
+from app.core.exceptions import ValidationError
 
 
 def slugify(value: str) -> str:
     value = value.strip().lower()
     value = re.sub(r"[^a-z0-9]+", "-", value)
     value = re.sub(r"-{2,}", "-", value).strip("-")
-    return value
+    return value
+
+
+def parse_uuid(value: str, code: str = "invalid_id") -> str:
+    try:
+        return str(uuid.UUID(value))
+    except ValueError:
+        raise ValidationError("Invalid identifier", code=code)
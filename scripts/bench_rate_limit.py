@@ -0,0 +1,67 @@
+# Compares Redis round trips per rate-limit check for RATE_LIMIT_MODE=exact and hybrid.
+#
+#   REDIS_URL=redis://localhost:6379/15 python scripts/bench_rate_limit.py [requests] [clients] [workers]
+#
+# Traffic is skewed so a few clients send most requests. Each simulated worker has its own limiter, as each uvicorn
+# worker would. Keys are namespaced per run, so the database does not need to be empty.
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import sys
+import time
+import uuid
+
+from prometheus_client import REGISTRY
+from redis.asyncio import Redis
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import Settings  # noqa: E402
+from app.services.rate_limit_service import RateLimit, RateLimiter  # noqa: E402
+
+
+def _redis_calls() -> float:
+    samples = (REGISTRY.get_sample_value("rate_limit_redis_calls_total", {"kind": kind}) for kind in ("check", "sync"))
+    return sum(sample or 0 for sample in samples)
+
+
+async def _run(mode: str, redis: Redis, requests: int, clients: int, workers: int) -> None:
+    settings = Settings.model_construct(
+        RATE_LIMIT_MODE=mode, RATE_LIMIT_SYNC_INTERVAL_MS=250, RATE_LIMIT_SYNC_HITS=1000, RATE_LIMIT_LOCAL_FRACTION=0.5
+    )
+    limiters = [RateLimiter(settings, redis) for _ in range(workers)]
+    run_id = uuid.uuid4().hex[:8]
+    weights = [1 / (rank + 1) for rank in range(clients)]
+    picks = random.Random(7).choices(range(clients), weights, k=requests)
+    before, admitted, latencies = _redis_calls(), 0, []
+    for index, client in enumerate(picks):
+        start = time.perf_counter()
+        result = await limiters[index % workers].check(RateLimit(f"bench:{run_id}:{client}", 120, 60))
+        latencies.append(time.perf_counter() - start)
+        admitted += result.allowed
+    for limiter in limiters:
+        await limiter.stop()
+    calls = _redis_calls() - before
+    latencies.sort()
+    print(
+        f"{mode:>6}: {calls / requests:.3f} redis calls/request, {admitted}/{requests} admitted, "
+        f"p50 {latencies[len(latencies) // 2] * 1e6:.0f}us, p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.0f}us"
+    )
+
+
+async def main() -> None:
+    defaults = [20000, 500, 4]
+    requests, clients, workers = [int(value) for value in sys.argv[1:4]] + defaults[len(sys.argv[1:4]) :]
+    redis = Redis.from_url(os.environ.get("REDIS_URL", "redis://localhost:6379/15"), decode_responses=True)
+    try:
+        for mode in ("exact", "hybrid"):
+            await _run(mode, redis, requests, clients, workers)
+    finally:
+        await redis.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -26,13 +26,18 @@ os.environ["SMTP_PORT"] = "25"
 os.environ["SMTP_USER"] = "test"
 os.environ["SMTP_PASSWORD"] = "test"
 os.environ["EMAIL_FROM"] = "noreply@example.com"
+os.environ["SMTP_POOL_SIZE"] = "0"
+os.environ["SHARED_STATE_ENABLED"] = "false"
 os.environ["SECRET_KEY"] = "test_secret_key_32_chars_minimum"
 os.environ["PUBLIC_BASE_URL"] = "http://localhost"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+os.environ["PASSWORD_HASH_PROFILE"] = "low"
 
 from app.core.config import get_settings
 from app.db.base import Base
 from app.db.session import get_session
 from app.main import app
+from app.services.email_outbox import EmailOutboxWorker
 
 get_settings.cache_clear()
 
@@ -45,7 +50,7 @@ def event_loop():
 
 
 @pytest.fixture(scope="session")
-async def engine():
+async def engine(event_loop):
     engine = create_async_engine(os.environ["DATABASE_URL"], future=True)
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
@@ -80,3 +85,9 @@ def mock_email_delivery(monkeypatch):
         return {}
 
     monkeypatch.setattr(aiosmtplib, "send", _fake_send, raising=False)
+
+
+@pytest.fixture(autouse=True)
+def manual_email_outbox(monkeypatch):
+    # Commits must not start the background sender; tests drive EmailOutboxWorker.process_once themselves.
+    monkeypatch.setattr(EmailOutboxWorker, "notify", lambda self: None)
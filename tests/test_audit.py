@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.api.v1 import admin
+from app.core.config import get_settings
+from app.core.exceptions import ValidationError
+from app.models import AuditEvent, NO_ORG_ID, Role
+from app.services.audit_partitions import expired_partitions, plan_partitions
+from app.services.audit_service import AuditService
+from app.services.audit_writer import AuditWriter
+
+
+@pytest.mark.asyncio
+async def test_audit_writer_batches_and_flushes_on_stop(db_session):
+    writer = AuditWriter(get_settings(), async_sessionmaker(db_session.bind, expire_on_commit=False))
+    for i in range(25):
+        writer.enqueue("login_failed", metadata={"attempt": i})
+    await writer.stop()
+
+    count = await db_session.scalar(
+        select(func.count()).select_from(AuditEvent).where(AuditEvent.action == "login_failed")
+    )
+    assert count == 25
+
+
+@pytest.mark.asyncio
+async def test_audit_events_page_by_keyset_cursor(db_session):
+    base = _utc(2026, 10, 1)
+    user_id = str(uuid.uuid4())
+    rows = [
+        {
+            "id": str(uuid.uuid4()),
+            "user_id": None,
+            "org_id": None,
+            "action": "keyset_probe",
+            "metadata": {"n": i},
+            # Pairs of rows share a timestamp so the id tie-breaker is exercised.
+            "created_at": base + timedelta(minutes=i // 2),
+        }
+        for i in range(7)
+    ]
+    await db_session.execute(insert(AuditEvent.__table__), rows)
+    await db_session.commit()
+
+    service = AuditService(db_session, get_settings())
+    seen, cursor = [], None
+    while True:
+        page, cursor = await service.list_events(action="keyset_probe", cursor=cursor, limit=3)
+        seen.extend(event.event_metadata["n"] for event in page)
+        if cursor is None:
+            break
+    assert sorted(seen) == list(range(7))
+    assert len(seen) == 7
+
+    recent, _ = await service.list_events(action="keyset_probe", since=base + timedelta(minutes=3))
+    assert [event.event_metadata["n"] for event in recent] == [6]
+    assert (await service.list_events(action="keyset_probe", user_id=user_id))[0] == []
+
+    principal = SimpleNamespace(user_id=user_id, org_id=str(uuid.uuid4()), role=Role.ADMIN)
+    for bad in ({"user_id": "1' OR '1"}, {"org_id": "nope"}, {"cursor": "bm9wZQ"}):
+        query = {"org_id": None, "user_id": None, "cursor": None} | bad
+        with pytest.raises(ValidationError):
+            await admin.list_audit_events(
+                **query,
+                action=None,
+                since=None,
+                until=None,
+                limit=50,
+                session=db_session,
+                settings=get_settings(),
+                principal=principal,
+                _=None,
+            )
+
+
+def _utc(*args: int) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+@pytest.mark.asyncio
+async def test_sampled_events_are_counted_in_hourly_rollups(db_session):
+    settings = get_settings().model_copy(update={"AUDIT_SAMPLE_RATES": {"probe_sampled": 0.0}})
+    writer = AuditWriter(settings, async_sessionmaker(db_session.bind, expire_on_commit=False))
+    for _ in range(4):
+        writer.enqueue("probe_sampled")
+    writer.enqueue("probe_kept")
+    await writer.stop()
+
+    stored = await db_session.scalar(
+        select(func.count()).select_from(AuditEvent).where(AuditEvent.action.in_(["probe_sampled", "probe_kept"]))
+    )
+    assert stored == 1
+    now = datetime.now(timezone.utc)
+    stats = await AuditService(db_session, settings).rollup_stats(
+        str(NO_ORG_ID), now - timedelta(hours=1), now + timedelta(hours=1), actions=["probe_sampled", "probe_kept"]
+    )
+    assert {action: count for _, action, count in stats} == {"probe_kept": 1, "probe_sampled": 4}
+
+
+def test_partition_plan_extends_from_last_partition():
+    existing = [
+        ("audit_events_p202608", _utc(2026, 8, 1), _utc(2026, 9, 1)),
+        ("audit_events_p202609", _utc(2026, 9, 1), _utc(2026, 10, 1)),
+        ("audit_events_p202610", _utc(2026, 10, 1), _utc(2026, 11, 1)),
+    ]
+    planned = plan_partitions(existing, _utc(2026, 10, 16, 12), "month", premake=2)
+    assert planned == [
+        ("audit_events_p202611", _utc(2026, 11, 1), _utc(2026, 12, 1)),
+        ("audit_events_p202612", _utc(2026, 12, 1), _utc(2027, 1, 1)),
+    ]
+    assert plan_partitions(existing + planned, _utc(2026, 10, 17), "month", premake=2) == []
+
+    daily = plan_partitions(existing, _utc(2026, 10, 31, 23), "day", premake=1)
+    assert [name for name, _, _ in daily] == ["audit_events_p20261101"]
+
+
+def test_retention_drops_only_fully_expired_partitions():
+    existing = [
+        ("audit_events_p202607", _utc(2026, 7, 1), _utc(2026, 8, 1)),
+        ("audit_events_p202608", _utc(2026, 8, 1), _utc(2026, 9, 1)),
+        ("audit_events_p202609", _utc(2026, 9, 1), _utc(2026, 10, 1)),
+    ]
+    assert expired_partitions(existing, _utc(2026, 10, 16), retention_days=60) == ["audit_events_p202607"]
+    assert expired_partitions(existing, _utc(2026, 10, 16), retention_days=0) == []
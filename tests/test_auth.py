@@ -1,10 +1,25 @@
 from __future__ import annotations
 
+import uuid
+from datetime import timedelta
+from types import SimpleNamespace
+
 import pytest
-from sqlalchemy import select
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
 
-from app.models import User, Credential, Membership, VerificationToken
+from app.api.deps import get_hooks
+from app.core.config import get_settings
+from app.core.exceptions import AuthError
+from app.models import EmailOutboxMessage, User, Credential, Membership, Organization, VerificationToken
 from app.models.enums import VerificationTokenType
+from app.security.hashing import hash_password
+from app.services.audit_service import AuditService
+from app.services.audit_writer import AuditWriter
+from app.services.auth_service import AuthService
+from app.services.email_service import EmailService
+from app.services.token_service import TokenService
+from app.utils.time import utcnow
 
 
 @pytest.mark.asyncio
@@ -36,3 +51,199 @@ async def test_register_login_flow(client, db_session):
     login = await client.post("/api/v1/login", json={"email": "test@example.com", "password": "StrongPass1!"})
     assert login.status_code == 401
     assert login.json()["error"]["code"] == "email_not_verified"
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.keys = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.keys:
+            return None
+        self.keys[key] = value
+        return True
+
+    async def delete(self, key):
+        self.keys.pop(key, None)
+
+    async def pttl(self, key):
+        return 60_000 if key in self.keys else -2
+
+    def register_script(self, script):
+        # Python model of the lockout script.
+        async def _record(keys, args):
+            failures = self.keys[keys[0]] = self.keys.get(keys[0], 0) + 1
+            if failures >= args[0]:
+                self.keys[keys[1]] = "1"
+                self.keys.pop(keys[0])
+                return args[2]
+            return 0
+
+        return _record
+
+
+@pytest.mark.asyncio
+async def test_repeat_token_requests_are_coalesced(db_session, monkeypatch):
+    user_id = str(uuid.uuid4())
+    email = "coalesce@example.com"
+    await db_session.execute(
+        insert(User.__table__).values(
+            id=user_id,
+            email=email,
+            normalized_email=email,
+            is_active=True,
+            is_verified=False,
+            custom_fields={},
+            custom_schema_version=1,
+        )
+    )
+    now = utcnow()
+    await db_session.execute(
+        insert(VerificationToken.__table__).values(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            token_type=VerificationTokenType.PASSWORD_RESET,
+            token_hash="hash",
+            created_at=now,
+            expires_at=now + timedelta(hours=2),
+        )
+    )
+    await db_session.commit()
+
+    settings = get_settings()
+
+    def _service(redis=None):
+        return AuthService(
+            session=db_session,
+            settings=settings,
+            hooks=get_hooks(),
+            token_service=TokenService(db_session, settings),
+            email_service=EmailService(settings),
+            audit_service=AuditService(db_session, settings),
+            redis=redis,
+        )
+
+    async def _counts():
+        tokens = await db_session.scalar(select(func.count()).where(VerificationToken.user_id == user_id))
+        emails = await db_session.scalar(select(func.count()).where(EmailOutboxMessage.recipient == email))
+        return tokens, emails
+
+    # Without Redis the outstanding token in the database absorbs the repeat request.
+    await _service().request_password_reset(email)
+    assert await _counts() == (1, 0)
+
+    # With Redis the marker alone decides; a held marker drops the request before any token work.
+    redis = _FakeRedis()
+    redis.keys[f"token_issue:{VerificationTokenType.EMAIL_VERIFY.value}:{user_id}"] = "1"
+    await _service(redis).request_email_verification(email)
+    assert await _counts() == (1, 0)
+
+    # Using the token releases the marker, so the next request is not swallowed.
+    service = _service(redis)
+
+    async def _consume(token, token_type):
+        return SimpleNamespace(user_id=user_id)
+
+    monkeypatch.setattr(service, "_consume_token", _consume)
+    await service.verify_email("token")
+    assert redis.keys == {}
+
+
+@pytest.mark.asyncio
+async def test_failed_logins_are_counted_in_redis_until_lockout_trips(db_session):
+    user_id = str(uuid.uuid4())
+    email = "lockout@example.com"
+    await db_session.execute(
+        insert(User.__table__).values(
+            id=user_id,
+            email=email,
+            normalized_email=email,
+            is_active=True,
+            is_verified=True,
+            custom_fields={},
+            custom_schema_version=1,
+        )
+    )
+    await db_session.execute(
+        insert(Credential.__table__).values(
+            user_id=user_id, password_hash=hash_password("StrongPass1!"), failed_login_attempts=0
+        )
+    )
+    await db_session.commit()
+
+    settings = get_settings()
+    service = AuthService(
+        session=db_session,
+        settings=settings,
+        hooks=get_hooks(),
+        token_service=TokenService(db_session, settings),
+        email_service=EmailService(settings),
+        audit_service=AuditService(db_session, settings),
+        redis=_FakeRedis(),
+    )
+
+    async def _attempt():
+        with pytest.raises(AuthError) as exc:
+            await service.login(email, "WrongPass1!", None, None, None)
+        return exc.value.code
+
+    async def _row():
+        db_session.expire_all()
+        credential = await db_session.get(Credential, user_id)
+        return credential.failed_login_attempts, credential.lockout_until is not None
+
+    for _ in range(settings.LOCKOUT_THRESHOLD - 1):
+        assert await _attempt() == "invalid_credentials"
+    assert await _row() == (0, False)
+
+    assert await _attempt() == "invalid_credentials"
+    assert await _row() == (settings.LOCKOUT_THRESHOLD, True)
+    assert await _attempt() == "account_locked"
+
+
+@pytest.mark.asyncio
+async def test_failed_login_is_rolled_up_under_the_users_org(db_session):
+    user_id, org_id = str(uuid.uuid4()), str(uuid.uuid4())
+    email = "rollup@example.com"
+    await db_session.execute(insert(Organization.__table__).values(id=org_id, name="Rollup", slug=org_id))
+    await db_session.execute(
+        insert(User.__table__).values(
+            id=user_id,
+            email=email,
+            normalized_email=email,
+            is_active=True,
+            is_verified=True,
+            custom_fields={},
+            custom_schema_version=1,
+        )
+    )
+    await db_session.execute(
+        insert(Credential.__table__).values(
+            user_id=user_id, password_hash=hash_password("StrongPass1!"), failed_login_attempts=0
+        )
+    )
+    await db_session.execute(
+        insert(Membership.__table__).values(id=str(uuid.uuid4()), user_id=user_id, org_id=org_id, role="member")
+    )
+    await db_session.commit()
+
+    settings = get_settings()
+    writer = AuditWriter(settings, async_sessionmaker(db_session.bind, expire_on_commit=False))
+    service = AuthService(
+        session=db_session,
+        settings=settings,
+        hooks=get_hooks(),
+        token_service=TokenService(db_session, settings),
+        email_service=EmailService(settings),
+        audit_service=AuditService(db_session, settings, writer),
+        redis=_FakeRedis(),
+    )
+    with pytest.raises(AuthError):
+        await service.login(email, "WrongPass1!", None, None, None)
+    await writer.stop()
+
+    now = utcnow()
+    stats = await AuditService(db_session, settings, writer).rollup_stats(
+        org_id, now - timedelta(hours=1), now + timedelta(hours=1), actions=["login_failed"]
+    )
+    assert [count for _, _, count in stats] == [1]
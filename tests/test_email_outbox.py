@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.core.config import get_settings
+from app.models import EmailOutboxMessage
+from app.services.email_outbox import EmailOutboxWorker, enqueue_email, open_payload
+from app.utils.time import utcnow
+
+
+class _FlakyEmailService:
+    def __init__(self):
+        self.sent = []
+
+    async def send_password_reset_email(self, to_email, token):
+        self.sent.append((to_email, token))
+
+    async def send_verification_email(self, to_email, token):
+        raise ConnectionError("smtp down")
+
+
+@pytest.mark.asyncio
+async def test_outbox_worker_sends_retries_and_gives_up(db_session):
+    settings = get_settings().model_copy(update={"EMAIL_OUTBOX_MAX_ATTEMPTS": 2})
+    emails = _FlakyEmailService()
+    worker = EmailOutboxWorker(settings, async_sessionmaker(db_session.bind, expire_on_commit=False), emails)
+    await enqueue_email(db_session, "send_password_reset_email", "reset@outbox.example.com", "token-1")
+    await enqueue_email(db_session, "send_verification_email", "verify@outbox.example.com", "token-2")
+    await db_session.rollback()
+    assert await worker.process_once() == 0
+
+    await enqueue_email(db_session, "send_password_reset_email", "reset@outbox.example.com", "token-1")
+    await enqueue_email(db_session, "send_verification_email", "verify@outbox.example.com", "token-2")
+    await db_session.commit()
+    assert await worker.process_once() == 2
+    assert emails.sent == [("reset@outbox.example.com", "token-1")]
+
+    async def _state():
+        db_session.expire_all()
+        rows = await db_session.execute(
+            select(EmailOutboxMessage).where(EmailOutboxMessage.recipient.like("%@outbox.example.com"))
+        )
+        return {row.recipient: row for row in rows.scalars()}
+
+    state = await _state()
+    sent, retry = state["reset@outbox.example.com"], state["verify@outbox.example.com"]
+    assert (sent.status, sent.payload, sent.sent_at is not None) == ("sent", {}, True)
+    assert (retry.status, retry.attempts) == ("pending", 1)
+    # The token is only stored sealed.
+    assert "token-2" not in str(retry.payload)
+    assert open_payload(settings, str(retry.id), retry.payload) == ["token-2"]
+    assert "smtp down" in retry.last_error
+
+    # Not due yet; once due, the second failure exhausts the attempts.
+    assert await worker.process_once() == 0
+    retry.next_attempt_at = utcnow()
+    await db_session.commit()
+    assert await worker.process_once() == 1
+    retry = (await _state())["verify@outbox.example.com"]
+    assert (retry.status, retry.attempts, retry.payload) == ("failed", 2, {})
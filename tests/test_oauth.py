@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import uuid
+
+import pytest
+from sqlalchemy import insert
+
+from app.core.config import get_settings
+from app.models import Credential, User
+from app.security.hashing import hash_password, verify_password
+from app.services.oauth_service import OAuthService
+
+
+@pytest.mark.asyncio
+async def test_linking_an_unverified_account_replaces_its_password(db_session):
+    user_id = str(uuid.uuid4())
+    email = "squatter@example.com"
+    await db_session.execute(
+        insert(User.__table__).values(
+            id=user_id,
+            email=email,
+            normalized_email=email,
+            is_active=True,
+            is_verified=False,
+            custom_fields={},
+            custom_schema_version=1,
+        )
+    )
+    await db_session.execute(
+        insert(Credential.__table__).values(
+            user_id=user_id, password_hash=hash_password("Squatter#Pass1"), failed_login_attempts=0
+        )
+    )
+    await db_session.commit()
+
+    service = OAuthService(db_session, get_settings(), None, None, None, None)
+    user = await db_session.get(User, user_id)
+    await service._claim_unverified(user)
+    await db_session.commit()
+
+    db_session.expire_all()
+    credential = await db_session.get(Credential, user_id)
+    assert (await db_session.get(User, user_id)).is_verified
+    assert not verify_password("Squatter#Pass1", credential.password_hash)
@@ -1,9 +1,96 @@
 from __future__ import annotations
 
+import uuid
+
 import pytest
+from sqlalchemy import insert, select
+
+from app.core.config import get_settings
+from app.core.exceptions import ConflictError
+from app.models import EmailOutboxMessage, Membership, Organization, Role, User
+from app.services.email_outbox import open_payload
+from app.services.email_service import EmailService
+from app.services.org_service import OrgService
 
 
 @pytest.mark.asyncio
 async def test_org_list_requires_auth(client):
     res = await client.get("/api/v1/orgs")
-    assert res.status_code == 401
+    assert res.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_batch_invitations_dedupe_and_manage(db_session):
+    org_id, admin_id, member_id = (str(uuid.uuid4()) for _ in range(3))
+    await db_session.execute(insert(Organization.__table__), [{"id": org_id, "name": "Batch", "slug": org_id}])
+    await db_session.execute(
+        insert(User.__table__),
+        [
+            {
+                "id": user_id,
+                "email": email,
+                "normalized_email": email,
+                "is_active": True,
+                "is_verified": True,
+                "custom_fields": {},
+                "custom_schema_version": 1,
+            }
+            for user_id, email in [(admin_id, "boss@batch.example.com"), (member_id, "member@batch.example.com")]
+        ],
+    )
+    await db_session.execute(
+        insert(Membership.__table__),
+        [
+            {"id": str(uuid.uuid4()), "user_id": admin_id, "org_id": org_id, "role": Role.ADMIN},
+            {"id": str(uuid.uuid4()), "user_id": member_id, "org_id": org_id, "role": Role.MEMBER},
+        ],
+    )
+    await db_session.commit()
+
+    settings = get_settings()
+    service = OrgService(db_session, settings, EmailService(settings))
+    await service.invite_batch(
+        org_id, admin_id, [("new1@batch.example.com", Role.MEMBER), ("New2@Batch.example.com", Role.READONLY)]
+    )
+    await db_session.commit()
+
+    second = await service.invite_batch(
+        org_id,
+        admin_id,
+        [
+            ("NEW1@batch.example.com", Role.MEMBER),
+            ("Member@batch.example.com", Role.MEMBER),
+            ("new3@batch.example.com", Role.MEMBER),
+            ("new3@batch.example.com", Role.ADMIN),
+            ("not an email", Role.MEMBER),
+        ],
+    )
+    await db_session.commit()
+    assert [email for email, _ in second.invited] == ["new3@batch.example.com"]
+    assert sorted(reason for _, reason in second.skipped) == [
+        "already_invited",
+        "already_member",
+        "duplicate",
+        "invalid_email",
+    ]
+
+    outbox = await db_session.execute(
+        select(EmailOutboxMessage.id, EmailOutboxMessage.recipient, EmailOutboxMessage.payload).where(
+            EmailOutboxMessage.recipient.like("%@batch.example.com")
+        )
+    )
+    settings = get_settings()
+    assert sorted((to, open_payload(settings, str(id_), payload)[0]) for id_, to, payload in outbox.all()) == [
+        ("new1@batch.example.com", "Batch"),
+        ("new2@batch.example.com", "Batch"),
+        ("new3@batch.example.com", "Batch"),
+    ]
+
+    page, cursor = await service.list_invitations(org_id, status="pending", limit=2)
+    rest, _ = await service.list_invitations(org_id, status="pending", cursor=cursor, limit=2)
+    assert len(page) == 2 and len(rest) == 1
+    revoked = await service.revoke_invitation(org_id, str(page[0].id))
+    await db_session.commit()
+    assert len((await service.list_invitations(org_id, status="revoked"))[0]) == 1
+    with pytest.raises(ConflictError):
+        await service.resend_invitation(org_id, str(revoked.id))
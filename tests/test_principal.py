@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import uuid
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy import event
+
+from app.core.config import get_settings
+from app.models import User, Membership, Organization, Role
+from app.security.jwt import create_access_token
+from app.security.principal import Principal, get_principal_cache, load_principal
+
+
+async def _seed_member(db_session) -> tuple[str, str]:
+    user_id, org_id = str(uuid.uuid4()), str(uuid.uuid4())
+    db_session.add(User(id=user_id, email=f"{user_id}@example.com", normalized_email=f"{user_id}@example.com"))
+    db_session.add(Organization(id=org_id, name="Acme", slug=f"acme-{org_id}"))
+    await db_session.flush()
+    db_session.add(Membership(id=str(uuid.uuid4()), user_id=user_id, org_id=org_id, role=Role.ADMIN))
+    await db_session.commit()
+    return user_id, org_id
+
+
+def _auth_headers(user_id: str, org_id: str) -> dict[str, str]:
+    token, _ = create_access_token(get_settings(), user_id, "a@example.com", "admin", org_id, ["orgs:read"])
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.asyncio
+async def test_principal_is_cached_and_invalidated_on_commit(client, db_session):
+    user_id, org_id = await _seed_member(db_session)
+    cache = get_principal_cache()
+
+    res = await client.get("/api/v1/orgs", headers=_auth_headers(user_id, org_id))
+    assert res.status_code == 200
+    cached = await cache.get(user_id, org_id)
+    assert cached is not None and cached.role == Role.ADMIN and cached.org_active
+
+    user = await db_session.get(User, user_id)
+    user.is_active = False
+    cache.invalidate_user_after_commit(db_session, user_id)
+    await db_session.commit()
+    assert await cache.get(user_id, org_id) is None
+
+    res = await client.get("/api/v1/orgs", headers=_auth_headers(user_id, org_id))
+    assert res.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_principal_cache_discards_invalidations_on_rollback(db_session):
+    cache = get_principal_cache()
+    await cache.set(Principal("u-rollback", "o-rollback", Role.MEMBER, True, True, True))
+    cache.invalidate_user_after_commit(db_session, "u-rollback")
+    await db_session.rollback()
+    assert await cache.get("u-rollback", "o-rollback") is not None
+
+
+@pytest.mark.asyncio
+async def test_org_scoped_request_resolves_principal_in_one_query(client, engine, db_session):
+    user_id, org_id = await _seed_member(db_session)
+    statements: list[str] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _record)
+    try:
+        principal = await load_principal(db_session, user_id, org_id)
+        assert len(statements) == 1
+        assert principal.role == Role.ADMIN and principal.org_active
+
+        statements.clear()
+        res = await client.get("/api/v1/orgs", headers=_auth_headers(user_id, org_id))
+        assert res.status_code == 200
+        # Cold cache: one principal query plus the org listing itself.
+        assert len(statements) == 2
+
+        statements.clear()
+        res = await client.get("/api/v1/orgs", headers=_auth_headers(user_id, org_id))
+        assert res.status_code == 200
+        assert len(statements) == 1
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", _record)
+
+
+@pytest.mark.asyncio
+async def test_principal_loaded_before_an_invalidation_is_not_cached():
+    cache = get_principal_cache()
+    generation = await cache.generation("u-race")
+    # The role change commits and invalidates while the request still holds the principal it loaded earlier.
+    cache.invalidate_soon({"u:u-race"})
+    await cache.set(Principal("u-race", "o-race", Role.ADMIN, True, True, True), generation)
+    assert await cache.get("u-race", "o-race") is None
+
+    await cache.set(Principal("u-race", "o-race", Role.MEMBER, True, True, True), await cache.generation("u-race"))
+    assert (await cache.get("u-race", "o-race")).role == Role.MEMBER
+
+
+class _DownRedis:
+    async def get(self, key):
+        raise RedisConnectionError("redis down")
+
+    def pipeline(self, transaction=True):
+        return _DownPipeline()
+
+    def register_script(self, script):
+        async def _run(keys, args):
+            raise RedisConnectionError("redis down")
+
+        return _run
+
+
+class _DownPipeline:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+    async def execute(self):
+        raise RedisConnectionError("redis down")
+
+
+@pytest.mark.asyncio
+async def test_org_routes_survive_a_redis_outage(client, db_session, monkeypatch):
+    user_id, org_id = await _seed_member(db_session)
+    cache = get_principal_cache()
+    redis = _DownRedis()
+    monkeypatch.setattr(cache, "redis", redis)
+    monkeypatch.setattr(cache, "_set_if_current", redis.register_script(""))
+
+    res = await client.get("/api/v1/orgs", headers=_auth_headers(user_id, org_id))
+    assert res.status_code == 200
+    await cache.invalidate(f"u:{user_id}")
+    # Nothing is cached while the shared tier is unreachable.
+    monkeypatch.setattr(cache, "redis", None)
+    assert await cache.get(user_id, org_id) is None
@@ -1,9 +1,117 @@
 from __future__ import annotations
 
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
 import pytest
+from sqlalchemy import insert
+
+from app.api.v1 import admin
+from app.core.config import get_settings
+from app.core.exceptions import ForbiddenError, ValidationError
+from app.models import Membership, Organization, Role, User
+from app.services.admin_user_service import AdminUserService, UserFilters
+from app.utils.pagination import encode_cursor
 
 
 @pytest.mark.asyncio
 async def test_admin_list_users_requires_scope(client):
     res = await client.get("/api/v1/admin/users")
-    assert res.status_code == 401
+    assert res.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_admin_user_listing_pages_filters_and_exports(db_session, monkeypatch):
+    base = datetime(2026, 9, 1, tzinfo=timezone.utc)
+    await db_session.execute(
+        insert(User.__table__),
+        [
+            {
+                "id": str(uuid.uuid4()),
+                "email": f"Listing{i}@Example.com",
+                "normalized_email": f"listing{i}@example.com",
+                "is_active": True,
+                "is_verified": i % 2 == 0,
+                "custom_fields": {},
+                "custom_schema_version": 1,
+                "created_at": base + timedelta(hours=i),
+                "updated_at": base,
+            }
+            for i in range(5)
+        ],
+    )
+    await db_session.commit()
+
+    service = AdminUserService(db_session, get_settings())
+    filters = UserFilters(email_prefix="Listing", is_verified=True)
+    first, cursor = await service.list_users(filters, limit=2)
+    second, tail = await service.list_users(filters, cursor=cursor, limit=2)
+    assert [row["email"] for row in first + second] == [
+        "Listing4@Example.com",
+        "Listing2@Example.com",
+        "Listing0@Example.com",
+    ]
+    assert tail is None
+    assert (await service.list_users(UserFilters(email_prefix="listing_")))[0] == []
+
+    async def rows():
+        async for row in service.stream_users(UserFilters(email_prefix="listing")):
+            yield row
+
+    monkeypatch.setattr(admin, "_EXPORT_CHUNK_ROWS", 2)
+    chunks = [chunk async for chunk in admin._csv_chunks(rows())]
+    lines = "".join(chunks).splitlines()
+    assert len(chunks) == 3
+    assert lines[0] == "id,email,display_name,is_active,is_verified,created_at"
+    assert [line.split(",")[1] for line in lines[1:]] == [f"Listing{i}@Example.com" for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_admin_user_listing_is_scoped_to_the_callers_org(db_session):
+    own_org, other_org = str(uuid.uuid4()), str(uuid.uuid4())
+    own_user, other_user = str(uuid.uuid4()), str(uuid.uuid4())
+    await db_session.execute(
+        insert(Organization.__table__),
+        [{"id": org_id, "name": org_id, "slug": org_id} for org_id in (own_org, other_org)],
+    )
+    await db_session.execute(
+        insert(User.__table__),
+        [
+            {
+                "id": user_id,
+                "email": f"{user_id}@scoped.example.com",
+                "normalized_email": f"{user_id}@scoped.example.com",
+                "is_active": True,
+                "is_verified": True,
+                "custom_fields": {},
+                "custom_schema_version": 1,
+            }
+            for user_id in (own_user, other_user)
+        ],
+    )
+    await db_session.execute(
+        insert(Membership.__table__),
+        [
+            {"id": str(uuid.uuid4()), "user_id": own_user, "org_id": own_org, "role": Role.ADMIN},
+            {"id": str(uuid.uuid4()), "user_id": other_user, "org_id": other_org, "role": Role.ADMIN},
+        ],
+    )
+    await db_session.commit()
+
+    principal = SimpleNamespace(user_id=own_user, org_id=own_org, role=Role.ADMIN)
+
+    async def _list(filters, cursor=None):
+        return await admin.list_users(filters, cursor, 50, db_session, get_settings(), principal, None)
+
+    def _filters(org_id=None):
+        return admin.user_filters(org_id=org_id, email_prefix=None)
+
+    page = await _list(_filters())
+    assert [str(row.id) for row in page.items] == [own_user]
+    with pytest.raises(ForbiddenError):
+        await _list(_filters(other_org))
+    with pytest.raises(ValidationError):
+        _filters("1 OR 1=1")
+    with pytest.raises(ValidationError):
+        await _list(_filters(), cursor=encode_cursor(datetime.now(timezone.utc), "not-a-uuid"))
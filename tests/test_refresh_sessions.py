@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import uuid
+
+import pytest
+from sqlalchemy import select
+
+from app.models import RefreshToken, User
+from app.core.config import get_settings
+from app.security.refresh_sessions import (
+    PENDING_KEY,
+    RefreshSessionHistoryWriter,
+    apply_session_history,
+    history_key,
+)
+from app.utils.time import utcnow
+
+
+@pytest.mark.asyncio
+async def test_session_history_is_written_idempotently(db_session):
+    user_id = str(uuid.uuid4())
+    db_session.add(User(id=user_id, email=f"{user_id}@example.com", normalized_email=f"{user_id}@example.com"))
+    await db_session.commit()
+
+    now = utcnow().timestamp()
+    first, second, third = (str(uuid.uuid4()) for _ in range(3))
+
+    def created(token_id: str, at: float) -> dict:
+        return {"op": "create", "id": token_id, "u": user_id, "h": "digest", "c": at, "e": at + 3600, "ip": None}
+
+    events = [
+        created(first, now - 10),
+        created(second, now - 5),
+        {"op": "revoke", "id": first, "at": now - 5, "used": True},
+        {"op": "revoke_all", "user_id": user_id, "at": now - 1},
+        created(third, now),
+    ]
+    for _ in range(2):
+        await apply_session_history(db_session, events)
+        await db_session.commit()
+
+    rows = {
+        str(row.id): row
+        for row in (await db_session.execute(select(RefreshToken).where(RefreshToken.user_id == user_id))).scalars()
+    }
+    assert set(rows) == {first, second, third}
+    assert rows[first].revoked_at is not None and rows[first].last_used_at is not None
+    assert rows[second].revoked_at is not None and rows[second].last_used_at is None
+    assert rows[third].revoked_at is None
+
+
+class _FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args: self.calls.append((name, args))
+
+    async def execute(self):
+        return [await getattr(self.redis, name)(*args) for name, args in self.calls]
+
+
+class _FakeRedis:
+    def __init__(self, lists: dict[str, list[str]], pending: set[str]):
+        self.lists = lists
+        self.sets = {PENDING_KEY: pending}
+
+    async def set(self, key, value, nx=False, px=None):
+        return True
+
+    async def eval(self, script, numkeys, *args):
+        return 1
+
+    async def spop(self, key, count):
+        members = self.sets[key]
+        return [members.pop() for _ in range(min(count, len(members)))]
+
+    async def sadd(self, key, *members):
+        self.sets[key].update(members)
+
+    async def lpop(self, key, count):
+        items = self.lists.get(key, [])
+        popped, self.lists[key] = items[:count], items[count:]
+        return popped or None
+
+    async def lpush(self, key, *items):
+        self.lists[key] = list(reversed(items)) + self.lists.get(key, [])
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+
+@pytest.mark.asyncio
+async def test_history_writer_drains_per_user_lists_and_requeues_on_failure(monkeypatch):
+    users = [str(uuid.uuid4()) for _ in range(3)]
+    lists = {history_key(user_id): [f'{{"n": {i}}}' for i in range(3)] for user_id in users}
+    redis = _FakeRedis({key: list(items) for key, items in lists.items()}, set(users))
+    writer = RefreshSessionHistoryWriter(get_settings().model_copy(update={"REFRESH_SESSION_FLUSH_BATCH": 2}))
+    writer.redis = redis
+
+    async def _fail(events):
+        raise RuntimeError("database down")
+
+    monkeypatch.setattr(writer, "_write", _fail)
+    with pytest.raises(RuntimeError):
+        await writer.flush()
+    assert redis.lists == lists and redis.sets[PENDING_KEY] == set(users)
+
+    written = []
+
+    async def _record(events):
+        written.extend(event["n"] for event in events)
+
+    monkeypatch.setattr(writer, "_write", _record)
+    assert await writer.flush() == 9
+    assert sorted(written) == [0, 0, 0, 1, 1, 1, 2, 2, 2]
+    assert not redis.sets[PENDING_KEY] and not any(redis.lists.values())
@@ -0,0 +1,377 @@
+from __future__ import annotations
+
+import asyncio
+import uuid
+from datetime import timedelta
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from cryptography.hazmat.primitives.serialization import Encoding, NoEncryption, PrivateFormat
+from passlib.context import CryptContext
+from pydantic import ValidationError as PydanticValidationError
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy.dialects import postgresql
+from starlette.requests import Request
+
+from app.core.config import Settings, get_settings
+from app.core.exceptions import AuthError, RateLimitError, ServiceUnavailableError
+from app.security.hashing import (
+    Argon2Params,
+    argon2_params,
+    configure_password_hashing,
+    hash_password,
+    hash_token,
+    password_needs_update,
+    token_hash_needs_update,
+    verify_password,
+    verify_token,
+)
+from app.security.hashing_executor import HashAdmission, HashPriority, PasswordHashingExecutor
+from app.security.jwt import create_access_token, decode_access_token
+from app.security.keys import get_key_ring
+from app.schemas.token import TokenPayload
+from app.security.refresh_flight import RefreshSingleFlight
+from app.security.revocation import TokenRevocation
+from app.services.rate_limit_policy import RateLimitPolicyEngine
+from app.services.rate_limit_service import HybridRateLimiter, RateLimit, RateLimiter
+from app.services.token_service import TokenService
+from app.utils.bloom import BloomFilter
+from app.utils.time import utcnow
+
+
+def test_token_digest_round_trip():
+    settings = get_settings()
+    digest = hash_token(settings, "secret-value")
+    assert digest.startswith(f"hmac-sha256${settings.TOKEN_HASH_KEY_ID}$")
+    assert verify_token(settings, "secret-value", digest)
+    assert not verify_token(settings, "other-value", digest)
+    assert not token_hash_needs_update(settings, digest)
+
+
+async def test_token_digest_accepts_legacy_argon2_hash():
+    settings = get_settings()
+    legacy = CryptContext(schemes=["argon2"]).hash("secret-value")
+    hasher = PasswordHashingExecutor(settings)
+    try:
+        assert await hasher.verify_token("secret-value", legacy)
+        assert not await hasher.verify_token("other-value", legacy)
+        assert not await hasher.verify_token("secret-value", "not-a-hash")
+    finally:
+        hasher.shutdown()
+    # The synchronous check never runs argon2 on the caller's thread.
+    assert not verify_token(settings, "secret-value", legacy)
+    assert token_hash_needs_update(settings, legacy)
+
+
+def test_token_digest_verifies_previous_key_id():
+    settings = get_settings().model_copy(update={"TOKEN_HASH_KEY_ID": "k0"})
+    old_digest = hash_token(settings, "secret-value")
+    current = get_settings()
+    assert verify_token(current, "secret-value", old_digest)
+    assert token_hash_needs_update(current, old_digest)
+
+
+async def test_hash_admission_prefers_login_over_registration():
+    admission = HashAdmission(slots=1, max_queue=10, max_wait_seconds=1)
+    await admission.acquire(HashPriority.LOGIN)
+    order: list[str] = []
+
+    async def waiter(name: str, priority: HashPriority):
+        await admission.acquire(priority)
+        order.append(name)
+        admission.release()
+
+    registration = asyncio.create_task(waiter("register", HashPriority.REGISTRATION))
+    await asyncio.sleep(0)
+    login = asyncio.create_task(waiter("login", HashPriority.LOGIN))
+    await asyncio.sleep(0)
+    admission.release()
+    await asyncio.gather(registration, login)
+    assert order == ["login", "register"]
+
+
+async def test_hash_admission_rejects_when_queue_full():
+    admission = HashAdmission(slots=1, max_queue=0, max_wait_seconds=1)
+    await admission.acquire(HashPriority.LOGIN)
+    with pytest.raises(ServiceUnavailableError):
+        await admission.acquire(HashPriority.LOGIN)
+
+
+async def test_hash_admission_times_out_waiters():
+    admission = HashAdmission(slots=1, max_queue=5, max_wait_seconds=0.01)
+    await admission.acquire(HashPriority.LOGIN)
+    with pytest.raises(ServiceUnavailableError):
+        await admission.acquire(HashPriority.REGISTRATION)
+    assert admission.queued == 0
+
+
+def test_password_needs_update_only_upgrades():
+    weak = Argon2Params(time_cost=1, memory_cost=512, parallelism=1)
+    strong = Argon2Params(time_cost=2, memory_cost=2048, parallelism=1)
+    try:
+        configure_password_hashing(weak)
+        weak_hash = hash_password("StrongPass1!")
+        configure_password_hashing(strong)
+        strong_hash = hash_password("StrongPass1!")
+        assert password_needs_update(weak_hash)
+        assert not password_needs_update(strong_hash)
+        configure_password_hashing(weak)
+        assert not password_needs_update(strong_hash)
+        assert verify_password("StrongPass1!", strong_hash)
+    finally:
+        configure_password_hashing(argon2_params(get_settings()))
+
+
+def test_low_hash_profile_is_rejected_in_production():
+    with pytest.raises(PydanticValidationError):
+        Settings(ENV="production", PASSWORD_HASH_PROFILE="low")
+    assert Settings(ENV="production", PASSWORD_HASH_PROFILE="standard").PASSWORD_HASH_PROFILE == "standard"
+
+
+def _ed25519_pem() -> str:
+    key = Ed25519PrivateKey.generate()
+    return key.private_bytes(Encoding.PEM, PrivateFormat.PKCS8, NoEncryption()).decode()
+
+
+def test_asymmetric_jwt_uses_newest_active_key_and_publishes_jwks():
+    future = (utcnow() + timedelta(days=1)).isoformat()
+    settings = get_settings().model_copy(
+        update={
+            "JWT_ALGORITHM": "EdDSA",
+            "JWT_SIGNING_KEYS": [
+                {"kid": "old", "private_key": _ed25519_pem(), "not_before": "2026-01-01T00:00:00+00:00"},
+                {"kid": "current", "private_key": _ed25519_pem(), "not_before": "2026-02-01T00:00:00"},
+                {"kid": "next", "private_key": _ed25519_pem(), "not_before": future},
+            ],
+        }
+    )
+    token, _ = create_access_token(settings, "user-1", "a@example.com", "admin", "org-1", ["profile:read"])
+    assert jwt.get_unverified_header(token)["kid"] == "current"
+    assert decode_access_token(settings, token)["sub"] == "user-1"
+    kids = [key["kid"] for key in get_key_ring(settings).jwks()["keys"]]
+    assert kids == ["current", "next", "old"]
+
+
+async def test_jwks_endpoint_is_cacheable(client):
+    res = await client.get("/.well-known/jwks.json")
+    assert res.status_code == 200
+    assert "max-age" in res.headers["Cache-Control"]
+    cached = await client.get("/.well-known/jwks.json", headers={"If-None-Match": res.headers["ETag"]})
+    assert cached.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_checks_keys_together_and_reports_headers():
+    limiter = RateLimiter(get_settings())
+    route, user = RateLimit("login:1.2.3.4", 3, 60), RateLimit("login:user-1", 2, 60)
+
+    first = await limiter.hit(route, user)
+    assert (first.limit, first.remaining) == (2, 1)
+    assert first.headers()["RateLimit-Remaining"] == "1"
+    await limiter.hit(route, user)
+    with pytest.raises(RateLimitError) as exc:
+        await limiter.hit(route, user)
+    assert exc.value.headers["RateLimit-Limit"] == "2"
+    assert 1 <= int(exc.value.headers["Retry-After"]) <= 30
+
+    # The rejected call consumed nothing, so the route key still has one request left on its own.
+    only_route = await limiter.hit(route)
+    assert only_route.remaining == 0
+    with pytest.raises(RateLimitError):
+        await limiter.hit(route)
+
+
+def _request(path: str, ip: str, token: str | None = None) -> Request:
+    headers = [(b"authorization", f"Bearer {token}".encode())] if token else []
+    return Request({"type": "http", "method": "POST", "path": path, "headers": headers, "client": (ip, 1234)})
+
+
+def test_rate_limit_policy_engine_keys_and_tiers():
+    org_id = str(uuid.uuid4())
+    settings = get_settings().model_copy(
+        update={
+            "RATE_LIMIT_POLICIES": [
+                {"name": "org", "key": "org", "limit": 100, "period_seconds": 60, "tier_limits": {"gold": 1000}},
+                {"name": "net", "key": "ip_prefix", "limit": 50, "period_seconds": 60, "prefixes": ["/api/v1/orgs"]},
+            ],
+            "RATE_LIMIT_ORG_TIERS": {org_id: "gold"},
+        }
+    )
+    engine = RateLimitPolicyEngine(settings)
+
+    login = engine.limits_for(_request("/api/v1/login", "10.0.0.7"))
+    assert [(limit.key, limit.limit) for limit in login] == [
+        ("global:10.0.0.7", settings.RATE_LIMIT_GLOBAL_PER_MINUTE),
+        ("login:10.0.0.7", settings.RATE_LIMIT_LOGIN_PER_MINUTE),
+    ]
+
+    token, _ = create_access_token(settings, "user-1", "a@example.com", "member", org_id, [])
+    limits = engine.limits_for(_request("/api/v1/orgs/x/members", "2001:db8::1", token))
+    assert {limit.key: limit.limit for limit in limits} == {
+        "global:2001:db8::1": settings.RATE_LIMIT_GLOBAL_AUTHENTICATED_PER_MINUTE,
+        "user:user-1": settings.RATE_LIMIT_USER_PER_MINUTE,
+        f"org:{org_id}": 1000,
+        "net:2001:db8::/64": 50,
+    }
+
+
+class _WindowSyncScript:
+    # Python model of the hybrid Lua script: shared fixed-window counters standing in for Redis.
+    def __init__(self):
+        self.counts = {}
+        self.calls = 0
+
+    async def __call__(self, keys, args):
+        self.calls += 1
+        triples = [args[index : index + 3] for index in range(0, len(args), 3)]
+        totals = [self.counts.get(key, 0) + delta for key, (delta, _, _) in zip(keys, triples)]
+        admitted = int(all(limit and total + 1 <= limit for total, (_, _, limit) in zip(totals, triples)))
+        for key, (delta, _, _) in zip(keys, triples):
+            self.counts[key] = self.counts.get(key, 0) + delta + admitted
+        return [admitted, *(total + admitted for total in totals)]
+
+
+@pytest.mark.asyncio
+async def test_hybrid_rate_limiter_batches_redis_calls_and_enforces_limit():
+    settings = get_settings().model_copy(
+        update={"RATE_LIMIT_SYNC_INTERVAL_MS": 60_000, "RATE_LIMIT_SYNC_HITS": 1000, "RATE_LIMIT_LOCAL_FRACTION": 0.5}
+    )
+    script = _WindowSyncScript()
+    workers = [HybridRateLimiter(settings, script), HybridRateLimiter(settings, script)]
+    rule = RateLimit("global:10.0.0.1", 100, 3600)
+
+    admitted = 0
+    for index in range(150):
+        admitted += (await workers[index % 2].check((rule,))).allowed
+    # Each worker decides locally up to half the limit, then checks the shared counter, which learns of the other
+    # worker's local hits only when they are handed over (one request of overshoot here). Once the counter reports
+    # the window full, both workers reject locally.
+    assert admitted == 101
+    assert script.calls == 3
+    for worker in workers:
+        await worker.stop()
+    assert sum(script.counts.values()) == admitted
+
+    fresh = RateLimit("global:10.0.0.2", 100, 3600)
+    for _ in range(40):
+        assert (await workers[0].check((fresh,))).allowed
+    calls = script.calls
+    await workers[0].sync()
+    assert script.calls == calls + 1
+    await workers[0].stop()
+
+
+class _RecordingPostgresSession:
+    def __init__(self):
+        self.statements = []
+
+    def get_bind(self):
+        return type("Bind", (), {"dialect": postgresql.dialect()})
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+        return type("Result", (), {"first": lambda self: None})()
+
+
+@pytest.mark.asyncio
+async def test_refresh_rotation_is_a_single_statement_on_postgres():
+    session = _RecordingPostgresSession()
+    rotated = await TokenService(session, get_settings())._rotate(uuid.uuid4(), "secret", None, None)
+    assert rotated is None
+    assert len(session.statements) == 1
+    statement = session.statements[0]
+    assert statement.startswith("WITH consumed AS")
+    assert "revoked_at IS NULL" in statement and "INSERT INTO refresh_tokens" in statement
+    assert "JOIN LATERAL" in statement
+
+
+@pytest.mark.asyncio
+async def test_concurrent_refreshes_share_one_rotation():
+    flight = RefreshSingleFlight(get_settings())
+    calls = 0
+
+    async def rotate():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return f"access-{calls}", f"refresh-{calls}", 900
+
+    results = await asyncio.gather(*(flight.run("id.secret", rotate) for _ in range(5)))
+    assert calls == 1
+    assert set(results) == {("access-1", "refresh-1", 900)}
+    assert await flight.run("id.secret", rotate) == ("access-1", "refresh-1", 900)
+    assert (await flight.run("id.other", rotate))[1] == "refresh-2"
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_is_not_replayed():
+    flight = RefreshSingleFlight(get_settings())
+    calls = 0
+
+    async def rotate():
+        nonlocal calls
+        calls += 1
+        raise AuthError("Invalid refresh token", code="refresh_invalid")
+
+    for _ in range(2):
+        with pytest.raises(AuthError):
+            await flight.run("id.secret", rotate)
+    assert calls == 2
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter.from_items((f"jti-{i}" for i in range(1000)), capacity=1000, error_rate=0.01)
+    assert all(f"jti-{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def _payload(sub: str, epoch: int, jti: str) -> TokenPayload:
+    return TokenPayload(
+        sub=sub, email="a@example.com", role="admin", org_id="org", scopes=[], iat=0, exp=0, jti=jti, epoch=epoch
+    )
+
+
+@pytest.mark.asyncio
+async def test_token_revocation_by_jti_and_epoch():
+    revocation = TokenRevocation(get_settings())
+    await revocation.start(None)
+    current = _payload("user-1", 0, "jti-1")
+    assert not await revocation.is_revoked(current)
+
+    await revocation.revoke_token("jti-1", utcnow().timestamp() + 60)
+    assert await revocation.is_revoked(current)
+    assert not await revocation.is_revoked(_payload("user-1", 0, "jti-2"))
+
+    await revocation.revoke_epochs({"user-1": 1})
+    assert await revocation.is_revoked(_payload("user-1", 0, "jti-2"))
+    assert not await revocation.is_revoked(_payload("user-1", 1, "jti-3"))
+    assert not await revocation.is_revoked(_payload("user-2", 0, "jti-4"))
+
+    await revocation.reload()
+    assert await revocation.is_revoked(current)
+    await revocation.stop()
+
+
+class _DownRedis:
+    async def zscore(self, key, member):
+        raise RedisConnectionError("redis down")
+
+    def pipeline(self, transaction=True):
+        raise RedisConnectionError("redis down")
+
+
+async def test_token_revocation_degrades_when_redis_is_down():
+    revocation = TokenRevocation(get_settings())
+    await revocation.start(None)
+    await revocation.revoke_token("jti-down", utcnow().timestamp() + 60)
+    revocation.redis = _DownRedis()
+
+    # Bloom filter hits are treated as revoked; misses never touch Redis.
+    assert await revocation.is_revoked(_payload("user-1", 0, "jti-down"))
+    assert not await revocation.is_revoked(_payload("user-1", 0, "jti-live"))
+    with pytest.raises(ServiceUnavailableError):
+        await revocation.revoke_token("jti-other", utcnow().timestamp() + 60)
+    await revocation.revoke_epochs({"user-1": 1})
+    assert await revocation.is_revoked(_payload("user-1", 0, "jti-live"))
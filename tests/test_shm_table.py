@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from app.services.rate_limit_service import InMemoryRateLimiter, RateLimit
+from app.core.config import get_settings
+from app.utils.shm_table import BUCKET_SLOTS, SharedMemoryTable, TimingWheel, open_shared_table
+
+pytest.importorskip("fcntl")
+
+
+def _hammer(path: str, checks: int, admitted) -> None:
+    limiter = InMemoryRateLimiter(table=SharedMemoryTable(path, 1024, 8))
+    rule = RateLimit("global:10.0.0.1", 100, 3600)
+    count = sum(limiter.check((rule,))[0][0] for _ in range(checks))
+    with admitted.get_lock():
+        admitted.value += count
+
+
+def test_shared_table_enforces_one_limit_across_processes(tmp_path):
+    path = str(tmp_path / "ratelimit.shm")
+    SharedMemoryTable(path, 1024, 8).close()
+    context = multiprocessing.get_context("fork")
+    admitted = context.Value("i", 0)
+    workers = [context.Process(target=_hammer, args=(path, 60, admitted)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+    assert [worker.exitcode for worker in workers] == [0, 0, 0, 0]
+    assert admitted.value == 100
+
+
+def test_shared_table_expiry_eviction_and_pop(tmp_path):
+    table = SharedMemoryTable(str(tmp_path / "state.shm"), BUCKET_SLOTS, 16)
+    table.set("a", b"1", 0.05)
+    table.set("b", b"2", 60)
+    assert table.get("a") == b"1"
+    time.sleep(0.06)
+    assert table.get("a") is None
+
+    # One bucket: once full, the soonest-expiring entry makes room.
+    for index in range(BUCKET_SLOTS):
+        table.set(f"k{index}", str(index).encode(), 100 + index)
+    assert table.get("b") is None
+    assert table.get("k0") == b"0"
+    assert table.pop("k0") == b"0"
+    assert table.get("k0") is None
+    with pytest.raises(ValueError):
+        table.set("big", b"x" * 17, 60)
+    table.close()
+
+    reopened = SharedMemoryTable(str(tmp_path / "state.shm"), BUCKET_SLOTS, 16)
+    assert reopened.get("k1") == b"1"
+    reopened.close()
+
+
+def test_shared_table_refuses_foreign_layouts_and_unsafe_files(tmp_path):
+    path = str(tmp_path / "state.shm")
+    table = SharedMemoryTable(path, 1024, 8)
+    table.set("a", b"1", 60)
+    # A worker with another layout must not resize a file that live processes have mapped.
+    with pytest.raises(ValueError):
+        SharedMemoryTable(path, 64, 8)
+    table.set("b", b"2", 60)
+    assert table.get("a") == b"1"
+    table.close()
+
+    os.symlink(path, str(tmp_path / "planted.shm"))
+    with pytest.raises(OSError):
+        SharedMemoryTable(str(tmp_path / "planted.shm"), 1024, 8)
+    os.chmod(path, 0o644)
+    with pytest.raises(PermissionError):
+        SharedMemoryTable(path, 1024, 8)
+
+    settings = get_settings().model_copy(update={"SHARED_STATE_ENABLED": True, "SHARED_STATE_DIR": str(tmp_path)})
+    small, large = open_shared_table(settings, "t", 64, 8), open_shared_table(settings, "t", 1024, 8)
+    assert small.path != large.path
+    small.close()
+    large.close()
+
+
+def test_timing_wheel_reports_due_items_and_clamps_far_deadlines():
+    wheel = TimingWheel(10)
+    now = time.time()
+    wheel.schedule(now + 2, 1)
+    wheel.schedule(now + 500, 2)
+    assert wheel.advance(now) == set()
+    assert wheel.advance(now + 3) == {1}
+    assert wheel.advance(now + 20) == {2}
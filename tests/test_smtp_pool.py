@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import asyncio
+import socket
+from email.message import EmailMessage
+
+import aiosmtplib
+import pytest
+
+from app.core.config import get_settings
+from app.services.smtp_pool import SMTPConnectionPool
+
+
+def _message(index: int) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = "noreply@example.com"
+    message["To"] = f"user{index}@example.com"
+    message["Subject"] = f"Message {index}"
+    message.set_content("hello")
+    return message
+
+
+class _FakeClient:
+    def __init__(self, fail_after: int | None = None):
+        self.fail_after = fail_after
+        self.connects = 0
+        self.sent: list[str] = []
+        self.is_connected = False
+
+    async def connect(self):
+        self.connects += 1
+        self.is_connected = True
+
+    async def send_message(self, message):
+        if self.fail_after is not None and len(self.sent) >= self.fail_after:
+            self.is_connected = False
+            raise aiosmtplib.SMTPServerDisconnected("Connection lost")
+        self.sent.append(message["To"])
+
+    async def noop(self):
+        return None
+
+    async def quit(self):
+        self.is_connected = False
+
+    def close(self):
+        self.is_connected = False
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_connections_and_reconnects_after_disconnect():
+    settings = get_settings().model_copy(
+        update={"SMTP_POOL_SIZE": 2, "SMTP_POOL_MAX_MESSAGES_PER_CONNECTION": 5, "SMTP_POOL_IDLE_CHECK_SECONDS": 30}
+    )
+    clients = [_FakeClient(fail_after=3), _FakeClient(), _FakeClient()]
+    created = iter(clients)
+    pool = SMTPConnectionPool(settings, client_factory=lambda: next(created))
+
+    for index in range(8):
+        await pool.send(_message(index))
+
+    # The first connection dies after three messages; the retry moves to a fresh one, which is recycled at five.
+    assert clients[0].sent == [f"user{index}@example.com" for index in range(3)]
+    assert clients[1].sent == [f"user{index}@example.com" for index in range(3, 8)]
+    assert [client.connects for client in clients] == [1, 1, 0]
+    assert not clients[1].is_connected
+
+    await pool.send(_message(8))
+    assert clients[2].sent == ["user8@example.com"]
+    await pool.close()
+    assert not clients[2].is_connected
+
+
+@pytest.mark.asyncio
+async def test_pool_against_local_smtp_server():
+    controller_module = pytest.importorskip("aiosmtpd.controller")
+
+    class _Collector:
+        def __init__(self):
+            self.recipients: list[str] = []
+
+        async def handle_DATA(self, server, session, envelope):
+            self.recipients.extend(envelope.rcpt_tos)
+            return "250 OK"
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    settings = get_settings().model_copy(
+        update={
+            "SMTP_HOST": "127.0.0.1",
+            "SMTP_PORT": port,
+            "SMTP_USER": "",
+            "SMTP_PASSWORD": "",
+            "SMTP_USE_TLS": False,
+            "SMTP_POOL_SIZE": 2,
+            "SMTP_POOL_IDLE_CHECK_SECONDS": 0,
+        }
+    )
+    opened = []
+    pool = SMTPConnectionPool(settings)
+    pool.client_factory = lambda: opened.append(1) or pool._new_client()
+
+    handler = _Collector()
+    controller = controller_module.Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        await asyncio.gather(*(pool.send(_message(index)) for index in range(10)))
+        assert sorted(handler.recipients) == sorted(f"user{index}@example.com" for index in range(10))
+        assert len(opened) == 2
+
+        # A relay restart kills the pooled sessions; the health check notices and the pool reconnects.
+        controller.stop()
+        controller = controller_module.Controller(handler, hostname="127.0.0.1", port=port)
+        controller.start()
+        await pool.send(_message(10))
+        assert "user10@example.com" in handler.recipients
+        assert len(opened) == 3
+    finally:
+        await pool.close()
+        controller.stop()
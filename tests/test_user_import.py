@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from app.api.deps import get_hooks
+from app.core.config import get_settings
+from app.core.exceptions import ServiceUnavailableError, ValidationError
+from app.models import EmailOutboxMessage, Membership, Organization, Role, User
+from app.security.hashing import hash_password, verify_password
+from app.services.audit_service import AuditService
+from app.services.user_import_service import UserImportService, _ImportRow, parse_records
+
+BCRYPT_HASH = "$2b$12$KIXQJ0b5u8n8y8Fq1hG7UeK1Cw2c9bq3j8mJH6b1c1Q0XhM2gYq6a"
+
+
+async def _chunks(data: bytes, size: int = 7, fail_after: int | None = None):
+    for offset in range(0, len(data), size):
+        if fail_after is not None and offset >= fail_after:
+            raise ConnectionError("client went away")
+        yield data[offset : offset + size]
+
+
+@pytest.mark.asyncio
+async def test_csv_parser_handles_quoted_newlines_and_split_chunks():
+    data = 'email,display_name\r\na@example.com,"Ann\nSmith"\nb@example.com,"Bo ""B"""\nbroken\n'.encode()
+    records = [record async for record in parse_records(_chunks(data, size=3), "csv")]
+    assert records == [
+        (1, {"email": "a@example.com", "display_name": "Ann\nSmith"}),
+        (2, {"email": "b@example.com", "display_name": 'Bo "B"'}),
+        (3, None),
+    ]
+
+    # A stray quote only costs its own record once the record outgrows the cap.
+    data = b'email\n"stray@example.com\nc@example.com\nd@example.com\ne@example.com\n'
+    records = [record async for record in parse_records(_chunks(data), "csv", max_record_length=30)]
+    assert records == [(1, None), (2, {"email": "d@example.com"}), (3, {"email": "e@example.com"})]
+
+
+@pytest.mark.asyncio
+async def test_bulk_import_batches_and_resumes_from_checkpoint(db_session):
+    org_id = str(uuid.uuid4())
+    await db_session.execute(insert(Organization.__table__), [{"id": org_id, "name": "Import", "slug": org_id}])
+    await db_session.execute(
+        insert(User.__table__),
+        [
+            {
+                "id": str(uuid.uuid4()),
+                "email": "taken@import.example.com",
+                "normalized_email": "taken@import.example.com",
+                "is_active": True,
+                "is_verified": True,
+                "custom_fields": {},
+                "custom_schema_version": 1,
+            }
+        ],
+    )
+    await db_session.commit()
+    legacy_argon2 = hash_password("Legacy#Pass1")
+    data = (
+        "email,password,password_hash,role\n"
+        "one@import.example.com,Str0ng!Passw0rd,,\n"
+        f'two@import.example.com,,"{legacy_argon2}",admin\n'
+        f"three@import.example.com,,{BCRYPT_HASH},\n"
+        "not-an-email,Str0ng!Passw0rd,,\n"
+        "ONE@import.example.com,Str0ng!Passw0rd,,\n"
+        "taken@import.example.com,Str0ng!Passw0rd,,\n"
+        "weak@import.example.com,short,,\n"
+    ).encode()
+
+    settings = get_settings().model_copy(update={"USER_IMPORT_BATCH_SIZE": 2})
+    service = UserImportService(db_session, settings, get_hooks(), AuditService(db_session, settings))
+    job = await service.start_job(org_id, None, "csv", None)
+    with pytest.raises(ConnectionError):
+        await service.run(job, _chunks(data, fail_after=len(data) * 2 // 3))
+    job = await service.get_job(org_id, str(job.id))
+    assert job.status == "failed"
+    assert 0 < job.processed_rows < 7
+
+    job = await service.start_job(org_id, None, "csv", str(job.id))
+    job = await service.run(job, _chunks(data))
+    assert (job.status, job.processed_rows) == ("completed", 7)
+    assert (job.created_count, job.skipped_count, job.failed_count) == (3, 2, 2)
+
+    results = {result.row_number: (result.status, result.code) for result in await service.list_results(job)}
+    assert results == {
+        1: ("created", None),
+        2: ("created", None),
+        3: ("created", None),
+        4: ("failed", "invalid_email"),
+        # Row 1 was committed before the interruption, so its duplicate now hits the database check.
+        5: ("skipped", "email_exists"),
+        6: ("skipped", "email_exists"),
+        7: ("failed", "password_too_short"),
+    }
+    two = (
+        await db_session.execute(select(User).where(User.normalized_email == "two@import.example.com"))
+    ).scalar_one()
+    assert verify_password("Legacy#Pass1", two.credential.password_hash)
+    roles = await db_session.scalars(select(Membership.role).where(Membership.org_id == org_id))
+    assert sorted(role.value for role in roles) == ["admin", "member", "member"]
+    assert not two.is_verified
+    queued = await db_session.scalar(
+        select(func.count()).where(EmailOutboxMessage.recipient.like("%@import.example.com"))
+    )
+    assert queued == 3
+
+
+@pytest.mark.asyncio
+async def test_verified_import_is_limited_to_owned_domains(db_session):
+    org_id = str(uuid.uuid4())
+    await db_session.execute(insert(Organization.__table__), [{"id": org_id, "name": "Owned", "slug": org_id}])
+    await db_session.commit()
+    data = (
+        "email,password\n"
+        "staff@owned.example.com,Str0ng!Passw0rd\n"
+        "ceo@victim.example.com,Str0ng!Passw0rd\n"
+    ).encode()
+    settings = get_settings()
+    service = UserImportService(db_session, settings, get_hooks(), AuditService(db_session, settings))
+    with pytest.raises(ValidationError):
+        await service.run(await service.start_job(org_id, None, "csv", None), _chunks(data), verified=True)
+
+    settings = settings.model_copy(update={"USER_IMPORT_VERIFIED_DOMAINS": {org_id: ["owned.example.com"]}})
+    service = UserImportService(db_session, settings, get_hooks(), AuditService(db_session, settings))
+    job = await service.run(await service.start_job(org_id, None, "csv", None), _chunks(data), verified=True)
+    results = {result.row_number: (result.status, result.code) for result in await service.list_results(job)}
+    assert results == {1: ("created", None), 2: ("failed", "domain_not_verified")}
+    staff = await db_session.scalar(select(User).where(User.normalized_email == "staff@owned.example.com"))
+    assert staff.is_verified
+
+    data = b'{"email": "x@owned.example.com", "password": "Str0ng!Passw0rd", "is_verified": true}\n'
+    job = await service.run(await service.start_job(org_id, None, "ndjson", None), _chunks(data))
+    assert [result.code for result in await service.list_results(job)] == ["is_verified_not_allowed"]
+
+
+class _BusyHasher:
+    def __init__(self):
+        self.admission = SimpleNamespace(slots=2)
+        self.calls = 0
+
+    async def hash(self, password, priority):
+        self.calls += 1
+        if password == "busy" and self.calls < 3:
+            raise ServiceUnavailableError("Password operation timed out in queue", code="hashing_busy")
+        if password == "broken":
+            raise RuntimeError("worker died")
+        return f"hashed:{password}"
+
+
+@pytest.mark.asyncio
+async def test_password_hashing_retries_when_busy_and_fails_rows_individually(db_session, monkeypatch):
+    async def _no_sleep(delay):
+        pass
+
+    monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+    settings = get_settings()
+    service = UserImportService(
+        db_session, settings, get_hooks(), AuditService(db_session, settings), password_hasher=_BusyHasher()
+    )
+    rows = [
+        _ImportRow(number, email, email, None, Role.MEMBER, False, email.partition("@")[0], None)
+        for number, email in enumerate(("busy@example.com", "broken@example.com"), start=1)
+    ]
+    busy, broken = await service._hash_all(rows)
+    assert busy == "hashed:busy"
+    assert broken.code == "password_hash_failed"